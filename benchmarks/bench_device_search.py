@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""Benchmark the device autocomplete against a large synthetic fleet.
+
+Inserts ``BENCH_DEVICES`` synthetic devices, then times ``name_search`` the
+way the ``device_id`` many2one autocomplete calls it: an exact serial
+number, a serial number prefix, a fragment of a device name and a term
+matching nothing. Each lookup is repeated ``BENCH_REPEAT`` times and the
+median and 95th percentile latencies are printed with the plan of its
+query. Everything is rolled back at the end unless ``BENCH_KEEP=1``. Runs
+in an Odoo shell on a database where the module is installed::
+
+    BENCH_DEVICES=100000 odoo-bin shell -d DB --no-http < benchmarks/bench_device_search.py
+"""
+import os
+import statistics
+import time
+
+DEVICES = int(os.environ.get('BENCH_DEVICES', 100000))
+REPEAT = int(os.environ.get('BENCH_REPEAT', 50))
+KEEP = os.environ.get('BENCH_KEEP') == '1'
+LIMIT = 8
+
+
+def populate(env):
+    cr = env.cr
+    started = time.perf_counter()
+    cr.execute("""
+        INSERT INTO measurement_device
+               (name, serial_number, device_type, measurement_unit, min_range, max_range,
+                active, calibration_interval, create_uid, create_date, write_uid, write_date)
+        SELECT (ARRAY['Thermometer', 'Pressure Gauge', 'Laser Meter', 'Flow Sensor'])[1 + serie %% 4]
+               || ' Line ' || (serie %% 97) || ' Unit ' || serie,
+               'BSRCH-' || lpad(serie::text, 7, '0'),
+               'other', 'mm', 0, 1000, true, 365,
+               %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+          FROM generate_series(1, %(devices)s) AS serie
+    """, {'devices': DEVICES, 'uid': env.uid})
+    cr.execute("ANALYZE measurement_device")
+    print(f"Inserted {DEVICES} devices in {time.perf_counter() - started:.1f}s")
+
+
+def lookups():
+    """Yield ``(label, term)`` of the searched terms"""
+    yield "Exact serial number", 'BSRCH-%07d' % (DEVICES // 2)
+    yield "Serial number prefix", 'BSRCH-00421'
+    yield "Name fragment", 'Gauge Line 42 Unit 1'
+    yield "No match", 'no such device'
+
+
+def main(env):
+    Device = env['measurement.device']
+    try:
+        populate(env)
+        for label, term in lookups():
+            timings = []
+            for _repeat in range(REPEAT):
+                env.invalidate_all()
+                started = time.perf_counter()
+                result = Device.name_search(term, limit=LIMIT)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            print(f"\n=== {label} ({term!r}): {len(result)} results, "
+                  f"median {statistics.median(timings):.2f} ms, "
+                  f"p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms")
+            query = Device._search(
+                ['|', ('name', 'ilike', term), ('serial_number', 'ilike', term)], limit=LIMIT
+            )
+            query_str, params = query.select()
+            env.cr.execute("EXPLAIN (ANALYZE, BUFFERS) " + query_str, params)
+            print('\n'.join(row[0] for row in env.cr.fetchall()))
+    finally:
+        if KEEP:
+            env.cr.commit()
+        else:
+            env.cr.rollback()
+
+
+main(env)  # noqa: F821 - provided by the Odoo shell
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+"""Benchmark the measurement queries against a large synthetic dataset.
+
+Inserts ``BENCH_ROWS`` synthetic measurements spread over ``BENCH_DEVICES``
+devices and a year, rebuilds their rollups, then prints the plan and the
+timing of the queries behind the record list view, its search filters, the
+device statistics and the reports. Everything is rolled back at the end
+unless ``BENCH_KEEP=1``. Runs in an Odoo shell on a database where the
+module is installed::
+
+    BENCH_ROWS=10000000 odoo-bin shell -d DB --no-http < benchmarks/bench_indexes.py
+"""
+import os
+import time
+from datetime import datetime, timedelta
+
+ROWS = int(os.environ.get('BENCH_ROWS', 10000000))
+DEVICES = int(os.environ.get('BENCH_DEVICES', 200))
+KEEP = os.environ.get('BENCH_KEEP') == '1'
+END_DATE = datetime(2025, 1, 1)
+START_DATE = END_DATE - timedelta(days=365)
+
+
+def populate(env):
+    cr = env.cr
+    devices = env['measurement.device'].create([
+        {
+            'name': f"Benchmark Device {index}",
+            'serial_number': f"BENCH-INDEX-{index}-{time.time_ns()}",
+            'device_type': 'other',
+            'measurement_unit': 'mm',
+            'min_range': 0,
+            'max_range': 1000,
+        }
+        for index in range(DEVICES)
+    ])
+    env.flush_all()
+    started = time.perf_counter()
+    # One in twenty rows is validated, one in fifty is a quality issue
+    cr.execute("""
+        INSERT INTO measurement_record
+               (name, device_id, measurement_date, value, unit, operator, measurement_type,
+                import_session_id, quality_status, is_validated,
+                create_uid, create_date, write_uid, write_date)
+        SELECT 'BENCH/' || serie,
+               (%(device_ids)s::int[])[1 + serie %% %(devices)s],
+               %(start)s::timestamp + (serie * %(span)s / %(rows)s) * interval '1 second',
+               (serie %% 1000)::float8,
+               'mm',
+               'Operator ' || (serie %% 7),
+               CASE WHEN serie %% 3 = 0 THEN 'manual' ELSE 'imported' END,
+               'bench_import_' || (serie / 100000),
+               CASE WHEN serie %% 50 = 0 THEN 'out_of_range' ELSE 'good' END,
+               serie %% 20 = 0,
+               %(uid)s, now() at time zone 'UTC', %(uid)s, now() at time zone 'UTC'
+          FROM generate_series(1, %(rows)s) AS serie
+    """, {
+        'device_ids': devices.ids,
+        'devices': DEVICES,
+        'start': START_DATE,
+        'span': int((END_DATE - START_DATE).total_seconds()),
+        'rows': ROWS,
+        'uid': env.uid,
+    })
+    print(f"Inserted {ROWS} measurements in {time.perf_counter() - started:.1f}s")
+    started = time.perf_counter()
+    env['measurement.record.rollup']._rebuild(devices.ids)
+    devices._recompute_measurement_stats()
+    cr.execute("ANALYZE measurement_record")
+    cr.execute("ANALYZE measurement_record_rollup")
+    print(f"Rollups and statistics rebuilt in {time.perf_counter() - started:.1f}s")
+    return devices
+
+
+def queries(env, devices):
+    """Yield ``(label, query, params)`` mirroring what the ORM generates"""
+    device_id = devices.ids[len(devices) // 2]
+    week_start = END_DATE - timedelta(days=7)
+    month_start = END_DATE.replace(day=1) - timedelta(days=1)
+    yield "List view, default order", """
+        SELECT id FROM measurement_record
+      ORDER BY measurement_date DESC, id DESC LIMIT 80
+    """, []
+    yield "List view of one device", """
+        SELECT id FROM measurement_record WHERE device_id = %s
+      ORDER BY measurement_date DESC, id DESC LIMIT 80
+    """, [device_id]
+    yield "Filter This Week", """
+        SELECT id FROM measurement_record WHERE measurement_date >= %s
+      ORDER BY measurement_date DESC, id DESC LIMIT 80
+    """, [week_start]
+    yield "Filter This Month, count", """
+        SELECT COUNT(*) FROM measurement_record WHERE measurement_date >= %s
+    """, [month_start]
+    yield "Filter Not Validated of one device", """
+        SELECT id FROM measurement_record WHERE device_id = %s AND is_validated IS NOT TRUE
+      ORDER BY measurement_date DESC, id DESC LIMIT 80
+    """, [device_id]
+    yield "Filter Out of Range", """
+        SELECT id FROM measurement_record WHERE quality_status = 'out_of_range'
+      ORDER BY measurement_date DESC, id DESC LIMIT 80
+    """, []
+    yield "Imported records of a session", """
+        SELECT id FROM measurement_record WHERE import_session_id = %s
+      ORDER BY measurement_date DESC, id DESC LIMIT 80
+    """, ['bench_import_42']
+    yield "Device statistics", """
+        SELECT device_id, COUNT(*), MAX(measurement_date) FROM measurement_record
+         WHERE device_id = %s GROUP BY device_id
+    """, [device_id]
+    yield "Device report, last 50 rows", """
+        SELECT id FROM measurement_record WHERE device_id = %s AND measurement_date >= %s
+      ORDER BY measurement_date DESC, id DESC LIMIT 50
+    """, [device_id, END_DATE - timedelta(days=30)]
+    yield "Device report, 30 days of hourly rollups", """
+        SELECT device_id, SUM(record_count), SUM(value_sum), MIN(value_min), MAX(value_max)
+          FROM measurement_record_rollup
+         WHERE device_id = %s AND bucket_type = 'hour' AND bucket_start >= %s
+      GROUP BY device_id
+    """, [device_id, END_DATE - timedelta(days=30)]
+    yield "Analysis report, 90 days of daily rollups", """
+        SELECT device_id, bucket_start, record_count, value_sum FROM measurement_record_rollup
+         WHERE bucket_type = 'day' AND bucket_start >= %s AND bucket_start < %s
+      ORDER BY device_id, bucket_start
+    """, [END_DATE - timedelta(days=90), END_DATE]
+    yield "Device lookup by serial number", """
+        SELECT id FROM measurement_device WHERE serial_number = %s
+    """, [devices[0].serial_number]
+
+
+def main(env):
+    try:
+        devices = populate(env)
+        for label, query, params in queries(env, devices):
+            env.cr.execute("EXPLAIN (ANALYZE, BUFFERS) " + query, params)
+            plan = [row[0] for row in env.cr.fetchall()]
+            print(f"\n=== {label}")
+            print('\n'.join(plan))
+    finally:
+        if KEEP:
+            env.cr.commit()
+        else:
+            env.cr.rollback()
+
+
+main(env)  # noqa: F821 - provided by the Odoo shell
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""Benchmark the chatter cost of creating machine-generated measurements.
+
+Creates ``BENCH_ROWS`` imported measurements in chunks, the way the batched
+CSV import does, once with tracking of machine measurements enabled and once
+with the default opt-out, and reports the create time together with the
+growth of ``mail_message``, ``mail_tracking_value`` and ``mail_followers``.
+Everything is rolled back at the end. Runs in an Odoo shell on a database
+where the module is installed::
+
+    BENCH_ROWS=100000 odoo-bin shell -d DB --no-http < benchmarks/bench_tracking.py
+"""
+import os
+import time
+from datetime import datetime, timedelta
+
+ROWS = int(os.environ.get('BENCH_ROWS', 100000))
+CHUNK_SIZE = int(os.environ.get('BENCH_CHUNK_SIZE', 1000))
+PARAM = 'measurement_data_management.track_machine_measurements'
+TABLES = ('mail_message', 'mail_tracking_value', 'mail_followers')
+
+
+def count_rows(cr):
+    counts = {}
+    for table in TABLES:
+        cr.execute(f"SELECT COUNT(*) FROM {table}")
+        counts[table] = cr.fetchone()[0]
+    return counts
+
+
+def run(env, tracked):
+    env['ir.config_parameter'].sudo().set_param(PARAM, str(tracked))
+    device = env['measurement.device'].create({
+        'name': f"Benchmark Device ({'tracked' if tracked else 'untracked'})",
+        'serial_number': f"BENCH-TRACKING-{int(tracked)}-{time.time_ns()}",
+        'device_type': 'other',
+        'measurement_unit': 'mm',
+    })
+    start_date = datetime(2024, 1, 1)
+    before = count_rows(env.cr)
+    started = time.perf_counter()
+    for offset in range(0, ROWS, CHUNK_SIZE):
+        env['measurement.record'].create([
+            {
+                'device_id': device.id,
+                'measurement_date': start_date + timedelta(seconds=i),
+                'value': float(i % 1000),
+                'unit': 'mm',
+                'operator': 'Benchmark',
+                'measurement_type': 'imported',
+                'import_session_id': 'bench_tracking',
+            }
+            for i in range(offset, min(offset + CHUNK_SIZE, ROWS))
+        ])
+        env.flush_all()
+        env.invalidate_all()
+    elapsed = time.perf_counter() - started
+    after = count_rows(env.cr)
+    return elapsed, {table: after[table] - before[table] for table in TABLES}
+
+
+def main(env):
+    print(f"Creating {ROWS} imported measurements in chunks of {CHUNK_SIZE}")
+    print(f"{'mode':<10} {'seconds':>9} {'rows/s':>9} " + ' '.join(f"{table:>20}" for table in TABLES))
+    try:
+        for tracked in (True, False):
+            elapsed, growth = run(env, tracked)
+            print(
+                f"{'tracked' if tracked else 'untracked':<10} {elapsed:>9.2f} {ROWS / elapsed:>9.0f} "
+                + ' '.join(f"{growth[table]:>20}" for table in TABLES)
+            )
+    finally:
+        env.cr.rollback()
+
+
+main(env)  # noqa: F821 - provided by the Odoo shell
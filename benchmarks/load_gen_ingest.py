@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""Load generator for the measurement ingestion endpoint.
+
+Simulates a fleet of gateways, each posting batches of synthetic readings to
+``/measurement/ingest`` as fast as the server answers, and reports the
+throughput in readings per second and the request latency percentiles.
+Runs without an Odoo environment against a running server::
+
+    python benchmarks/load_gen_ingest.py --url http://localhost:8069 \\
+        --api-key KEY --serials SN-001,SN-002 --gateways 16 --batch 500 --duration 60
+
+The serial numbers must belong to existing devices. ``--db`` selects the
+database when the server hosts several.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+
+def percentile(sorted_values, rank):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(int(len(sorted_values) * rank / 100.0), len(sorted_values) - 1)]
+
+
+def make_batch(serials, size):
+    now = datetime.now(timezone.utc).isoformat()
+    return [
+        {
+            'serial_number': random.choice(serials),
+            'value': round(random.gauss(50.0, 10.0), 3),
+            'timestamp': now,
+        }
+        for _i in range(size)
+    ]
+
+
+def run_gateway(args, gateway, deadline, stats, lock):
+    url = args.url.rstrip('/') + '/measurement/ingest'
+    if args.db:
+        url += '?db=' + args.db
+    headers = {'Content-Type': 'application/json', 'Authorization': 'Bearer ' + args.api_key}
+    while time.monotonic() < deadline:
+        body = json.dumps({'gateway': f'load-{gateway}', 'readings': make_batch(args.serials, args.batch)})
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, body.encode(), headers), timeout=60) as response:
+                result = json.loads(response.read())
+            error = None
+        except (urllib.error.URLError, OSError, ValueError) as e:
+            result, error = None, str(e)
+        elapsed = time.perf_counter() - started
+        with lock:
+            stats['latencies'].append(elapsed)
+            if result is None:
+                stats['failed_requests'] += 1
+                stats['last_error'] = error
+            else:
+                stats['created'] += result['created']
+                stats['rejected'] += result['rejected']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://localhost:8069')
+    parser.add_argument('--db')
+    parser.add_argument('--api-key', required=True)
+    parser.add_argument('--serials', required=True, help="Comma separated device serial numbers")
+    parser.add_argument('--gateways', type=int, default=8, help="Concurrent gateways")
+    parser.add_argument('--batch', type=int, default=500, help="Readings per request")
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds")
+    args = parser.parse_args()
+    args.serials = [serial.strip() for serial in args.serials.split(',') if serial.strip()]
+
+    stats = {'latencies': [], 'created': 0, 'rejected': 0, 'failed_requests': 0, 'last_error': None}
+    lock = threading.Lock()
+    started = time.monotonic()
+    deadline = started + args.duration
+    with ThreadPoolExecutor(max_workers=args.gateways) as executor:
+        for gateway in range(args.gateways):
+            executor.submit(run_gateway, args, gateway, deadline, stats, lock)
+    elapsed = time.monotonic() - started
+
+    latencies = sorted(stats['latencies'])
+    print(f"Gateways: {args.gateways}, batch: {args.batch}, duration: {elapsed:.1f}s")
+    print(f"Requests: {len(latencies)}, failed: {stats['failed_requests']}")
+    print(f"Readings created: {stats['created']}, rejected: {stats['rejected']}")
+    print(f"Throughput: {stats['created'] / elapsed:,.0f} readings/s")
+    print("Latency p50: {:.1f}ms, p95: {:.1f}ms, p99: {:.1f}ms, max: {:.1f}ms".format(
+        *(percentile(latencies, rank) * 1000 for rank in (50, 95, 99, 100))
+    ))
+    if stats['last_error']:
+        print(f"Last error: {stats['last_error']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,4 @@
 from . import models
 from . import wizard
-from . import report
\ No newline at end of file
+from . import report
+from . import controllers
\ No newline at end of file
@@ -19,10 +19,19 @@
     'data': [
         'security/ir.model.access.csv',
         'data/ir_sequence_data.xml',
+        'data/ir_config_parameter_data.xml',
+        'data/ir_cron_data.xml',
         'views/measurement_device_views.xml',
         'views/measurement_record_views.xml',
+        'views/measurement_record_rollup_views.xml',
+        'views/measurement_retention_policy_views.xml',
         'wizard/measurement_import_wizard_views.xml',  
+        'views/measurement_import_job_views.xml',
         'report/measurement_report_template.xml',
+        'report/measurement_analysis_report_template.xml',
+        'wizard/measurement_analysis_wizard_views.xml',
+        'wizard/measurement_export_wizard_views.xml',
+        'wizard/measurement_validation_wizard_views.xml',
         'views/menu_views.xml',                       
         'data/measurement_device_data.xml',
     ],
@@ -0,0 +1,2 @@
+from . import ingest
+from . import export
\ No newline at end of file
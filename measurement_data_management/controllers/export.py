@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import json
+from odoo import api, fields, http, _
+from odoo.exceptions import UserError
+from odoo.http import Response, content_disposition, request
+
+
+class MeasurementExportController(http.Controller):
+    """Streaming CSV download of measurements, in the layout of the import"""
+    
+    @http.route('/measurement/export/csv', type='http', auth='user', methods=['GET'])
+    def export_csv(self, domain='[]', compress=None, **kwargs):
+        try:
+            domain = json.loads(domain)
+        except ValueError:
+            raise UserError(_("Invalid domain: %s", domain))
+        compress = compress == 'gzip'
+        records = request.env['measurement.record']
+        records.check_access_rights('read')
+        # Fail early on invalid domains, while the error can still be shown
+        records._where_calc(domain)
+        
+        # The request cursor is released once the response is returned,
+        # the rows are streamed from a cursor of their own
+        registry = request.env.registry
+        uid = request.env.uid
+        context = dict(request.env.context)
+        
+        def generate():
+            with registry.cursor() as cr:
+                env = api.Environment(cr, uid, context)
+                yield from env['measurement.record']._iter_csv_export(domain, compress=compress)
+        
+        filename = 'measurements_%s.csv%s' % (
+            fields.Datetime.now().strftime('%Y%m%d_%H%M%S'), '.gz' if compress else ''
+        )
+        return Response(
+            generate(),
+            headers=[
+                ('Content-Type', 'application/gzip' if compress else 'text/csv; charset=utf-8'),
+                ('Content-Disposition', content_disposition(filename)),
+                ('Cache-Control', 'no-store'),
+            ],
+            direct_passthrough=True,
+        )
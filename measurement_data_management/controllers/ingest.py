@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+from odoo import http
+from odoo.exceptions import AccessError
+from odoo.http import request
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class MeasurementIngestController(http.Controller):
+    """JSON endpoint through which devices and gateways push readings.
+
+    Gateways authenticate with the API key of an Odoo user, sent as
+    ``Authorization: Bearer <key>`` or ``X-API-Key``, and post batches::
+
+        {"gateway": "line-3", "readings": [
+            {"serial_number": "SN-001", "value": 12.5, "timestamp": "2024-05-01T10:00:00Z"}
+        ]}
+
+    Each batch is written with a single ``COPY``; batching readings on the
+    gateway side is what sustains high rates. The response holds one result
+    per reading, in order.
+    """
+
+    _MAX_READINGS = 10000
+
+    @http.route('/measurement/ingest', type='http', auth='none', methods=['POST'],
+                csrf=False, save_session=False)
+    def ingest(self, **kwargs):
+        started = time.perf_counter()
+        uid = self._authenticate()
+        if not uid:
+            return self._json_response({'error': 'Invalid or missing API key'}, 401)
+        try:
+            payload = json.loads(request.httprequest.get_data())
+        except ValueError:
+            return self._json_response({'error': 'The body must be JSON'}, 400)
+        readings = payload.get('readings') if isinstance(payload, dict) else None
+        if not isinstance(readings, list):
+            return self._json_response({'error': 'The body must hold a "readings" list'}, 400)
+        if len(readings) > self._MAX_READINGS:
+            return self._json_response(
+                {'error': 'At most %s readings per request' % self._MAX_READINGS}, 413
+            )
+
+        request.update_env(user=uid)
+        gateway = payload.get('gateway')
+        try:
+            results = request.env['measurement.record']._ingest_readings(
+                readings, import_session_id=f'api_{gateway}' if gateway else None
+            )
+        except AccessError:
+            return self._json_response({'error': 'Not allowed to create measurements'}, 403)
+        for index, result in enumerate(results):
+            result['index'] = index
+        created = sum(1 for result in results if result['status'] == 'created')
+        duplicates = sum(1 for result in results if result['status'] == 'duplicate')
+        _logger.debug(
+            "Measurement ingest: %s readings created, %s duplicates, %s rejected in %.3fs",
+            created, duplicates, len(results) - created - duplicates, time.perf_counter() - started
+        )
+        return self._json_response({
+            'created': created,
+            'duplicates': duplicates,
+            'rejected': len(results) - created - duplicates,
+            'results': results,
+        })
+
+    def _authenticate(self):
+        """Return the user id of the API key of the request, or None"""
+        key = request.httprequest.headers.get('X-API-Key')
+        authorization = request.httprequest.headers.get('Authorization', '')
+        if not key and authorization[:7].lower() == 'bearer ':
+            key = authorization[7:].strip()
+        if not key:
+            return None
+        return request.env['res.users.apikeys']._check_credentials(scope='rpc', key=key)
+
+    def _json_response(self, data, status=200):
+        return request.make_response(
+            json.dumps(data),
+            headers=[('Content-Type', 'application/json')],
+            status=status,
+        )
@@ -1,2 +1,7 @@
+from . import measurement_import_mixin
+from . import measurement_import_job
 from . import measurement_device
-from . import measurement_record
\ No newline at end of file
+from . import measurement_record
+from . import measurement_record_partition
+from . import measurement_record_rollup
+from . import measurement_retention_policy
\ No newline at end of file
@@ -1,6 +1,16 @@
 # -*- coding: utf-8 -*-
+from collections import defaultdict
+from datetime import timedelta
+import psycopg2
 from odoo import models, fields, api, _
-from odoo.exceptions import ValidationError
+from odoo.osv import expression
+from odoo.tools.sql import create_index
+from ..tools.quality import DEFAULT_WARNING_MAX_FACTOR, DEFAULT_WARNING_MIN_FACTOR
+from ..tools.spc import SpcState
+from ..tools.statistics import RunningStats
+import logging
+
+_logger = logging.getLogger(__name__)
 
 
 class MeasurementDevice(models.Model):
@@ -69,8 +79,30 @@ class MeasurementDevice(models.Model):
     
     next_calibration_date = fields.Date(
         string='Next Calibration Date',
+        compute='_compute_next_calibration_date',
+        store=True,
+        readonly=False,
+        index=True,
+        tracking=True,
+        help="Date of next required calibration, computed from the last "
+             "calibration date and the interval"
+    )
+    
+    calibration_status = fields.Selection([
+        ('unknown', 'Unknown'),
+        ('current', 'Current'),
+        ('due_soon', 'Due Soon'),
+        ('overdue', 'Overdue'),
+    ], string='Calibration Status', compute='_compute_calibration_status', store=True, index=True,
+        help="Refreshed daily by a scheduled action")
+    
+    calibration_user_id = fields.Many2one(
+        'res.users',
+        string='Calibration Responsible',
+        default=lambda self: self.env.user,
         tracking=True,
-        help="Date of next required calibration"
+        help="User in charge of the calibrations, scheduled an activity "
+             "when one is due"
     )
     
     calibration_interval = fields.Integer(
@@ -94,6 +126,20 @@ class MeasurementDevice(models.Model):
         help="Maximum measurement range of the device"
     )
     
+    warning_min_factor = fields.Float(
+        string='Low Warning Factor',
+        default=DEFAULT_WARNING_MIN_FACTOR,
+        help="Values below the minimum range multiplied by this factor are "
+             "flagged as a warning"
+    )
+    
+    warning_max_factor = fields.Float(
+        string='High Warning Factor',
+        default=DEFAULT_WARNING_MAX_FACTOR,
+        help="Values above the maximum range multiplied by this factor are "
+             "flagged as a warning"
+    )
+    
     accuracy = fields.Float(
         string='Accuracy',
         help="Device accuracy specification"
@@ -117,52 +163,395 @@ class MeasurementDevice(models.Model):
     
     record_count = fields.Integer(
         string='Total Records',
-        compute='_compute_record_count',
+        compute='_compute_measurement_stats',
         store=True
     )
     
     last_measurement_date = fields.Datetime(
         string='Last Measurement',
-        compute='_compute_last_measurement_date',
+        compute='_compute_measurement_stats',
         store=True
     )
     
-    @api.depends('measurement_record_ids')
-    def _compute_record_count(self):
+    retention_cutoff = fields.Datetime(
+        string='Raw Data Kept Since',
+        readonly=True,
+        copy=False,
+        help="Raw measurements before this date are only kept as rollups, "
+             "unless validated or with attachments"
+    )
+    
+    spc_enabled = fields.Boolean(
+        string='Process Control',
+        default=False,
+        help="Opt in to flag new readings violating the Western Electric rules or the "
+             "EWMA limits of the device as critical"
+    )
+    
+    # Control state, see tools.spc.SpcState
+    spc_count = fields.Integer(string='Control Readings', readonly=True, copy=False)
+    spc_mean = fields.Float(string='Control Mean', readonly=True, copy=False)
+    spc_m2 = fields.Float(string='Control Sum of Squared Deviations', readonly=True, copy=False)
+    spc_ewma = fields.Float(string='EWMA', readonly=True, copy=False)
+    spc_zones = fields.Char(string='Recent Zones', readonly=True, copy=False)
+    spc_std_dev = fields.Float(string='Control Std Dev', compute='_compute_spc_std_dev')
+    
+    _sql_constraints = [
+        ('serial_number_unique', 'unique(serial_number)',
+         'Serial number must be unique.'),
+    ]
+    
+    def init(self):
+        super().init()
+        # Trigram indexes serve the substring matches of _name_search on
+        # name and serial number, given the pg_trgm extension
+        try:
+            with self._cr.savepoint():
+                self._cr.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except psycopg2.Error:
+            _logger.warning(
+                "The pg_trgm extension could not be created, device searches "
+                "by name or serial number will not use an index"
+            )
+            return
+        for column in ('name', 'serial_number'):
+            create_index(
+                self._cr, f'measurement_device_{column}_trgm_index', self._table,
+                [f'"{column}" gin_trgm_ops'], method='gin'
+            )
+    
+    @api.depends('measurement_record_ids', 'measurement_record_ids.measurement_date')
+    def _compute_measurement_stats(self):
+        # One aggregate query for all changed devices, the measurement
+        # records themselves are never loaded
+        device_ids = [device_id for device_id in self.ids if device_id]
+        stats = {}
+        if device_ids:
+            groups = self.env['measurement.record'].read_group(
+                [('device_id', 'in', device_ids)],
+                ['device_id', 'measurement_date:max'],
+                ['device_id'],
+                lazy=False,
+            )
+            stats = {
+                group['device_id'][0]: (group['__count'], group['measurement_date'])
+                for group in groups
+            }
         for device in self:
-            device.record_count = len(device.measurement_record_ids)
+            count, last_date = stats.get(device.id, (0, False))
+            device.record_count = count
+            device.last_measurement_date = last_date
+    
+    _CALIBRATION_DUE_SOON_DAYS = 30
     
-    @api.depends('measurement_record_ids.measurement_date')
-    def _compute_last_measurement_date(self):
+    @api.depends('calibration_date', 'calibration_interval')
+    def _compute_next_calibration_date(self):
         for device in self:
-            if device.measurement_record_ids:
-                device.last_measurement_date = max(
-                    device.measurement_record_ids.mapped('measurement_date')
+            if device.calibration_date and device.calibration_interval:
+                device.next_calibration_date = fields.Date.add(
+                    device.calibration_date, days=device.calibration_interval
                 )
+    
+    @api.depends('next_calibration_date')
+    def _compute_calibration_status(self):
+        # Keep in line with _refresh_calibration_status, which moves the
+        # statuses of all devices along with the date
+        today = fields.Date.context_today(self)
+        due_soon = today + timedelta(days=self._CALIBRATION_DUE_SOON_DAYS)
+        for device in self:
+            if not device.next_calibration_date:
+                device.calibration_status = 'unknown'
+            elif device.next_calibration_date < today:
+                device.calibration_status = 'overdue'
+            elif device.next_calibration_date <= due_soon:
+                device.calibration_status = 'due_soon'
             else:
-                device.last_measurement_date = False
+                device.calibration_status = 'current'
     
-    @api.constrains('serial_number')
-    def _check_serial_number_unique(self):
+    @api.depends('spc_count', 'spc_m2')
+    def _compute_spc_std_dev(self):
         for device in self:
-            if device.serial_number:
-                duplicate = self.search([
-                    ('serial_number', '=', device.serial_number),
-                    ('id', '!=', device.id)
-                ])
-                if duplicate:
-                    raise ValidationError(
-                        _('Serial number must be unique. Device "%s" already uses this serial number.') 
-                        % duplicate.name
-                    )
-    
-    @api.onchange('calibration_date', 'calibration_interval')
-    def _onchange_calibration_date(self):
-        if self.calibration_date and self.calibration_interval:
-            self.next_calibration_date = fields.Date.add(
-                self.calibration_date, 
-                days=self.calibration_interval
+            device.spc_std_dev = RunningStats.from_moments(
+                device.spc_count, device.spc_mean, device.spc_m2, None, None
+            ).std_dev
+    
+    def _recompute_measurement_stats(self):
+        """Recompute the stored measurement aggregates of these devices.
+        
+        Used after measurements were written outside of the ORM.
+        """
+        if self:
+            self._update_measurement_stats(self.ids)
+    
+    @api.model
+    def _repair_measurement_stats(self):
+        """Recompute the stored measurement aggregates of every device"""
+        return self._update_measurement_stats()
+    
+    @api.model
+    def _update_measurement_stats(self, device_ids=None):
+        """Set record_count and last_measurement_date with a single UPDATE.
+        
+        Aggregates are computed set-wise in SQL for the given devices, or for
+        all devices, archived ones included, when ``device_ids`` is None.
+        Only rows whose values actually change are written. Returns the
+        number of devices updated.
+        """
+        self.env.flush_all()
+        record_where = device_where = ''
+        params = []
+        if device_ids is not None:
+            record_where = 'WHERE device_id IN %s'
+            device_where = 'AND device.id IN %s'
+            params = [tuple(device_ids), tuple(device_ids)]
+        self.env.cr.execute("""
+            UPDATE measurement_device device
+               SET record_count = COALESCE(stats.record_count, 0),
+                   last_measurement_date = stats.last_measurement_date
+              FROM measurement_device target
+         LEFT JOIN (
+                    SELECT device_id,
+                           COUNT(*) AS record_count,
+                           MAX(measurement_date) AS last_measurement_date
+                      FROM measurement_record
+                      {record_where}
+                  GROUP BY device_id
+                   ) stats ON stats.device_id = target.id
+             WHERE device.id = target.id {device_where}
+               AND (device.record_count IS DISTINCT FROM COALESCE(stats.record_count, 0)
+                    OR device.last_measurement_date IS DISTINCT FROM stats.last_measurement_date)
+         RETURNING device.id
+        """.format(record_where=record_where, device_where=device_where), params)
+        updated_ids = [row[0] for row in self.env.cr.fetchall()]
+        self.invalidate_model(['record_count', 'last_measurement_date'])
+        _logger.info("Measurement statistics recomputed for %s devices", len(updated_ids))
+        return len(updated_ids)
+    
+    @api.model
+    def _add_measurement_stats(self, rows):
+        """Add new measurements to the stored aggregates of their devices.
+        
+        ``rows`` are ``(device_id, measurement_date)`` tuples of inserted
+        measurements. Counts are incremented and the last measurement date
+        moved forward in place, without reading the history of the devices.
+        """
+        stats = defaultdict(lambda: [0, None])
+        for device_id, measurement_date in rows:
+            device_stats = stats[device_id]
+            device_stats[0] += 1
+            if device_stats[1] is None or measurement_date > device_stats[1]:
+                device_stats[1] = measurement_date
+        if not stats:
+            return
+        device_ids = list(stats)
+        self.env.cr.execute("""
+            UPDATE measurement_device device
+               SET record_count = COALESCE(device.record_count, 0) + stats.record_count,
+                   last_measurement_date = GREATEST(device.last_measurement_date, stats.last_measurement_date)
+              FROM unnest(%s::int[], %s::int[], %s::timestamp[])
+                AS stats(device_id, record_count, last_measurement_date)
+             WHERE device.id = stats.device_id
+        """, [
+            device_ids,
+            [stats[device_id][0] for device_id in device_ids],
+            [stats[device_id][1] for device_id in device_ids],
+        ])
+        self.browse(device_ids).invalidate_recordset(['record_count', 'last_measurement_date'])
+    
+    def action_recompute_measurement_stats(self):
+        self._recompute_measurement_stats()
+    
+    _QUALITY_FIELDS = ('min_range', 'max_range', 'warning_min_factor', 'warning_max_factor')
+    
+    def write(self, vals):
+        result = super().write(vals)
+        if any(fname in vals for fname in self._QUALITY_FIELDS):
+            self._reclassify_measurements()
+        return result
+    
+    def _get_spc_states(self):
+        """Lock and return the control state of these devices by id.
+        
+        Devices without process control are left out. The rows stay locked
+        until the end of the transaction, so that concurrent imports into
+        the same device feed its state one after the other.
+        """
+        device_ids = [device_id for device_id in self.ids if device_id]
+        if not device_ids:
+            return {}
+        self.flush_recordset(['spc_enabled'])
+        self.env.cr.execute("""
+            SELECT id, spc_count, spc_mean, spc_m2, spc_ewma, spc_zones
+              FROM measurement_device
+             WHERE id IN %s AND spc_enabled
+               FOR NO KEY UPDATE
+        """, [tuple(device_ids)])
+        return {
+            device_id: SpcState(count or 0, mean or 0.0, m2 or 0.0, ewma, zones)
+            for device_id, count, mean, m2, ewma, zones in self.env.cr.fetchall()
+        }
+    
+    @api.model
+    def _save_spc_states(self, states):
+        """Store the control states of ``_get_spc_states`` with a single UPDATE"""
+        if not states:
+            return
+        device_ids = list(states)
+        values = [states[device_id].as_values() for device_id in device_ids]
+        self.env.cr.execute("""
+            UPDATE measurement_device device
+               SET spc_count = state.spc_count, spc_mean = state.spc_mean, spc_m2 = state.spc_m2,
+                   spc_ewma = state.spc_ewma, spc_zones = state.spc_zones
+              FROM unnest(%s::int[], %s::int[], %s::float8[], %s::float8[], %s::float8[], %s::varchar[])
+                AS state(id, spc_count, spc_mean, spc_m2, spc_ewma, spc_zones)
+             WHERE device.id = state.id
+        """, [device_ids] + [[value[column] for value in values] for column in (
+            'spc_count', 'spc_mean', 'spc_m2', 'spc_ewma', 'spc_zones',
+        )])
+        self.browse(device_ids).invalidate_recordset(
+            ['spc_count', 'spc_mean', 'spc_m2', 'spc_ewma', 'spc_zones', 'spc_std_dev']
+        )
+    
+    def action_reset_spc(self):
+        """Restart process control from the next readings, after a process change"""
+        self.write({
+            'spc_count': 0,
+            'spc_mean': 0.0,
+            'spc_m2': 0.0,
+            'spc_ewma': 0.0,
+            'spc_zones': False,
+        })
+    
+    def _get_quality_ranges(self):
+        """Return the ``classify_quality`` bounds and factors by device id"""
+        return {
+            device.id: (
+                device.min_range, device.max_range,
+                device.warning_min_factor, device.warning_max_factor,
+            )
+            for device in self
+        }
+    
+    def _reclassify_measurements(self):
+        """Recompute the quality status of all measurements of these devices.
+        
+        Runs as a single ``UPDATE ... CASE`` mirroring ``classify_quality``
+        and ``apply_control_status`` rather than through the ORM, so that changing the range of a device
+        with millions of measurements never loads them. Only records whose
+        status actually changes are written.
+        """
+        if not self:
+            return 0
+        self.env.flush_all()
+        self.env.cr.execute("""
+            WITH classified AS (
+                SELECT record.id,
+                       CASE
+                           WHEN COALESCE(device.min_range, 0) <> 0
+                                AND COALESCE(device.max_range, 0) <> 0
+                                AND (record.value < device.min_range
+                                     OR record.value > device.max_range) THEN 'out_of_range'
+                           WHEN record.spc_rule IS NOT NULL THEN 'critical'
+                           WHEN COALESCE(device.min_range, 0) = 0
+                                OR COALESCE(device.max_range, 0) = 0 THEN 'good'
+                           WHEN record.value < device.min_range * COALESCE(device.warning_min_factor, %s)
+                                OR record.value > device.max_range * COALESCE(device.warning_max_factor, %s)
+                                THEN 'warning'
+                           ELSE 'good'
+                       END AS quality_status
+                  FROM measurement_record record
+                  JOIN measurement_device device ON device.id = record.device_id
+                 WHERE record.device_id IN %s
             )
+            UPDATE measurement_record record
+               SET quality_status = classified.quality_status
+              FROM classified
+             WHERE record.id = classified.id
+               AND record.quality_status IS DISTINCT FROM classified.quality_status
+        """, [DEFAULT_WARNING_MIN_FACTOR, DEFAULT_WARNING_MAX_FACTOR, tuple(self.ids)])
+        updated_count = self.env.cr.rowcount
+        self.env['measurement.record'].invalidate_model(['quality_status'])
+        if updated_count:
+            # Per-quality counts of the rollups follow the new statuses
+            self.env['measurement.record.rollup']._rebuild(self.ids)
+        _logger.info(
+            "Quality status reclassified for %s measurements of %s devices",
+            updated_count, len(self)
+        )
+        return updated_count
+    
+    @api.model
+    def _refresh_calibration_status(self):
+        """Move the calibration status of every device along with today's date.
+        
+        A single ``UPDATE`` mirroring ``_compute_calibration_status`` writes
+        the devices whose status changes, archived ones included. Returns
+        their ids.
+        """
+        self.flush_model(['next_calibration_date', 'calibration_status'])
+        today = fields.Date.context_today(self)
+        self.env.cr.execute("""
+            WITH refreshed AS (
+                SELECT id,
+                       CASE
+                           WHEN next_calibration_date IS NULL THEN 'unknown'
+                           WHEN next_calibration_date < %(today)s THEN 'overdue'
+                           WHEN next_calibration_date <= %(due_soon)s THEN 'due_soon'
+                           ELSE 'current'
+                       END AS calibration_status
+                  FROM measurement_device
+            )
+            UPDATE measurement_device device
+               SET calibration_status = refreshed.calibration_status
+              FROM refreshed
+             WHERE device.id = refreshed.id
+               AND device.calibration_status IS DISTINCT FROM refreshed.calibration_status
+         RETURNING device.id
+        """, {'today': today, 'due_soon': today + timedelta(days=self._CALIBRATION_DUE_SOON_DAYS)})
+        updated_ids = [row[0] for row in self.env.cr.fetchall()]
+        self.invalidate_model(['calibration_status'])
+        return updated_ids
+    
+    @api.model
+    def _schedule_calibration_activities(self):
+        """Schedule a calibration activity on due devices that have none yet.
+        
+        Open activities are looked up with one search and the missing ones
+        created with one multi-record create. Returns the number created.
+        """
+        devices = self.search([('calibration_status', 'in', ('due_soon', 'overdue'))])
+        if not devices:
+            return 0
+        activity_type = self.env.ref('mail.mail_activity_data_todo', raise_if_not_found=False)
+        summary = _('Calibration due')
+        Activity = self.env['mail.activity'].sudo()
+        scheduled_ids = set(Activity.search([
+            ('res_model', '=', self._name),
+            ('res_id', 'in', devices.ids),
+            ('summary', '=', summary),
+        ]).mapped('res_id'))
+        model_id = self.env['ir.model']._get_id(self._name)
+        activities = Activity.with_context(mail_activity_quick_update=True).create([
+            {
+                'res_model_id': model_id,
+                'res_id': device.id,
+                'activity_type_id': activity_type.id if activity_type else False,
+                'summary': summary,
+                'date_deadline': device.next_calibration_date,
+                'user_id': (device.calibration_user_id or device.create_uid).id,
+            }
+            for device in devices if device.id not in scheduled_ids
+        ])
+        return len(activities)
+    
+    @api.model
+    def _cron_refresh_calibration(self):
+        updated_ids = self._refresh_calibration_status()
+        scheduled_count = self._schedule_calibration_activities()
+        _logger.info(
+            "Calibration status refreshed for %s devices, %s activities scheduled",
+            len(updated_ids), scheduled_count
+        )
     
     def action_view_measurements(self):
         action = self.env.ref('measurement_data_management.action_measurement_record').read()[0]
@@ -173,9 +562,36 @@ class MeasurementDevice(models.Model):
         }
         return action
     
+    def action_export_measurements_csv(self):
+        """Download the measurements of the selected devices as gzipped CSV"""
+        return self.env['measurement.record']._export_csv_action([('device_id', 'in', self.ids)])
+    
     def name_get(self):
         result = []
         for device in self:
             name = f"{device.name} ({device.serial_number})"
             result.append((device.id, name))
         return result
+    
+    @api.model
+    def _name_search(self, name, args=None, operator='ilike', limit=100, name_get_uid=None):
+        """Search devices by name or serial number, as shown by ``name_get``.
+        
+        A term that is an exact serial number, as scanned or typed from a
+        label, is looked up first through the unique index.
+        """
+        args = list(args or [])
+        name = (name or '').strip()
+        if not name:
+            return super()._name_search(name, args, operator, limit, name_get_uid)
+        if operator not in expression.NEGATIVE_TERM_OPERATORS:
+            device_ids = list(self._search(
+                expression.AND([[('serial_number', '=', name)], args]),
+                limit=1, access_rights_uid=name_get_uid
+            ))
+            if device_ids:
+                return device_ids
+            domain = ['|', ('name', operator, name), ('serial_number', operator, name)]
+        else:
+            domain = ['&', ('name', operator, name), ('serial_number', operator, name)]
+        return self._search(expression.AND([domain, args]), limit=limit, access_rights_uid=name_get_uid)
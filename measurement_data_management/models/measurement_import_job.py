@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+import json
+import time
+from collections import deque
+from datetime import timedelta
+from itertools import chain, islice
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class MeasurementImportJob(models.Model):
+    _name = 'measurement.import.job'
+    _inherit = 'measurement.import.mixin'
+    _description = 'Measurement Import Job'
+    _order = 'id desc'
+
+    name = fields.Char(string='Import Name', required=True, default='CSV Import')
+
+    attachment_id = fields.Many2one(
+        'ir.attachment',
+        string='CSV File',
+        required=True,
+        ondelete='restrict',
+        help="File processed by this job"
+    )
+
+    filename = fields.Char(related='attachment_id.name', string='Filename')
+
+    state = fields.Selection([
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+        ('cancelled', 'Cancelled'),
+    ], string='Status', default='queued', required=True, readonly=True, copy=False)
+
+    total_rows = fields.Integer(
+        string='Estimated Rows',
+        readonly=True,
+        help="Number of data rows estimated from the line count of the file"
+    )
+
+    raw_ingestion = fields.Boolean(
+        string='Raw Ingestion (COPY)',
+        readonly=True,
+        help="Chunks are written with PostgreSQL COPY instead of the ORM"
+    )
+
+    rows_done = fields.Integer(
+        string='Rows Processed',
+        readonly=True,
+        copy=False,
+        help="Data rows committed so far, processing resumes after this offset"
+    )
+
+    rows_failed = fields.Integer(string='Rows Failed', readonly=True, copy=False)
+
+    records_created = fields.Integer(string='Records Created', readonly=True, copy=False)
+
+    rows_duplicate = fields.Integer(
+        string='Duplicates Skipped',
+        readonly=True,
+        copy=False,
+        help="Rows whose reading was already recorded"
+    )
+
+    processing_time = fields.Float(
+        string='Processing Time (s)',
+        readonly=True,
+        copy=False,
+        help="Time spent processing chunks, excluding the wait between runs"
+    )
+
+    progress = fields.Float(string='Progress', compute='_compute_progress')
+
+    throughput = fields.Float(string='Throughput (rows/s)', compute='_compute_throughput')
+
+    date_eta = fields.Datetime(string='Estimated Completion', compute='_compute_throughput')
+
+    date_started = fields.Datetime(string='Started', readonly=True, copy=False)
+
+    date_finished = fields.Datetime(string='Finished', readonly=True, copy=False)
+
+    unknown_devices = fields.Text(
+        string='Unknown Devices (JSON)',
+        readonly=True,
+        copy=False,
+        help="Rows skipped per unknown device name"
+    )
+
+    unknown_devices_display = fields.Text(
+        string='Unknown Devices',
+        compute='_compute_unknown_devices_display'
+    )
+
+    error_log = fields.Text(string='Errors', readonly=True, copy=False)
+
+    _CRON_TIME_BUDGET = 240
+    _ERROR_LOG_LIMIT = 100
+
+    @api.depends('rows_done', 'total_rows')
+    def _compute_progress(self):
+        for job in self:
+            if job.total_rows:
+                job.progress = min(100.0, job.rows_done * 100.0 / job.total_rows)
+            else:
+                job.progress = 0.0
+
+    @api.depends('rows_done', 'total_rows', 'processing_time', 'state')
+    def _compute_throughput(self):
+        now = fields.Datetime.now()
+        for job in self:
+            job.throughput = job.rows_done / job.processing_time if job.processing_time else 0.0
+            remaining = max(job.total_rows - job.rows_done, 0)
+            if job.state in ('queued', 'running') and job.throughput and remaining:
+                job.date_eta = now + timedelta(seconds=remaining / job.throughput)
+            else:
+                job.date_eta = False
+
+    @api.depends('unknown_devices')
+    def _compute_unknown_devices_display(self):
+        for job in self:
+            unknown = json.loads(job.unknown_devices or '{}')
+            job.unknown_devices_display = '\n'.join(
+                f"{name}: {count} rows"
+                for name, count in sorted(unknown.items(), key=lambda item: -item[1])
+            )
+
+    def unlink(self):
+        attachments = self.attachment_id
+        result = super().unlink()
+        attachments.sudo().unlink()
+        return result
+
+    def _get_csv_attachment(self):
+        return self.attachment_id.sudo()
+
+    def _enqueue(self):
+        """Estimate the size of the jobs and wake up the job runner"""
+        for job in self:
+            job.write({
+                'state': 'queued',
+                'total_rows': job._count_csv_lines() - (1 if job.has_header else 0),
+            })
+        self.env.ref('measurement_data_management.ir_cron_measurement_import_job')._trigger()
+
+    def action_cancel(self):
+        self.filtered(lambda j: j.state in ('queued', 'running')).write({
+            'state': 'cancelled',
+            'date_finished': fields.Datetime.now(),
+        })
+
+    def action_requeue(self):
+        jobs = self.filtered(lambda j: j.state in ('failed', 'cancelled'))
+        if not jobs:
+            raise UserError(_('Only failed or cancelled jobs can be queued again.'))
+        # Rows already committed are kept, the job resumes where it stopped
+        jobs.write({'state': 'queued', 'date_finished': False})
+        self.env.ref('measurement_data_management.ir_cron_measurement_import_job')._trigger()
+
+    def action_view_imported_records(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Imported Records'),
+            'res_model': 'measurement.record',
+            'view_mode': 'tree,form',
+            'domain': [('import_session_id', '=', self.import_session_id)],
+            'context': {'create': False},
+        }
+
+    @api.model
+    def _cron_process_jobs(self, time_budget=None):
+        """Process queued jobs, and resume interrupted ones, in committed chunks.
+
+        The runner stops taking new chunks once ``time_budget`` seconds are
+        spent, leaving the remaining rows to the next run of the scheduled
+        action so that it never hits the worker time limits. Each job imports
+        its rows with the access rights of the user who queued it.
+        """
+        deadline = time.monotonic() + (time_budget or self._CRON_TIME_BUDGET)
+        for job in self.search([('state', 'in', ('queued', 'running'))], order='id'):
+            if time.monotonic() >= deadline:
+                break
+            job.with_user(job.create_uid)._process(deadline)
+
+    def _process(self, deadline):
+        self.ensure_one()
+        if self.state == 'queued':
+            self.sudo().write({'state': 'running', 'date_started': self.date_started or fields.Datetime.now()})
+            self.env.cr.commit()
+
+        try:
+            finished = self._process_chunks(deadline)
+        except Exception as e:
+            self.env.cr.rollback()
+            _logger.exception("Measurement import job %s failed", self.id)
+            self.sudo().write({
+                'state': 'failed',
+                'date_finished': fields.Datetime.now(),
+                'error_log': self._append_error_log([str(e)]),
+            })
+            self.env.cr.commit()
+            return
+
+        if finished:
+            self.sudo().write({'state': 'done', 'date_finished': fields.Datetime.now()})
+            _logger.info(
+                "Measurement import job %s done: %s records created, %s duplicates skipped, %s rows failed",
+                self.id, self.records_created, self.rows_duplicate, self.rows_failed
+            )
+        self.env.cr.commit()
+
+    def _process_chunks(self, deadline):
+        """Import the rows after the committed offset, committing each chunk.
+
+        Returns whether the end of the file was reached.
+        """
+        with self._open_csv_reader() as csv_reader:
+            header = None
+            if self.has_header:
+                first_row = next(csv_reader, None)
+                if first_row is None:
+                    return True
+                header = [h.strip().lower() for h in first_row]
+
+            # Skip the rows committed by previous runs
+            deque(islice(csv_reader, self.rows_done), maxlen=0)
+
+            sample_rows = list(islice(csv_reader, self._DATE_SAMPLE_SIZE))
+            options = self._prepare_import_options(header, self.import_session_id, sample_rows)
+            if self.date_format == 'auto' and options['date_format']:
+                # Pin the sniffed format so that resumed runs parse alike
+                self.sudo().date_format = options['date_format']
+
+            first_row_num = (2 if self.has_header else 1) + self.rows_done
+            numbered_rows = enumerate(chain(sample_rows, csv_reader), start=first_row_num)
+            for chunk in self._iter_chunks(numbered_rows, max(self.chunk_size or 0, 1)):
+                if self.state != 'running':
+                    return False
+                started = time.perf_counter()
+                created_count, errors = self._import_chunk(chunk, options, raw=self.raw_ingestion)
+                self._record_chunk(
+                    len(chunk), created_count, errors,
+                    options['device_index']['unknown'],
+                    time.perf_counter() - started,
+                    duplicate_count=options.pop('duplicate_count', 0),
+                )
+                options['device_index']['unknown'].clear()
+                self.env.cr.commit()
+                if time.monotonic() >= deadline:
+                    return False
+        return True
+
+    def _record_chunk(self, row_count, created_count, errors, unknown_devices, elapsed, duplicate_count=0):
+        """Store the progress of a chunk, committed together with its records"""
+        vals = {
+            'rows_done': self.rows_done + row_count,
+            'records_created': self.records_created + created_count,
+            'rows_duplicate': self.rows_duplicate + duplicate_count,
+            'rows_failed': self.rows_failed + len(errors) + sum(unknown_devices.values()),
+            'processing_time': self.processing_time + elapsed,
+        }
+        if unknown_devices:
+            unknown = json.loads(self.unknown_devices or '{}')
+            for name, count in unknown_devices.items():
+                unknown[name] = unknown.get(name, 0) + count
+            vals['unknown_devices'] = json.dumps(unknown)
+        if errors:
+            vals['error_log'] = self._append_error_log(errors)
+        self.sudo().write(vals)
+
+    def _append_error_log(self, errors):
+        lines = self.error_log.splitlines() if self.error_log else []
+        room = max(self._ERROR_LOG_LIMIT - len(lines), 0)
+        return '\n'.join(lines + errors[:room])
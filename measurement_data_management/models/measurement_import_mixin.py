@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+import csv
+import io
+from contextlib import contextmanager
+from itertools import islice
+from odoo import models, fields, _
+from odoo.exceptions import ValidationError
+from ..tools.date_parser import make_date_parser
+from ..tools.row_parser import (
+    DATE_SAMPLE_SIZE, RowError, build_device_index, open_binary_csv, parse_row, sniff_row_date_order,
+)
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class MeasurementImportMixin(models.AbstractModel):
+    _name = 'measurement.import.mixin'
+    _description = 'Measurement CSV Import Engine'
+    
+    delimiter = fields.Selection([
+        (',', 'Comma (,)'),
+        (';', 'Semicolon (;)'),
+        ('\t', 'Tab'),
+        ('|', 'Pipe (|)'),
+    ], string='Delimiter', default=',', required=True)
+    
+    has_header = fields.Boolean(string='Has Header Row', default=True)
+    device_id = fields.Many2one('measurement.device', string='Default Device')
+    unit = fields.Char(string='Default Unit')
+    operator = fields.Char(string='Default Operator')
+    date_format = fields.Selection([
+        ('auto', 'Auto-detect'),
+        ('iso', 'YYYY-MM-DD'),
+        ('dmy', 'DD/MM/YYYY'),
+        ('mdy', 'MM/DD/YYYY'),
+    ], string='Date Format', default='auto', required=True,
+        help="Auto-detect sniffs the date format from the first rows of the "
+             "file. Pick a format explicitly to tell day/month apart from "
+             "month/day when the sample is ambiguous.")
+    normalize_device_names = fields.Boolean(
+        string='Loose Device Matching',
+        default=False,
+        help="Match device names and serial numbers ignoring case and "
+             "repeated whitespace"
+    )
+    chunk_size = fields.Integer(
+        string='Chunk Size',
+        default=1000,
+        help="Number of rows created together in batched mode"
+    )
+    import_session_id = fields.Char(string='Import Session', readonly=True)
+    
+    _DATE_SAMPLE_SIZE = DATE_SAMPLE_SIZE
+    
+    def _get_csv_attachment(self):
+        """Return the ``ir.attachment`` holding the CSV file to import"""
+        raise NotImplementedError()
+    
+    @contextmanager
+    def _open_csv_file(self, attachment=None):
+        """Yield a binary file object over the CSV file.
+        
+        The attachment is opened straight from the filestore when possible,
+        so the file is never held in memory as base64 text, decoded bytes
+        and decoded string at the same time. Gzipped files, as written by
+        the CSV export, are decompressed on the fly.
+        """
+        attachment = attachment or self._get_csv_attachment()
+        if attachment.store_fname:
+            binary_file = open(attachment._full_path(attachment.store_fname), 'rb')
+        else:
+            binary_file = io.BytesIO(attachment.raw or b'')
+        with binary_file, open_binary_csv(binary_file) as csv_file:
+            yield csv_file
+    
+    @contextmanager
+    def _open_csv_reader(self):
+        """Yield a ``csv.reader`` streaming rows from the CSV file"""
+        with self._open_csv_file() as binary_file:
+            text_file = io.TextIOWrapper(binary_file, encoding='utf-8', newline='')
+            try:
+                yield csv.reader(text_file, delimiter=self.delimiter)
+            finally:
+                # Leave closing the underlying file to the outer context
+                text_file.detach()
+    
+    def _count_csv_lines(self, attachment=None, block_size=1024 * 1024):
+        """Count the lines of the CSV file in fixed-size blocks.
+        
+        Quoted values spanning several lines are counted once per line, so
+        the result is an upper bound meant for previews and progress only.
+        """
+        count = 0
+        last_block = b''
+        with self._open_csv_file(attachment) as binary_file:
+            for block in iter(lambda: binary_file.read(block_size), b''):
+                count += block.count(b'\n')
+                last_block = block
+        if last_block and not last_block.endswith(b'\n'):
+            count += 1
+        return count
+    
+    def _prepare_import_options(self, header, import_session_id, sample_rows):
+        """Gather everything resolved once per import for ``_parse_row``"""
+        options = self._prepare_parse_options(import_session_id)
+        date_format = options['date_format']
+        if date_format == 'auto':
+            date_format = sniff_row_date_order(sample_rows, header)
+        options.update({
+            'header': header,
+            'date_format': date_format,
+            'parse_date': make_date_parser(date_format),
+        })
+        return options
+    
+    def _prepare_parse_options(self, import_session_id):
+        """Return the picklable parse settings of this import.
+        
+        The same settings drive parsing in this process and in the worker
+        processes of a parallel import; the header and the date parser are
+        added per file.
+        """
+        return {
+            'import_session_id': import_session_id,
+            'device_index': self._build_device_index(),
+            'normalize_device_names': self.normalize_device_names,
+            'default_device_id': self.device_id.id,
+            'default_unit': self.unit,
+            'default_operator': self.operator,
+            'date_format': self.date_format,
+            'now': fields.Datetime.now(),
+        }
+    
+    def _build_device_index(self):
+        """Load the lookup tables used to resolve devices of imported rows.
+        
+        All active devices are read with a single ``search_read`` so that
+        resolving the device of a row is a dictionary lookup. Names that
+        cannot be resolved are counted in ``unknown`` and reported once.
+        """
+        devices = self.env['measurement.device'].search_read(
+            [], ['name', 'serial_number', 'measurement_unit'], order='id'
+        )
+        index = build_device_index(devices, self.normalize_device_names)
+        if self.device_id:
+            index['unit'][self.device_id.id] = self.device_id.measurement_unit
+        return index
+    
+    def _import_chunk(self, chunk, options, raw=False):
+        """Parse a chunk of numbered rows and create it with a single create.
+        
+        With ``raw``, the chunk is written with ``COPY`` instead of the ORM
+        and the touched devices are collected in ``options`` so that their
+        aggregates can be refreshed once at the end of the import. Readings
+        already recorded are skipped and counted in
+        ``options['duplicate_count']``.
+        Returns the number of records created and the list of row errors.
+        """
+        numbered_vals = []
+        errors = []
+        for row_num, row in chunk:
+            try:
+                record_data = self._parse_row(row, options)
+                if record_data:
+                    numbered_vals.append((row_num, record_data))
+            except Exception as e:
+                errors.append(f"Row {row_num}: {str(e)}")
+        
+        if not numbered_vals:
+            return 0, errors
+        if raw:
+            created_count, duplicate_count = self._ingest_chunk_raw(numbered_vals, errors)
+        else:
+            numbered_vals, duplicate_count = self._skip_duplicate_rows(numbered_vals)
+            created_count = self._create_chunk(numbered_vals, errors) if numbered_vals else 0
+        options['duplicate_count'] = options.get('duplicate_count', 0) + duplicate_count
+        return created_count, errors
+    
+    def _skip_duplicate_rows(self, numbered_vals):
+        """Drop the parsed rows whose reading is already recorded.
+        
+        Returns the remaining rows and the number of rows dropped.
+        """
+        duplicates = self.env['measurement.record']._flag_duplicate_readings(
+            [vals for _row_num, vals in numbered_vals]
+        )
+        remaining = [item for item, duplicate in zip(numbered_vals, duplicates) if not duplicate]
+        return remaining, len(numbered_vals) - len(remaining)
+    
+    def _create_chunk(self, numbered_vals, errors):
+        """Create a chunk of parsed rows with a single create call.
+        
+        If the batch fails as a whole, the chunk is retried row by row so
+        that one bad row only rejects itself.
+        """
+        Record = self.env['measurement.record']
+        try:
+            with self.env.cr.savepoint():
+                records = Record.create([vals for _row_num, vals in numbered_vals])
+                self.env.flush_all()
+            created_count = len(records)
+        except Exception:
+            created_count = 0
+            for row_num, vals in numbered_vals:
+                try:
+                    with self.env.cr.savepoint():
+                        Record.create(vals)
+                        self.env.flush_all()
+                    created_count += 1
+                except Exception as e:
+                    errors.append(f"Row {row_num}: {str(e)}")
+        # Keep the cache bounded by the chunk size rather than the file size
+        self.env.invalidate_all()
+        return created_count
+    
+    def _ingest_chunk_raw(self, numbered_vals, errors):
+        """Write a chunk of parsed rows with ``COPY``, all or nothing.
+        
+        Returns the number of records created and of duplicate rows skipped.
+        """
+        try:
+            with self.env.cr.savepoint():
+                created_count = self.env['measurement.record']._ingest_raw(
+                    [vals for _row_num, vals in numbered_vals]
+                )
+            duplicate_count = len(numbered_vals) - created_count
+        except Exception as e:
+            created_count = duplicate_count = 0
+            errors.append(f"Rows {numbered_vals[0][0]}-{numbered_vals[-1][0]}: {str(e)}")
+        self.env.invalidate_all()
+        return created_count, duplicate_count
+    
+    @staticmethod
+    def _iter_chunks(iterable, size):
+        """Yield lists of at most ``size`` items from ``iterable``"""
+        iterator = iter(iterable)
+        while True:
+            chunk = list(islice(iterator, size))
+            if not chunk:
+                return
+            yield chunk
+    
+    def _parse_row(self, row, options):
+        """Parse a single CSV row into measurement record data"""
+        try:
+            return parse_row(row, options)
+        except RowError as e:
+            raise ValidationError(self._row_error_message(e.code, e.value))
+    
+    def _row_error_message(self, code, value):
+        if code == 'date':
+            return _('Invalid date format: %s') % value
+        if code == 'value_required':
+            return _('Measurement value is required')
+        return _('Invalid measurement value: %s') % value
@@ -1,6 +1,20 @@
 # -*- coding: utf-8 -*-
+import csv
+import io
+import json
+import math
+import zlib
+from collections import Counter, defaultdict
+from urllib.parse import urlencode
 from odoo import models, fields, api, _
-from odoo.exceptions import ValidationError
+from odoo.exceptions import UserError, ValidationError
+from odoo.tools import str2bool
+from odoo.tools.sql import create_index, create_unique_index
+from ..tools.date_parser import parse_timestamp
+from ..tools.quality import classify_quality
+from ..tools.row_parser import CSV_COLUMNS, CSV_DATE_FORMAT, reading_fingerprint
+from ..tools.spc import SPC_RULES, apply_control_status
+from ..tools.statistics import DEFAULT_BINS, DEFAULT_PERCENTILES, describe
 import logging
 
 _logger = logging.getLogger(__name__)
@@ -70,6 +84,15 @@ class MeasurementRecord(models.Model):
         ('out_of_range', 'Out of Range'),
     ], string='Quality Status', compute='_compute_quality_status', store=True)
     
+    spc_rule = fields.Selection(
+        SPC_RULES,
+        string='Control Rule',
+        readonly=True,
+        copy=False,
+        help="Process control rule this reading violated when it was "
+             "recorded, which makes it critical"
+    )
+    
     temperature = fields.Float(
         string='Ambient Temperature',
         help="Ambient temperature during measurement"
@@ -98,9 +121,18 @@ class MeasurementRecord(models.Model):
     
     import_session_id = fields.Char(
         string='Import Session',
+        index=True,
         help="Session ID for CSV imports"
     )
     
+    import_fingerprint = fields.Char(
+        string='Import Fingerprint',
+        readonly=True,
+        copy=False,
+        help="Hash of the device, date, value and unit of a reading as it "
+             "was imported or pushed, so that it is only recorded once"
+    )
+    
     is_validated = fields.Boolean(
         string='Validated',
         default=False,
@@ -119,26 +151,618 @@ class MeasurementRecord(models.Model):
         help="Date when measurement was validated"
     )
     
+    _MACHINE_MEASUREMENT_TYPES = ('imported', 'automatic')
+    
+    def init(self):
+        super().init()
+        # Default list order, and date filters without a device
+        create_index(
+            self._cr, 'measurement_record_date_id_index', self._table,
+            ['measurement_date DESC', 'id DESC']
+        )
+        # Measurements of a device in list order, also serves device
+        # statistics, rollup refreshes and the device report
+        create_index(
+            self._cr, 'measurement_record_device_date_id_index', self._table,
+            ['device_id', 'measurement_date DESC', 'id DESC']
+        )
+        # Validation backlog, a small fraction of the table once validated
+        create_index(
+            self._cr, 'measurement_record_unvalidated_index', self._table,
+            ['device_id', 'measurement_date DESC'],
+            where='is_validated IS NOT TRUE'
+        )
+        # Quality issues, rare compared to good measurements
+        create_index(
+            self._cr, 'measurement_record_quality_issue_index', self._table,
+            ['device_id', 'measurement_date DESC'],
+            where="quality_status IN ('warning', 'critical', 'out_of_range')"
+        )
+        # One record per imported reading, with the partition key so that
+        # it survives partitioning
+        create_unique_index(
+            self._cr, 'measurement_record_import_fingerprint_index', self._table,
+            ['import_fingerprint', 'measurement_date']
+        )
+    
+    @api.model_create_multi
+    def create(self, vals_list):
+        pending = [vals for vals in vals_list if vals.get('name', _('New')) == _('New')]
+        if pending:
+            names = self._reserve_sequence_names(len(pending))
+            for vals, name in zip(pending, names):
+                vals['name'] = name
+        
+        records = self._create_with_tracking_policy(vals_list)
+        records._evaluate_spc()
+        self.env['measurement.record.rollup']._add_measurements(records._get_rollup_rows())
+        return records
+    
+    def _create_with_tracking_policy(self, vals_list):
+        if self._track_machine_measurements() or self.env.context.get('tracking_disable'):
+            return super().create(vals_list)
+        machine_indexes = {
+            index for index, vals in enumerate(vals_list)
+            if vals.get('measurement_type') in self._MACHINE_MEASUREMENT_TYPES
+        }
+        if not machine_indexes:
+            return super().create(vals_list)
+        
+        # Machine-generated measurements skip tracking values, the creation
+        # message and follower subscription
+        untracked = super(MeasurementRecord, self.with_context(tracking_disable=True)).create(
+            [vals for index, vals in enumerate(vals_list) if index in machine_indexes]
+        )
+        if len(machine_indexes) == len(vals_list):
+            return untracked.with_env(self.env)
+        tracked = super().create(
+            [vals for index, vals in enumerate(vals_list) if index not in machine_indexes]
+        )
+        # Return the records in the order of vals_list
+        untracked_ids = iter(untracked.ids)
+        tracked_ids = iter(tracked.ids)
+        return self.browse([
+            next(untracked_ids) if index in machine_indexes else next(tracked_ids)
+            for index in range(len(vals_list))
+        ])
+    
+    _ROLLUP_FIELDS = ('device_id', 'measurement_date', 'value')
+    
+    def write(self, vals):
+        if not any(fname in vals for fname in self._ROLLUP_FIELDS):
+            return super().write(vals)
+        old_keys = self._get_rollup_keys()
+        self._check_retained_keys(old_keys)
+        result = super().write(vals)
+        self.env.flush_all()
+        new_keys = self._get_rollup_keys()
+        self._check_retained_keys(new_keys)
+        self.env['measurement.record.rollup']._refresh_buckets(old_keys + new_keys)
+        return result
+    
+    def unlink(self):
+        keys = self._get_rollup_keys()
+        self._check_retained_keys(keys)
+        result = super().unlink()
+        self.env['measurement.record.rollup']._refresh_buckets(keys)
+        return result
+    
+    @api.model
+    def _check_retained_keys(self, keys):
+        """Refuse to change measurements kept past the retention cutoff of their device.
+        
+        Validated measurements and measurements with attachments outlive
+        the removal of the raw data, but the rollups of that period are
+        final and can no longer be recomputed: their device, date and value
+        are frozen and they cannot be deleted.
+        """
+        devices = self.env['measurement.device'].browse({device_id for device_id, _date in keys if device_id})
+        cutoffs = {device.id: device.retention_cutoff for device in devices if device.retention_cutoff}
+        if any(
+            device_id in cutoffs and measurement_date and measurement_date < cutoffs[device_id]
+            for device_id, measurement_date in keys
+        ):
+            raise UserError(_(
+                'Measurements older than the retention cutoff of their device are only kept '
+                'as final rollups: their device, date and value cannot be changed, nor can '
+                'they be deleted.'
+            ))
+    
+    def _evaluate_spc(self):
+        """Feed new readings, in creation order, to the control state of their devices.
+        
+        Only the stored state of each device is read and written, never its
+        history. Readings violating a rule get it in ``spc_rule`` and
+        become critical.
+        """
+        states = self.device_id._get_spc_states()
+        if not states:
+            return
+        flagged = defaultdict(list)
+        for record in self:
+            state = states.get(record.device_id.id)
+            if state:
+                rule = state.evaluate(record.value)
+                if rule:
+                    flagged[rule].append(record.id)
+        self.env['measurement.device']._save_spc_states(states)
+        for rule, record_ids in flagged.items():
+            self.browse(record_ids).write({'spc_rule': rule})
+    
+    @api.model
+    def _set_import_fingerprint(self, vals):
+        """Fingerprint a reading dated by its source.
+        
+        Readings dated by the server on arrival share that date with the
+        rest of their batch: equal values are then distinct readings, not
+        duplicates, and get no fingerprint.
+        """
+        vals['import_fingerprint'] = vals.get('measurement_date') and reading_fingerprint(
+            vals['device_id'],
+            fields.Datetime.to_datetime(vals['measurement_date']),
+            vals['value'],
+            vals.get('unit'),
+        ) or False
+    
+    @api.model
+    def _flag_duplicate_readings(self, vals_list):
+        """Fingerprint readings about to be imported and flag the ones already recorded.
+        
+        Readings keep the fingerprint their parser gave them, none when they
+        were dated by the server. The fingerprints are looked up with a
+        single query over the unique index; a reading repeated within
+        ``vals_list`` is a duplicate from its second occurrence. Returns one
+        boolean per reading, in order.
+        """
+        for vals in vals_list:
+            if 'import_fingerprint' not in vals:
+                self._set_import_fingerprint(vals)
+        fingerprinted = [vals for vals in vals_list if vals['import_fingerprint']]
+        if not fingerprinted:
+            return [False] * len(vals_list)
+        self.flush_model(['import_fingerprint'])
+        dates = [fields.Datetime.to_datetime(vals['measurement_date']).replace(microsecond=0) for vals in fingerprinted]
+        self.env.cr.execute("""
+            SELECT import_fingerprint
+              FROM measurement_record
+             WHERE import_fingerprint = ANY(%s)
+               AND measurement_date BETWEEN %s AND %s
+        """, [list({vals['import_fingerprint'] for vals in fingerprinted}), min(dates), max(dates)])
+        seen = {row[0] for row in self.env.cr.fetchall()}
+        duplicates = []
+        for vals in vals_list:
+            fingerprint = vals['import_fingerprint']
+            duplicates.append(bool(fingerprint) and fingerprint in seen)
+            if fingerprint:
+                seen.add(fingerprint)
+        return duplicates
+    
+    def _get_rollup_keys(self):
+        return [(record.device_id.id, record.measurement_date) for record in self]
+    
+    def _get_rollup_rows(self):
+        return [
+            (record.device_id.id, record.measurement_date, record.value, record.quality_status)
+            for record in self
+        ]
+    
+    @api.model
+    def _track_machine_measurements(self):
+        """Whether imported and automatic measurements are tracked in the chatter"""
+        return str2bool(
+            self.env['ir.config_parameter'].sudo().get_param(
+                'measurement_data_management.track_machine_measurements', 'False'
+            ),
+            default=False,
+        )
+    
     @api.model
-    def create(self, vals):
-        if vals.get('name', _('New')) == _('New'):
-            vals['name'] = self.env['ir.sequence'].next_by_code('measurement.record') or _('New')
-        return super().create(vals)
+    def _reserve_sequence_names(self, count):
+        """Reserve ``count`` references from the measurement record sequence.
+        
+        Standard sequences are advanced with a single ``nextval`` over a
+        series and no-gap sequences with a single locked update, so batched
+        imports pay one query per chunk instead of one per record.
+        """
+        IrSequence = self.env['ir.sequence']
+        IrSequence.check_access_rights('read')
+        company_id = self.env.company.id
+        sequences = IrSequence.search([
+            ('code', '=', 'measurement.record'),
+            ('company_id', 'in', [company_id, False]),
+        ], order='company_id')
+        sequence = sequences.filtered(lambda s: s.company_id.id == company_id)[:1] or sequences[:1]
+        
+        if count == 1 or not sequence or sequence.use_date_range:
+            return [
+                IrSequence.next_by_code('measurement.record') or _('New')
+                for _i in range(count)
+            ]
+        
+        if sequence.implementation == 'standard':
+            self.env.cr.execute(
+                "SELECT nextval(%s) FROM generate_series(1, %s)",
+                ('ir_sequence_%03d' % sequence.id, count)
+            )
+            numbers = [row[0] for row in self.env.cr.fetchall()]
+        else:
+            self.env.cr.execute(
+                "SELECT number_next FROM ir_sequence WHERE id = %s FOR UPDATE NOWAIT",
+                (sequence.id,)
+            )
+            number_next = self.env.cr.fetchone()[0]
+            self.env.cr.execute(
+                "UPDATE ir_sequence SET number_next = number_next + %s WHERE id = %s",
+                (sequence.number_increment * count, sequence.id)
+            )
+            sequence.invalidate_recordset(['number_next'])
+            numbers = [number_next + i * sequence.number_increment for i in range(count)]
+        
+        return [sequence.get_next_char(number) for number in numbers]
     
-    @api.depends('value', 'device_id.min_range', 'device_id.max_range')
+    @api.model
+    def _ingest_raw(self, vals_list):
+        """Insert measurements with ``COPY ... FROM STDIN``, bypassing the ORM.
+        
+        Meant for large machine-generated imports: references come from a
+        bulk reserved sequence range, ``quality_status`` is computed in the
+        same pass from the device ranges and mail.thread tracking is skipped.
+        Readings already recorded, by their fingerprint, are skipped.
+        The ORM cache is invalidated afterwards and the inserted rows are
+        added to the stored aggregates of the devices. Returns the number of
+        inserted rows.
+        """
+        return len(self._copy_readings(vals_list))
+    
+    @api.model
+    def _copy_readings(self, vals_list):
+        """Do the work of ``_ingest_raw``, returning the fingerprints of the inserted rows.
+        
+        One fingerprint per inserted row, None for readings dated by the server.
+        """
+        if not vals_list:
+            return []
+        self.check_access_rights('create')
+        self.env.flush_all()
+        duplicates = self._flag_duplicate_readings(vals_list)
+        vals_list = [vals for vals, duplicate in zip(vals_list, duplicates) if not duplicate]
+        if not vals_list:
+            return []
+        
+        device_ids = {vals['device_id'] for vals in vals_list}
+        devices = self.env['measurement.device'].browse(device_ids)
+        ranges = devices._get_quality_ranges()
+        spc_states = devices._get_spc_states()
+        names = self._reserve_sequence_names(len(vals_list))
+        now = fields.Datetime.to_string(fields.Datetime.now())
+        uid = self.env.uid
+        
+        columns = [
+            'name', 'device_id', 'measurement_date', 'value', 'unit', 'operator',
+            'notes', 'measurement_type', 'import_session_id', 'quality_status',
+            'spc_rule', 'is_validated', 'import_fingerprint',
+            'create_uid', 'create_date', 'write_uid', 'write_date',
+        ]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+        for vals, name in zip(vals_list, names):
+            value = float(vals['value'])
+            spc_state = spc_states.get(vals['device_id'])
+            spc_rule = spc_state.evaluate(value) if spc_state else None
+            quality_status = apply_control_status(classify_quality(value, *ranges[vals['device_id']]), spc_rule)
+            writer.writerow([
+                name,
+                vals['device_id'],
+                fields.Datetime.to_string(vals['measurement_date']),
+                value,
+                vals.get('unit') or None,
+                vals.get('operator') or None,
+                vals.get('notes') or None,
+                vals.get('measurement_type') or 'imported',
+                vals.get('import_session_id') or None,
+                quality_status,
+                spc_rule,
+                False,
+                vals['import_fingerprint'] or None,
+                uid, now, uid, now,
+            ])
+        buffer.seek(0)
+        
+        # COPY cannot skip conflicting rows: readings recorded by a
+        # concurrent import since the lookup are dropped from a staging copy
+        cr = self.env.cr
+        column_list = ', '.join(columns)
+        cr.execute(
+            "CREATE TEMP TABLE measurement_record_staging ON COMMIT DROP AS "
+            "SELECT %s FROM measurement_record WITH NO DATA" % column_list
+        )
+        # Empty values are written quoted, FORCE_NULL stores them as NULL
+        # like the ORM does
+        cr.copy_expert(
+            "COPY measurement_record_staging (%s) FROM STDIN WITH (FORMAT csv, "
+            "FORCE_NULL (unit, operator, notes, import_session_id, spc_rule, import_fingerprint))" % column_list,
+            buffer
+        )
+        cr.execute("""
+            INSERT INTO measurement_record (%s)
+            SELECT %s FROM measurement_record_staging
+            ON CONFLICT DO NOTHING
+            RETURNING device_id, measurement_date, value, quality_status, import_fingerprint
+        """ % (column_list, column_list))
+        inserted_rows = cr.fetchall()
+        cr.execute("DROP TABLE measurement_record_staging")
+        
+        self.invalidate_model()
+        self.env['measurement.device']._save_spc_states(spc_states)
+        self.env['measurement.record.rollup']._add_measurements([row[:4] for row in inserted_rows])
+        self.env['measurement.device']._add_measurement_stats([row[:2] for row in inserted_rows])
+        return [row[4] for row in inserted_rows]
+    
+    @api.model
+    def _ingest_readings(self, readings, import_session_id=None):
+        """Validate and insert readings pushed by devices or gateways.
+        
+        ``readings`` are dictionaries with a device ``serial_number``, a
+        ``value`` and optionally a ``timestamp`` (ISO 8601 or POSIX seconds,
+        now by default), ``unit``, ``operator`` and ``notes``. Devices are
+        resolved with a single search and the valid readings are written
+        with one ``COPY``. Readings already recorded are answered as
+        duplicates, so that a gateway can safely resend a batch. Returns
+        one result per reading, in order.
+        """
+        serials = {
+            reading.get('serial_number') for reading in readings
+            if isinstance(reading, dict) and isinstance(reading.get('serial_number'), str)
+        }
+        devices = {
+            device['serial_number']: device
+            for device in self.env['measurement.device'].search_read(
+                [('serial_number', 'in', list(serials))], ['serial_number', 'measurement_unit']
+            )
+        }
+        now = fields.Datetime.now()
+        results = []
+        vals_list = []
+        for reading in readings:
+            try:
+                vals = self._parse_reading(reading, devices, now)
+            except ValidationError as e:
+                results.append({'status': 'error', 'error': e.args[0]})
+                continue
+            vals['import_session_id'] = import_session_id
+            vals_list.append(vals)
+            results.append({'status': 'created'})
+        # Gateways resend readings they got no answer for: whatever was not
+        # inserted, already recorded or repeated in the batch, is a duplicate
+        inserted = set(filter(None, self._copy_readings(vals_list)))
+        pending_vals = iter(vals_list)
+        for result in results:
+            if result['status'] != 'created':
+                continue
+            fingerprint = next(pending_vals)['import_fingerprint']
+            if not fingerprint:
+                continue
+            if fingerprint in inserted:
+                inserted.discard(fingerprint)
+            else:
+                result['status'] = 'duplicate'
+        return results
+    
+    @api.model
+    def _parse_reading(self, reading, devices, now):
+        """Turn a pushed reading into the values of an automatic measurement"""
+        if not isinstance(reading, dict):
+            raise ValidationError(_('A reading must be an object'))
+        device = devices.get(reading.get('serial_number'))
+        if not device:
+            raise ValidationError(_('Unknown device serial number: %s') % reading.get('serial_number'))
+        value = reading.get('value')
+        try:
+            # JSON integers are unbounded, beyond the float range they overflow
+            valid = not isinstance(value, bool) and isinstance(value, (int, float)) and math.isfinite(float(value))
+        except OverflowError:
+            valid = False
+        if not valid:
+            raise ValidationError(_('Invalid measurement value: %s') % value)
+        measurement_date = now
+        if reading.get('timestamp') is not None:
+            try:
+                measurement_date = parse_timestamp(reading['timestamp'])
+            except (ValueError, OverflowError, OSError):
+                raise ValidationError(_('Invalid date format: %s') % reading['timestamp'])
+        vals = {
+            'device_id': device['id'],
+            'measurement_date': measurement_date,
+            'value': value,
+            'unit': str(reading.get('unit') or device['measurement_unit'] or ''),
+            'operator': str(reading.get('operator') or ''),
+            'notes': str(reading.get('notes') or ''),
+            'measurement_type': 'automatic',
+        }
+        if reading.get('timestamp') is not None:
+            self._set_import_fingerprint(vals)
+        else:
+            vals['import_fingerprint'] = False
+        return vals
+    
+    @api.model
+    def _iter_rows(self, domain, select, joins='', chunk_size=10000):
+        """Yield the rows of the records matching ``domain``, a chunk at a time.
+        
+        ``select`` lists SQL expressions over ``"measurement_record"`` and
+        the tables of the ``joins`` clause. Rows come in measurement date
+        order from a server-side cursor, so only one chunk is ever in memory
+        whatever the number of records.
+        """
+        self.check_access_rights('read')
+        self.env.flush_all()
+        query = self._where_calc(domain)
+        self._apply_ir_rules(query, 'read')
+        from_clause, where_clause, params = query.get_sql()
+        cr = self.env.cr
+        cr.execute("""
+            DECLARE measurement_rows NO SCROLL CURSOR FOR
+             SELECT {select}
+               FROM {from_clause} {joins}
+              WHERE {where_clause}
+           ORDER BY "measurement_record".measurement_date, "measurement_record".id
+        """.format(
+            select=', '.join(select), from_clause=from_clause, joins=joins,
+            where_clause=where_clause or 'TRUE',
+        ), params)
+        try:
+            while True:
+                cr.execute("FETCH FORWARD %s FROM measurement_rows", [chunk_size])
+                rows = cr.fetchall()
+                if not rows:
+                    return
+                yield rows
+        finally:
+            cr.execute("CLOSE measurement_rows")
+    
+    @api.model
+    def _iter_csv_export(self, domain, compress=False, chunk_size=10000):
+        """Yield the records matching ``domain`` as CSV, in chunks of bytes.
+        
+        Columns follow the import layout (see ``tools.row_parser.CSV_COLUMNS``)
+        so that the file can be imported in another database as is. With
+        ``compress``, the chunks form a gzip stream.
+        """
+        compressor = zlib.compressobj(wbits=31) if compress else None
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(CSV_COLUMNS)
+        for rows in self._iter_rows(domain, [
+            'export_device.name', 'export_device.serial_number', '"measurement_record".measurement_date',
+            '"measurement_record".value', '"measurement_record".unit', '"measurement_record".operator',
+            '"measurement_record".notes',
+        ], joins='JOIN measurement_device export_device ON export_device.id = "measurement_record".device_id',
+                chunk_size=chunk_size):
+            writer.writerows(
+                (device, serial_number, measurement_date.strftime(CSV_DATE_FORMAT), value, unit, operator, notes)
+                for device, serial_number, measurement_date, value, unit, operator, notes in rows
+            )
+            data = buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            yield compressor.compress(data) if compressor else data
+        data = buffer.getvalue().encode('utf-8')
+        if compressor:
+            data = compressor.compress(data) + compressor.flush()
+        if data:
+            yield data
+    
+    def action_export_csv(self):
+        """Download the selected records, or the whole selected domain, as gzipped CSV"""
+        return self._export_csv_action(self._get_selection_domain(self.ids) or [('id', 'in', self.ids)])
+    
+    @api.model
+    def _export_csv_action(self, domain):
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/measurement/export/csv?' + urlencode({'domain': json.dumps(domain), 'compress': 'gzip'}),
+            'target': 'self',
+        }
+    
+    @api.model
+    def _read_value_statistics(self, domain, **kwargs):
+        """Return the statistics of the records matching ``domain`` by device id.
+        
+        The values of all devices are fetched sorted by a single query and
+        described in one pass per device, see ``tools.statistics.describe``
+        for the keys and the keyword arguments.
+        """
+        self.check_access_rights('read')
+        self.flush_model(['device_id', 'value'])
+        query = self._where_calc(domain)
+        self._apply_ir_rules(query, 'read')
+        from_clause, where_clause, params = query.get_sql()
+        self.env.cr.execute("""
+            SELECT "measurement_record".device_id,
+                   ARRAY_AGG("measurement_record".value ORDER BY "measurement_record".value)
+              FROM {from_clause}
+             WHERE {where_clause}
+          GROUP BY "measurement_record".device_id
+        """.format(from_clause=from_clause, where_clause=where_clause or 'TRUE'), params)
+        return {
+            device_id: describe(values, **kwargs)
+            for device_id, values in self.env.cr.fetchall()
+        }
+    
+    @api.model
+    def _read_value_distribution(self, domain, bounds, ranks=DEFAULT_PERCENTILES, bins=DEFAULT_BINS):
+        """Return the percentiles and histogram of the matching records by device id.
+        
+        Both are computed in the database, with ``percentile_cont`` and
+        ``width_bucket``, so no value leaves it. ``bounds`` maps device ids to
+        the ``(minimum, maximum)`` of their values, as known from the rollups,
+        and only these devices are described. Histograms are lists of
+        ``(lower, upper, count)`` tuples.
+        """
+        if not bounds:
+            return {}
+        self.check_access_rights('read')
+        self.flush_model(['device_id', 'value'])
+        query = self._where_calc(domain + [('device_id', 'in', list(bounds))])
+        self._apply_ir_rules(query, 'read')
+        from_clause, where_clause, params = query.get_sql()
+        where_clause = where_clause or 'TRUE'
+        
+        distribution = {device_id: {'percentiles': {}, 'histogram': []} for device_id in bounds}
+        self.env.cr.execute("""
+            SELECT "measurement_record".device_id,
+                   PERCENTILE_CONT(%s::float8[]) WITHIN GROUP (ORDER BY "measurement_record".value)
+              FROM {from_clause}
+             WHERE {where_clause}
+          GROUP BY "measurement_record".device_id
+        """.format(from_clause=from_clause, where_clause=where_clause),
+            [[rank / 100.0 for rank in ranks]] + params)
+        for device_id, values in self.env.cr.fetchall():
+            distribution[device_id]['percentiles'] = dict(zip(ranks, values))
+        
+        edges = {}
+        for device_id, (minimum, maximum) in bounds.items():
+            if minimum == maximum:
+                minimum, maximum = minimum - 0.5, maximum + 0.5
+            edges[device_id] = (minimum, maximum)
+        device_ids = list(edges)
+        self.env.cr.execute("""
+            WITH bounds AS (
+                SELECT * FROM unnest(%s::int[], %s::float8[], %s::float8[])
+                    AS bounds(device_id, lower_bound, upper_bound)
+            )
+            SELECT "measurement_record".device_id,
+                   LEAST(WIDTH_BUCKET("measurement_record".value, bounds.lower_bound, bounds.upper_bound, %s), %s),
+                   COUNT(*)
+              FROM {from_clause}
+              JOIN bounds ON bounds.device_id = "measurement_record".device_id
+             WHERE {where_clause}
+          GROUP BY 1, 2
+        """.format(from_clause=from_clause, where_clause=where_clause), [
+            device_ids,
+            [edges[device_id][0] for device_id in device_ids],
+            [edges[device_id][1] for device_id in device_ids],
+            bins, bins,
+        ] + params)
+        counts = {(device_id, bucket): count for device_id, bucket, count in self.env.cr.fetchall()}
+        for device_id, (minimum, maximum) in edges.items():
+            width = (maximum - minimum) / bins
+            distribution[device_id]['histogram'] = [
+                (minimum + width * index, minimum + width * (index + 1), counts.get((device_id, index + 1), 0))
+                for index in range(bins)
+            ]
+        return distribution
+    
+    @api.depends('value', 'device_id', 'spc_rule')
     def _compute_quality_status(self):
+        # Range edits on devices are applied set-wise by the device itself,
+        # see measurement.device._reclassify_measurements
+        ranges = self.device_id._get_quality_ranges()
         for record in self:
-            if record.device_id.min_range and record.device_id.max_range:
-                min_range = record.device_id.min_range
-                max_range = record.device_id.max_range
-                value = record.value
-                
-                if value < min_range or value > max_range:
-                    record.quality_status = 'out_of_range'
-                elif value < min_range * 1.1 or value > max_range * 0.9:
-                    record.quality_status = 'warning'
-                else:
-                    record.quality_status = 'good'
+            if record.device_id:
+                record.quality_status = apply_control_status(
+                    classify_quality(record.value, *ranges[record.device_id.id]), record.spc_rule
+                )
             else:
                 record.quality_status = 'good'
     
@@ -148,6 +772,9 @@ class MeasurementRecord(models.Model):
             self.unit = self.device_id.measurement_unit or ''
     
     def action_validate(self):
+        if len(self) > 1:
+            self._mass_set_validation([('id', 'in', self.ids)], True)
+            return
         self.write({
             'is_validated': True,
             'validated_by': self.env.user.id,
@@ -156,6 +783,9 @@ class MeasurementRecord(models.Model):
         self.message_post(body=_("Measurement validated by %s") % self.env.user.name)
     
     def action_invalidate(self):
+        if len(self) > 1:
+            self._mass_set_validation([('id', 'in', self.ids)], False)
+            return
         self.write({
             'is_validated': False,
             'validated_by': False,
@@ -163,6 +793,87 @@ class MeasurementRecord(models.Model):
         })
         self.message_post(body=_("Measurement validation removed by %s") % self.env.user.name)
     
+    @api.model
+    def _get_selection_domain(self, active_ids=None):
+        """Return the domain of the records selected in the list view.
+        
+        The list sends its search domain along with the selected ids in any
+        case. The domain only stands for the selection when the whole domain
+        was selected, which the web client signals by sending as many ids as
+        its limit, or when no ids are given at all. Returns None when there
+        is no selection.
+        """
+        context = self.env.context
+        if active_ids is None:
+            active_ids = context.get('active_ids') or []
+        active_domain = context.get('active_domain')
+        if active_domain is not None:
+            limit = int(self.env['ir.config_parameter'].sudo().get_param('web.active_ids_limit', 20000))
+            if not active_ids or len(active_ids) >= limit:
+                return list(active_domain)
+        if active_ids:
+            return [('id', 'in', list(active_ids))]
+        return None
+    
+    @api.model
+    def _mass_set_validation(self, domain, validated, chunk_size=50000):
+        """Validate, or remove the validation of, the records matching ``domain``.
+        
+        Records are updated with one ``UPDATE`` per chunk instead of a
+        tracked write, and a single summary is posted in the chatter of each
+        device rather than one message per record. Returns the number of
+        updated records per device id.
+        """
+        self.check_access_rights('write')
+        self.env.flush_all()
+        query = self._where_calc(domain + [('is_validated', '!=' if validated else '=', True)])
+        self._apply_ir_rules(query, 'write')
+        from_clause, where_clause, params = query.get_sql()
+        now = fields.Datetime.now()
+        uid = self.env.uid
+        counts = Counter()
+        while True:
+            self.env.cr.execute("""
+                UPDATE measurement_record
+                   SET is_validated = %s, validated_by = %s, validated_date = %s,
+                       write_uid = %s, write_date = %s
+                 WHERE id IN (
+                    SELECT "measurement_record".id FROM {from_clause} WHERE {where_clause} LIMIT %s
+                 )
+             RETURNING device_id, batch_id
+            """.format(from_clause=from_clause, where_clause=where_clause or 'TRUE'), [
+                validated, uid if validated else None, now if validated else None, uid, now,
+                *params, chunk_size,
+            ])
+            rows = self.env.cr.fetchall()
+            counts.update(rows)
+            if len(rows) < chunk_size:
+                break
+        self.invalidate_model(['is_validated', 'validated_by', 'validated_date', 'write_uid', 'write_date'])
+        
+        batches_by_device = {}
+        for (device_id, batch_id), count in counts.items():
+            batches_by_device.setdefault(device_id, Counter())[batch_id or ''] += count
+        for device in self.env['measurement.device'].browse(batches_by_device):
+            device.message_post(body=self._get_validation_summary(batches_by_device[device.id], validated))
+        return {device_id: sum(batches.values()) for device_id, batches in batches_by_device.items()}
+    
+    @api.model
+    def _get_validation_summary(self, batches, validated, max_batches=10):
+        """Return the chatter message of a mass validation of one device"""
+        count = sum(batches.values())
+        if validated:
+            message = _("%(count)s measurements validated by %(user)s", count=count, user=self.env.user.name)
+        else:
+            message = _("Validation of %(count)s measurements removed by %(user)s", count=count, user=self.env.user.name)
+        named_batches = [(batch_id, batch_count) for batch_id, batch_count in batches.most_common() if batch_id]
+        if named_batches:
+            details = ', '.join(f"{batch_id} ({batch_count})" for batch_id, batch_count in named_batches[:max_batches])
+            if len(named_batches) > max_batches:
+                details += ', ...'
+            message += ' - ' + _("Batches: %s", details)
+        return message
+    
     @api.constrains('value')
     def _check_value(self):
         for record in self:
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+import re
+from datetime import date
+from dateutil.relativedelta import relativedelta
+from odoo import models, api, tools, _
+from odoo.exceptions import AccessError, UserError
+import logging
+
+_logger = logging.getLogger(__name__)
+
+PARTITION_NAME = re.compile(r'^measurement_record_p(\d{4})(\d{2})$')
+
+
+class MeasurementRecord(models.Model):
+    """Optional monthly range partitioning of ``measurement_record``.
+    
+    Once enabled, the table is partitioned by ``measurement_date`` so that
+    date filtered queries only scan the partitions of their range, and old
+    months can be detached in an instant instead of being deleted. The
+    primary key becomes ``(id, measurement_date)``: PostgreSQL cannot
+    enforce a unique ``id`` across partitions, so foreign keys referencing
+    measurement records, such as the attachments relation, are dropped.
+    """
+    _inherit = 'measurement.record'
+    
+    _PARTITION_DEFAULT = 'measurement_record_default'
+    _PARTITION_MONTHS_AHEAD = 3
+    
+    def init(self):
+        super().init()
+        if self._is_partitioned():
+            self.pool.post_init(self._discard_partitioned_foreign_keys)
+    
+    def _discard_partitioned_foreign_keys(self):
+        """Keep the registry from creating foreign keys to the partitioned table"""
+        for key, (table, column, *_spec) in list(self.pool._foreign_keys.items()):
+            if table == self._table and column == 'id':
+                del self.pool._foreign_keys[key]
+    
+    def unlink(self):
+        if self and self._is_partitioned():
+            # No foreign key cascades the relation rows anymore
+            for field in self._fields.values():
+                if field.type == 'many2many' and field.store:
+                    self.env.cr.execute(
+                        f'DELETE FROM "{field.relation}" WHERE "{field.column1}" IN %s',
+                        [tuple(self.ids)]
+                    )
+        return super().unlink()
+    
+    @api.model
+    @tools.ormcache()
+    def _is_partitioned(self):
+        self.env.cr.execute("""
+            SELECT 1
+              FROM pg_partitioned_table partitioned
+              JOIN pg_class table_class ON table_class.oid = partitioned.partrelid
+             WHERE table_class.relname = %s AND pg_table_is_visible(table_class.oid)
+        """, [self._table])
+        return bool(self.env.cr.fetchone())
+    
+    @api.model
+    def _enable_partitioning(self):
+        """Convert ``measurement_record`` to a table partitioned by month.
+        
+        Rows are copied into monthly partitions, from the oldest measurement
+        to a few months ahead, with a default partition catching dates out
+        of these bounds. Runs in a single transaction that rewrites the whole
+        table: on large databases, run it from ``odoo-bin shell`` during a
+        maintenance window.
+        """
+        if not self.env.is_system():
+            raise AccessError(_('Only administrators can enable the partitioning of measurement records.'))
+        if self._is_partitioned():
+            raise UserError(_('Measurement records are already partitioned.'))
+        self.env.flush_all()
+        cr = self.env.cr
+        table = self._table
+        legacy = f'{table}_legacy'
+        
+        cr.execute(f'LOCK TABLE "{table}" IN ACCESS EXCLUSIVE MODE')
+        cr.execute(f'ALTER TABLE "{table}" RENAME TO "{legacy}"')
+        cr.execute("""
+            SELECT index_class.relname, pg_get_indexdef(index_class.oid)
+              FROM pg_index
+              JOIN pg_class index_class ON index_class.oid = pg_index.indexrelid
+             WHERE pg_index.indrelid = %s::regclass AND NOT pg_index.indisprimary
+        """, [legacy])
+        index_definitions = cr.fetchall()
+        cr.execute("""
+            SELECT conname, pg_get_constraintdef(oid)
+              FROM pg_constraint
+             WHERE conrelid = %s::regclass AND contype = 'f'
+        """, [legacy])
+        foreign_keys = cr.fetchall()
+        
+        cr.execute(f"""
+            CREATE TABLE "{table}" (LIKE "{legacy}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+            PARTITION BY RANGE (measurement_date)
+        """)
+        cr.execute(f'CREATE TABLE "{self._PARTITION_DEFAULT}" PARTITION OF "{table}" DEFAULT')
+        cr.execute(f'SELECT MIN(measurement_date) FROM "{legacy}"')
+        oldest = cr.fetchone()[0]
+        today = date.today()
+        first_month = (oldest.date() if oldest else today).replace(day=1)
+        self._create_partitions(first_month, today.replace(day=1) + relativedelta(months=self._get_months_ahead()))
+        
+        cr.execute(f'INSERT INTO "{table}" SELECT * FROM "{legacy}"')
+        cr.execute(f'ALTER SEQUENCE "{table}_id_seq" OWNED BY "{table}".id')
+        # Drops the foreign keys referencing measurement records as well
+        cr.execute(f'DROP TABLE "{legacy}" CASCADE')
+        
+        cr.execute(f'ALTER TABLE "{table}" ADD PRIMARY KEY (id, measurement_date)')
+        for index_name, definition in index_definitions:
+            if definition.startswith('CREATE UNIQUE') and 'measurement_date' not in definition:
+                _logger.warning("Unique index %s dropped, it lacks the partition key", index_name)
+                continue
+            cr.execute(re.sub(r'\bON (ONLY )?\S+ ', f'ON "{table}" ', definition, count=1))
+        for constraint_name, definition in foreign_keys:
+            cr.execute(f'ALTER TABLE "{table}" ADD CONSTRAINT "{constraint_name}" {definition}')
+        self.clear_caches()
+        self._discard_partitioned_foreign_keys()
+        self.invalidate_model()
+        _logger.info("Measurement records partitioned by month from %s", first_month)
+    
+    @api.model
+    def action_enable_partitioning(self):
+        self._enable_partitioning()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Partitioning Enabled'),
+                'message': _('Measurement records are now partitioned by month.'),
+                'type': 'success',
+            },
+        }
+    
+    @api.model
+    def _get_months_ahead(self):
+        return int(self.env['ir.config_parameter'].sudo().get_param(
+            'measurement_data_management.partition_months_ahead', self._PARTITION_MONTHS_AHEAD
+        ))
+    
+    @api.model
+    def _get_partitions(self):
+        """Return the first day of the month of each monthly partition, by table name"""
+        self.env.cr.execute("""
+            SELECT partition_class.relname
+              FROM pg_inherits
+              JOIN pg_class partition_class ON partition_class.oid = pg_inherits.inhrelid
+             WHERE pg_inherits.inhparent = %s::regclass
+        """, [self._table])
+        partitions = {}
+        for name, in self.env.cr.fetchall():
+            match = PARTITION_NAME.match(name)
+            if match:
+                partitions[name] = date(int(match.group(1)), int(match.group(2)), 1)
+        return partitions
+    
+    @api.model
+    def _create_partitions(self, first_month, last_month):
+        """Create the missing monthly partitions from ``first_month`` to ``last_month``.
+        
+        Rows of a new month that landed in the default partition are moved
+        into the new partition before it is attached.
+        """
+        cr = self.env.cr
+        existing = set(self._get_partitions().values())
+        month = first_month.replace(day=1)
+        while month <= last_month:
+            if month not in existing:
+                name = f'{self._table}_p{month:%Y%m}'
+                upper = month + relativedelta(months=1)
+                cr.execute(f"""
+                    SELECT 1 FROM "{self._PARTITION_DEFAULT}"
+                     WHERE measurement_date >= %s AND measurement_date < %s
+                     LIMIT 1
+                """, [month, upper])
+                if cr.fetchone():
+                    cr.execute(f"""
+                        CREATE TABLE "{name}" (LIKE "{self._table}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)
+                    """)
+                    cr.execute(f"""
+                        WITH moved AS (
+                            DELETE FROM "{self._PARTITION_DEFAULT}"
+                             WHERE measurement_date >= %s AND measurement_date < %s
+                         RETURNING *
+                        )
+                        INSERT INTO "{name}" SELECT * FROM moved
+                    """, [month, upper])
+                    cr.execute(f"""
+                        ALTER TABLE "{self._table}" ATTACH PARTITION "{name}"
+                        FOR VALUES FROM (%s) TO (%s)
+                    """, [month, upper])
+                else:
+                    cr.execute(f"""
+                        CREATE TABLE "{name}" PARTITION OF "{self._table}"
+                        FOR VALUES FROM (%s) TO (%s)
+                    """, [month, upper])
+                _logger.info("Measurement partition %s created", name)
+            month += relativedelta(months=1)
+    
+    @api.model
+    def _detach_partitions(self, before):
+        """Detach the monthly partitions ending on or before ``before``.
+        
+        Detached partitions are kept as ``measurement_record_archive_YYYYMM``
+        tables, out of every query on measurements. Their rollups are kept
+        as final and the device statistics are recomputed. Returns the archive tables.
+        """
+        self.env.flush_all()
+        cr = self.env.cr
+        archived = []
+        for name, month in sorted(self._get_partitions().items(), key=lambda item: item[1]):
+            if month + relativedelta(months=1) > before:
+                continue
+            archive = f'{self._table}_archive_{month:%Y%m}'
+            cr.execute(f'ALTER TABLE "{self._table}" DETACH PARTITION "{name}"')
+            cr.execute(f'ALTER TABLE "{name}" RENAME TO "{archive}"')
+            archived.append(archive)
+            detached_before = month + relativedelta(months=1)
+            _logger.info("Measurement partition %s detached as %s", name, archive)
+        if archived:
+            # The rollups of detached months cannot be recomputed anymore
+            cr.execute(
+                "UPDATE measurement_record_rollup SET is_final = TRUE WHERE NOT is_final AND bucket_start < %s",
+                [detached_before]
+            )
+            self.env['measurement.record.rollup'].invalidate_model()
+            self.invalidate_model()
+            self.env['measurement.device']._repair_measurement_stats()
+        return archived
+    
+    @api.model
+    def _cron_manage_partitions(self):
+        """Create the partitions of the coming months and detach expired ones.
+        
+        Does nothing unless partitioning was enabled. Partitions are detached
+        only when ``measurement_data_management.partition_detach_after_months``
+        is set.
+        """
+        if not self._is_partitioned():
+            return
+        this_month = date.today().replace(day=1)
+        self._create_partitions(this_month, this_month + relativedelta(months=self._get_months_ahead()))
+        detach_after = int(self.env['ir.config_parameter'].sudo().get_param(
+            'measurement_data_management.partition_detach_after_months', 0
+        ))
+        if detach_after > 0:
+            self._detach_partitions(this_month - relativedelta(months=detach_after))
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+from collections import defaultdict
+from odoo import models, fields, api, _
+from odoo.exceptions import AccessError
+from ..tools.quality import QUALITY_STATUSES
+from ..tools.statistics import RunningStats
+import logging
+
+_logger = logging.getLogger(__name__)
+
+BUCKET_INTERVALS = {
+    'hour': '1 hour',
+    'day': '1 day',
+}
+
+
+class MeasurementRecordRollup(models.Model):
+    _name = 'measurement.record.rollup'
+    _description = 'Measurement Rollup'
+    _order = 'bucket_start desc, device_id'
+    _log_access = False
+
+    device_id = fields.Many2one(
+        'measurement.device',
+        string='Device',
+        required=True,
+        readonly=True,
+        index=True,
+        ondelete='cascade'
+    )
+
+    bucket_type = fields.Selection([
+        ('hour', 'Hourly'),
+        ('day', 'Daily'),
+    ], string='Bucket', required=True, readonly=True)
+
+    bucket_start = fields.Datetime(
+        string='Bucket Start',
+        required=True,
+        readonly=True,
+        help="Start of the bucket, hours and days are UTC"
+    )
+
+    record_count = fields.Integer(string='Measurements', readonly=True)
+    value_sum = fields.Float(string='Sum', readonly=True)
+    value_sum_squares = fields.Float(string='Sum of Squares', readonly=True)
+    value_min = fields.Float(string='Minimum', readonly=True, group_operator='min')
+    value_max = fields.Float(string='Maximum', readonly=True, group_operator='max')
+    good_count = fields.Integer(string='Good', readonly=True)
+    warning_count = fields.Integer(string='Warning', readonly=True)
+    critical_count = fields.Integer(string='Critical', readonly=True)
+    out_of_range_count = fields.Integer(string='Out of Range', readonly=True)
+
+    is_final = fields.Boolean(
+        string='Final',
+        readonly=True,
+        help="Raw measurements of this bucket may have been removed by a "
+             "retention policy, so the bucket is never recomputed from them"
+    )
+
+    value_average = fields.Float(string='Average', compute='_compute_value_stats')
+    value_std_dev = fields.Float(string='Std Dev', compute='_compute_value_stats')
+
+    _sql_constraints = [
+        ('bucket_unique', 'unique(device_id, bucket_type, bucket_start)',
+         'A device can only have one rollup per bucket.'),
+    ]
+
+    _AGGREGATE_COLUMNS = (
+        'record_count', 'value_sum', 'value_sum_squares', 'value_min', 'value_max',
+        'good_count', 'warning_count', 'critical_count', 'out_of_range_count',
+    )
+
+    @api.depends('record_count', 'value_sum', 'value_sum_squares', 'value_min', 'value_max')
+    def _compute_value_stats(self):
+        for rollup in self:
+            stats = rollup._get_running_stats()
+            rollup.value_average = stats.mean
+            rollup.value_std_dev = stats.std_dev
+
+    def _get_running_stats(self):
+        """Merge the statistics of these buckets"""
+        stats = RunningStats()
+        for rollup in self:
+            stats.merge(RunningStats.from_sums(
+                rollup.record_count, rollup.value_sum, rollup.value_sum_squares,
+                rollup.value_min, rollup.value_max,
+            ))
+        return stats
+
+    @api.model
+    def _add_measurements(self, rows):
+        """Add new measurements to their buckets.
+
+        ``rows`` are ``(device_id, measurement_date, value, quality_status)``
+        tuples. They are aggregated in memory and merged into the buckets
+        with one ``INSERT ... ON CONFLICT`` per bucket type, which keeps the
+        rollups exact for inserts whatever the order of concurrent imports.
+        """
+        rows = list(rows)
+        if not rows:
+            return
+        for bucket_type in BUCKET_INTERVALS:
+            buckets = defaultdict(lambda: [0, 0.0, 0.0, None, None, 0, 0, 0, 0])
+            for device_id, measurement_date, value, quality_status in rows:
+                bucket = buckets[device_id, self._bucket_start(measurement_date, bucket_type)]
+                bucket[0] += 1
+                bucket[1] += value
+                bucket[2] += value * value
+                bucket[3] = value if bucket[3] is None else min(bucket[3], value)
+                bucket[4] = value if bucket[4] is None else max(bucket[4], value)
+                if quality_status in QUALITY_STATUSES:
+                    bucket[5 + QUALITY_STATUSES.index(quality_status)] += 1
+            keys = list(buckets)
+            columns = [[buckets[key][i] for key in keys] for i in range(len(self._AGGREGATE_COLUMNS))]
+            self.env.cr.execute("""
+                INSERT INTO measurement_record_rollup
+                       (device_id, bucket_type, bucket_start, {columns})
+                SELECT device_id, %s, bucket_start, {columns}
+                  FROM unnest(%s::int[], %s::timestamp[], %s::int[], %s::float8[], %s::float8[],
+                              %s::float8[], %s::float8[], %s::int[], %s::int[], %s::int[], %s::int[])
+                    AS bucket(device_id, bucket_start, {columns})
+                ON CONFLICT (device_id, bucket_type, bucket_start) DO UPDATE SET
+                       record_count = measurement_record_rollup.record_count + EXCLUDED.record_count,
+                       value_sum = measurement_record_rollup.value_sum + EXCLUDED.value_sum,
+                       value_sum_squares = measurement_record_rollup.value_sum_squares + EXCLUDED.value_sum_squares,
+                       value_min = LEAST(measurement_record_rollup.value_min, EXCLUDED.value_min),
+                       value_max = GREATEST(measurement_record_rollup.value_max, EXCLUDED.value_max),
+                       good_count = measurement_record_rollup.good_count + EXCLUDED.good_count,
+                       warning_count = measurement_record_rollup.warning_count + EXCLUDED.warning_count,
+                       critical_count = measurement_record_rollup.critical_count + EXCLUDED.critical_count,
+                       out_of_range_count = measurement_record_rollup.out_of_range_count + EXCLUDED.out_of_range_count
+            """.format(columns=', '.join(self._AGGREGATE_COLUMNS)), [
+                bucket_type,
+                [device_id for device_id, _bucket_start in keys],
+                [bucket_start for _device_id, bucket_start in keys],
+                *columns,
+            ])
+        self.invalidate_model()
+
+    @api.model
+    def _refresh_buckets(self, keys):
+        """Recompute the buckets of ``(device_id, measurement_date)`` keys.
+
+        Used when measurements are modified or deleted, where minimum and
+        maximum cannot be maintained as deltas: the touched hourly and daily
+        buckets are deleted and aggregated again from the measurements.
+        Final buckets are left as they are.
+        """
+        keys = [(device_id, measurement_date) for device_id, measurement_date in keys if device_id and measurement_date]
+        if not keys:
+            return
+        for bucket_type in BUCKET_INTERVALS:
+            bucket_keys = {
+                (device_id, self._bucket_start(measurement_date, bucket_type))
+                for device_id, measurement_date in keys
+            }
+            device_ids = [device_id for device_id, _bucket_start in bucket_keys]
+            bucket_starts = [bucket_start for _device_id, bucket_start in bucket_keys]
+            self.env.cr.execute("""
+                DELETE FROM measurement_record_rollup rollup
+                 USING unnest(%s::int[], %s::timestamp[]) AS bucket(device_id, bucket_start)
+                 WHERE rollup.bucket_type = %s
+                   AND rollup.device_id = bucket.device_id
+                   AND rollup.bucket_start = bucket.bucket_start
+                   AND NOT rollup.is_final
+            """, [device_ids, bucket_starts, bucket_type])
+            self._aggregate_into_buckets(
+                bucket_type,
+                """JOIN unnest(%s::int[], %s::timestamp[]) AS bucket(device_id, bucket_start)
+                     ON record.device_id = bucket.device_id
+                    AND record.measurement_date >= bucket.bucket_start
+                    AND record.measurement_date < bucket.bucket_start + %s::interval""",
+                [device_ids, bucket_starts, BUCKET_INTERVALS[bucket_type]],
+            )
+        self.invalidate_model()
+
+    @api.model
+    def _rebuild(self, device_ids=None):
+        """Rebuild the rollups of the given devices, or of all devices, from scratch.
+
+        Final buckets are kept, their measurements may be gone.
+        """
+        self.env.flush_all()
+        device_where = ''
+        params = []
+        if device_ids is not None:
+            if not device_ids:
+                return
+            device_where = 'AND device_id IN %s'
+            params = [tuple(device_ids)]
+        self.env.cr.execute(
+            "DELETE FROM measurement_record_rollup WHERE NOT is_final {}".format(device_where), params
+        )
+        for bucket_type in BUCKET_INTERVALS:
+            self._aggregate_into_buckets(
+                bucket_type, device_where.replace('AND device_id', 'WHERE record.device_id'), params
+            )
+        self.invalidate_model()
+        _logger.info(
+            "Measurement rollups rebuilt for %s",
+            "all devices" if device_ids is None else "%s devices" % len(device_ids)
+        )
+
+    def _aggregate_into_buckets(self, bucket_type, filter_clause, params):
+        """Insert the buckets aggregated from the measurements selected by ``filter_clause``"""
+        self.env.cr.execute("""
+            INSERT INTO measurement_record_rollup
+                   (device_id, bucket_type, bucket_start, {columns})
+            SELECT record.device_id, %s, date_trunc(%s, record.measurement_date),
+                   COUNT(*), SUM(record.value), SUM(record.value * record.value),
+                   MIN(record.value), MAX(record.value),
+                   COUNT(*) FILTER (WHERE record.quality_status = 'good'),
+                   COUNT(*) FILTER (WHERE record.quality_status = 'warning'),
+                   COUNT(*) FILTER (WHERE record.quality_status = 'critical'),
+                   COUNT(*) FILTER (WHERE record.quality_status = 'out_of_range')
+              FROM measurement_record record
+              {filter_clause}
+          GROUP BY 1, 3
+                ON CONFLICT (device_id, bucket_type, bucket_start) DO NOTHING
+        """.format(columns=', '.join(self._AGGREGATE_COLUMNS), filter_clause=filter_clause),
+            [bucket_type, bucket_type] + list(params))
+
+    @api.model
+    def _finalize(self, device_ids, date_from, date_to):
+        """Bring the buckets of a period up to date and freeze them.
+
+        Called before the raw measurements of the period are removed, so
+        that their hourly and daily summaries survive them. ``date_from``
+        and ``date_to`` must be day boundaries, ``date_from`` may be None.
+        """
+        if not device_ids:
+            return
+        self.env.flush_all()
+        period_where = 'device_id IN %s AND {column} < %s'
+        params = [tuple(device_ids), date_to]
+        if date_from:
+            period_where += ' AND {column} >= %s'
+            params.append(date_from)
+        self.env.cr.execute(
+            "DELETE FROM measurement_record_rollup WHERE NOT is_final AND "
+            + period_where.format(column='bucket_start'), params
+        )
+        for bucket_type in BUCKET_INTERVALS:
+            self._aggregate_into_buckets(
+                bucket_type,
+                'WHERE record.' + period_where.format(column='record.measurement_date'),
+                params,
+            )
+        self.env.cr.execute(
+            "UPDATE measurement_record_rollup SET is_final = TRUE WHERE NOT is_final AND "
+            + period_where.format(column='bucket_start'), params
+        )
+        self.invalidate_model()
+
+    @api.model
+    def _bucket_start(self, measurement_date, bucket_type):
+        if bucket_type == 'day':
+            return measurement_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        return measurement_date.replace(minute=0, second=0, microsecond=0)
+
+    @api.model
+    def action_rebuild(self):
+        if not self.env.is_system():
+            raise AccessError(_('Only administrators can rebuild the measurement rollups.'))
+        self._rebuild()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Rollups Rebuilt'),
+                'message': _('Measurement rollups were rebuilt from all measurements.'),
+                'type': 'success',
+                'next': {'type': 'ir.actions.act_window_close'},
+            },
+        }
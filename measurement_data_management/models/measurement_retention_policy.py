@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+import time
+from datetime import datetime, timedelta
+from odoo import models, fields, api, _
+from odoo.exceptions import ValidationError
+from odoo.tools.sql import create_column, table_columns, table_exists
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class MeasurementRetentionPolicy(models.Model):
+    """Lifetime of raw measurements.
+
+    Raw measurements older than the retention period of their device's
+    policy are downsampled into final hourly and daily rollups, then deleted
+    or moved to the ``measurement_record_archive`` table. Validated records
+    and records with attachments are always kept.
+    """
+    _name = 'measurement.retention.policy'
+    _description = 'Measurement Retention Policy'
+    _order = 'sequence, id'
+
+    _ARCHIVE_TABLE = 'measurement_record_archive'
+    _CRON_TIME_BUDGET = 240
+
+    name = fields.Char(string='Policy Name', required=True)
+
+    active = fields.Boolean(string='Active', default=True)
+
+    sequence = fields.Integer(string='Sequence', default=10)
+
+    device_ids = fields.Many2many(
+        'measurement.device',
+        string='Devices',
+        help="Devices this policy applies to. Takes precedence over the "
+             "device type, leave empty to apply the policy by device type"
+    )
+
+    device_type = fields.Selection(
+        selection='_get_device_types',
+        string='Device Type',
+        help="Type of the devices this policy applies to, when no device is "
+             "selected. A policy without devices nor type applies to all the "
+             "devices left"
+    )
+
+    raw_retention_days = fields.Integer(
+        string='Keep Raw Data (days)',
+        required=True,
+        default=365,
+        help="Raw measurements older than this are removed once summarised "
+             "in the hourly and daily rollups"
+    )
+
+    action = fields.Selection([
+        ('delete', 'Delete'),
+        ('archive', 'Move to Archive Table'),
+    ], string='Old Raw Data', required=True, default='delete')
+
+    chunk_size = fields.Integer(
+        string='Chunk Size',
+        default=10000,
+        help="Measurements removed per committed transaction"
+    )
+
+    last_run = fields.Datetime(string='Last Run', readonly=True, copy=False)
+
+    last_removed_count = fields.Integer(
+        string='Removed on Last Run',
+        readonly=True,
+        copy=False
+    )
+
+    @api.model
+    def _get_device_types(self):
+        return self.env['measurement.device']._fields['device_type'].selection
+
+    @api.constrains('raw_retention_days', 'chunk_size')
+    def _check_retention_days(self):
+        for policy in self:
+            if policy.raw_retention_days < 1:
+                raise ValidationError(_('Raw data must be kept for at least one day.'))
+            if policy.chunk_size < 1:
+                raise ValidationError(_('The chunk size must be positive.'))
+
+    @api.model
+    def _get_device_policies(self, devices):
+        """Return ``{policy: devices}``, each device under the policy applying to it"""
+        explicit = {}
+        by_type = {}
+        generic = self.browse()
+        for policy in self.search([]):
+            for device in policy.device_ids:
+                explicit.setdefault(device.id, policy)
+            if not policy.device_ids:
+                if policy.device_type:
+                    by_type.setdefault(policy.device_type, policy)
+                elif not generic:
+                    generic = policy
+        result = {}
+        for device in devices:
+            policy = explicit.get(device.id) or by_type.get(device.device_type) or generic
+            if policy:
+                result[policy] = result.get(policy, device.browse()) | device
+        return result
+
+    def _get_cutoff(self):
+        """Start of the day before which raw measurements are removed"""
+        self.ensure_one()
+        today = fields.Date.context_today(self)
+        return datetime.combine(today - timedelta(days=self.raw_retention_days), datetime.min.time())
+
+    @api.model
+    def _cron_apply_policies(self, time_budget=None):
+        """Apply the retention policies to every device, in committed chunks.
+
+        Removal stops once ``time_budget`` seconds are spent and resumes on
+        the next run: the rollups are finalized and the device watermark is
+        moved before any raw measurement is removed.
+        """
+        deadline = time.monotonic() + (time_budget or self._CRON_TIME_BUDGET)
+        devices = self.env['measurement.device'].with_context(active_test=False).search([])
+        for policy, policy_devices in self._get_device_policies(devices).items():
+            if time.monotonic() >= deadline:
+                break
+            policy._apply(policy_devices, deadline)
+
+    def _apply(self, devices, deadline):
+        self.ensure_one()
+        cutoff = self._get_cutoff()
+        stale = devices.filtered(lambda d: not d.retention_cutoff or d.retention_cutoff < cutoff)
+        for device in stale:
+            self.env['measurement.record.rollup']._finalize(device.ids, device.retention_cutoff, cutoff)
+            device.retention_cutoff = cutoff
+            self.env.cr.commit()
+
+        removed_count = 0
+        for device in devices.filtered('retention_cutoff'):
+            while time.monotonic() < deadline:
+                removed_ids = self._remove_raw_chunk(device, device.retention_cutoff)
+                removed_count += len(removed_ids)
+                if removed_ids:
+                    device._recompute_measurement_stats()
+                self.write({'last_removed_count': removed_count})
+                self.env.cr.commit()
+                if len(removed_ids) < self.chunk_size:
+                    break
+        self.write({'last_run': fields.Datetime.now(), 'last_removed_count': removed_count})
+        self.env.cr.commit()
+        _logger.info(
+            "Measurement retention policy %s: %s raw measurements removed",
+            self.name, removed_count
+        )
+
+    def _remove_raw_chunk(self, device, before):
+        """Delete or archive one chunk of raw measurements of ``device``.
+
+        Only measurements already summarised in final rollups, that is older
+        than ``before``, not validated and without attachments, are removed.
+        Returns the ids of the removed measurements.
+        """
+        records = self.env['measurement.record']
+        attachments_field = records._fields['attachment_ids']
+        cr = self.env.cr
+        removable = f"""
+            DELETE FROM measurement_record
+             WHERE id IN (
+                SELECT record.id
+                  FROM measurement_record record
+                 WHERE record.device_id = %(device_id)s
+                   AND record.measurement_date < %(before)s
+                   AND record.is_validated IS NOT TRUE
+                   AND NOT EXISTS (
+                        SELECT 1 FROM "{attachments_field.relation}" rel
+                         WHERE rel."{attachments_field.column1}" = record.id)
+                   AND NOT EXISTS (
+                        SELECT 1 FROM ir_attachment attachment
+                         WHERE attachment.res_model = 'measurement.record'
+                           AND attachment.res_id = record.id)
+                 LIMIT %(limit)s)
+         RETURNING *
+        """
+        params = {'device_id': device.id, 'before': before, 'limit': self.chunk_size}
+        if self.action == 'archive':
+            columns = ', '.join(f'"{column}"' for column in self._ensure_archive_table())
+            cr.execute(f"""
+                WITH removed AS ({removable}),
+                     archived AS (
+                        INSERT INTO "{self._ARCHIVE_TABLE}" ({columns})
+                        SELECT {columns} FROM removed
+                     )
+                SELECT id FROM removed
+            """, params)
+        else:
+            cr.execute(f"WITH removed AS ({removable}) SELECT id FROM removed", params)
+        removed_ids = [row[0] for row in cr.fetchall()]
+        if removed_ids:
+            # The rows left the ORM, clean what unlink() would have cleaned
+            cr.execute("""
+                DELETE FROM mail_followers WHERE res_model = 'measurement.record' AND res_id = ANY(%s)
+            """, [removed_ids])
+            cr.execute("""
+                DELETE FROM mail_activity WHERE res_model = 'measurement.record' AND res_id = ANY(%s)
+            """, [removed_ids])
+            if self.action == 'delete':
+                # Archived measurements keep their tracking history
+                cr.execute("""
+                    DELETE FROM mail_message WHERE model = 'measurement.record' AND res_id = ANY(%s)
+                """, [removed_ids])
+            records.invalidate_model()
+        return removed_ids
+
+    @api.model
+    def _ensure_archive_table(self):
+        """Create the archive table, or add the columns it lacks, and return its columns"""
+        cr = self.env.cr
+        if not table_exists(cr, self._ARCHIVE_TABLE):
+            cr.execute(f'CREATE TABLE "{self._ARCHIVE_TABLE}" (LIKE measurement_record INCLUDING DEFAULTS)')
+        record_columns = table_columns(cr, 'measurement_record')
+        archive_columns = table_columns(cr, self._ARCHIVE_TABLE)
+        for column, definition in record_columns.items():
+            if column not in archive_columns:
+                create_column(cr, self._ARCHIVE_TABLE, column, definition['udt_name'])
+        return list(record_columns)
+
+    def action_apply(self):
+        """Wake up the retention scheduled action"""
+        self.env.ref('measurement_data_management.ir_cron_measurement_retention')._trigger()
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'title': _('Retention Scheduled'),
+                'message': _('Retention policies will be applied in the background.'),
+                'type': 'info',
+            },
+        }
@@ -1,6 +1,12 @@
 # -*- coding: utf-8 -*-
+from markupsafe import Markup
 from odoo import models, fields, api, _
-from datetime import datetime, timedelta
+from odoo.exceptions import UserError
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from ..tools.charts import QUALITY_COLORS, line_chart, stacked_bar_chart
+from ..tools.quality import QUALITY_STATUSES
+from ..tools.statistics import RunningStats, linear_trend, rolling_mean
 import logging
 
 _logger = logging.getLogger(__name__)
@@ -16,39 +22,61 @@ class MeasurementReport(models.AbstractModel):
         Generate report data for measurement device reports
         """
         devices = self.env['measurement.device'].browse(docids)
+        Record = self.env['measurement.record']
+        
+        # Statistics of the last 30 days, read from the hourly rollups of all
+        # devices at once so the report never scans a device's history. The
+        # window starts on the hour for the measurements to match the buckets
+        thirty_days_ago = (datetime.now() - timedelta(days=30)).replace(minute=0, second=0, microsecond=0)
+        domain = [
+            ('device_id', 'in', devices.ids),
+            ('measurement_date', '>=', thirty_days_ago),
+        ]
+        rollups_by_device = {
+            group['device_id'][0]: group
+            for group in self.env['measurement.record.rollup'].read_group(
+                [
+                    ('device_id', 'in', devices.ids),
+                    ('bucket_type', '=', 'hour'),
+                    ('bucket_start', '>=', thirty_days_ago),
+                ],
+                ['record_count', 'value_sum', 'value_sum_squares', 'value_min', 'value_max',
+                 'good_count', 'warning_count', 'critical_count', 'out_of_range_count'],
+                ['device_id'],
+                lazy=False,
+            )
+        }
+        # Operators are not rolled up, their counts come from the measurements
+        operators_by_device = {}
+        for group in Record.read_group(
+            domain + [('operator', '!=', False)], ['device_id'], ['device_id', 'operator'], lazy=False
+        ):
+            operators_by_device.setdefault(group['device_id'][0], {})[group['operator']] = group['__count']
         
         report_data = []
         for device in devices:
-            # Get recent measurements (last 30 days)
-            thirty_days_ago = datetime.now() - timedelta(days=30)
-            recent_measurements = device.measurement_record_ids.filtered(
-                lambda r: r.measurement_date >= thirty_days_ago
-            ).sorted('measurement_date', reverse=True)
+            # Only the rows displayed are fetched
+            recent_measurements = Record.search(
+                [('device_id', '=', device.id), ('measurement_date', '>=', thirty_days_ago)],
+                order='measurement_date desc, id desc',
+                limit=50,
+            )
             
-            # Calculate statistics
-            if recent_measurements:
-                values = recent_measurements.mapped('value')
-                statistics = {
-                    'count': len(values),
-                    'average': sum(values) / len(values),
-                    'minimum': min(values),
-                    'maximum': max(values),
-                    'range': max(values) - min(values),
-                }
+            group = rollups_by_device.get(device.id)
+            if group and group['record_count']:
+                statistics = RunningStats.from_sums(
+                    group['record_count'], group['value_sum'], group['value_sum_squares'],
+                    group['value_min'], group['value_max'],
+                ).as_dict()
                 
                 # Quality analysis
-                quality_counts = {}
-                for status in ['good', 'warning', 'critical', 'out_of_range']:
-                    quality_counts[status] = len(recent_measurements.filtered(
-                        lambda r: r.quality_status == status
-                    ))
+                quality_counts = {
+                    status: group[f'{status}_count']
+                    for status in ['good', 'warning', 'critical', 'out_of_range']
+                }
                 
                 # Operator analysis
-                operators = recent_measurements.mapped('operator')
-                operator_counts = {}
-                for operator in set(operators):
-                    if operator:
-                        operator_counts[operator] = operators.count(operator)
+                operator_counts = operators_by_device.get(device.id, {})
                 
             else:
                 statistics = {
@@ -61,23 +89,13 @@ class MeasurementReport(models.AbstractModel):
                 quality_counts = {}
                 operator_counts = {}
             
-            # Calibration status
-            calibration_status = 'unknown'
-            if device.next_calibration_date:
-                if device.next_calibration_date < fields.Date.today():
-                    calibration_status = 'overdue'
-                elif device.next_calibration_date <= fields.Date.today() + timedelta(days=30):
-                    calibration_status = 'due_soon'
-                else:
-                    calibration_status = 'current'
-            
             device_data = {
                 'device': device,
-                'recent_measurements': recent_measurements[:50],
+                'recent_measurements': recent_measurements,
                 'statistics': statistics,
                 'quality_counts': quality_counts,
                 'operator_counts': operator_counts,
-                'calibration_status': calibration_status,
+                'calibration_status': device.calibration_status or 'unknown',
             }
             report_data.append(device_data)
         
@@ -102,38 +120,21 @@ class MeasurementRecordReport(models.AbstractModel):
         records = self.env['measurement.record'].browse(docids)
         
         # Group records by device
-        devices_data = {}
+        record_ids = defaultdict(list)
         for record in records:
-            device_id = record.device_id.id
-            if device_id not in devices_data:
-                devices_data[device_id] = {
-                    'device': record.device_id,
-                    'records': [],
-                    'statistics': {},
-                }
-            devices_data[device_id]['records'].append(record)
+            record_ids[record.device_id].append(record.id)
+        devices_data = {}
+        for device, ids in record_ids.items():
+            devices_data[device.id] = {
+                'device': device,
+                'records': records.browse(ids),
+                'statistics': {},
+            }
         
-        # Calculate statistics for each device
-        for device_data in devices_data.values():
-            records_list = device_data['records']
-            values = [r.value for r in records_list]
-            
-            if values:
-                device_data['statistics'] = {
-                    'count': len(values),
-                    'average': sum(values) / len(values),
-                    'minimum': min(values),
-                    'maximum': max(values),
-                    'std_dev': self._calculate_std_dev(values),
-                }
-            else:
-                device_data['statistics'] = {
-                    'count': 0,
-                    'average': 0,
-                    'minimum': 0,
-                    'maximum': 0,
-                    'std_dev': 0,
-                }
+        # Statistics of each device, from one query over all the values
+        statistics = self.env['measurement.record']._read_value_statistics([('id', 'in', records.ids)])
+        for device_id, device_data in devices_data.items():
+            device_data['statistics'] = statistics.get(device_id) or RunningStats().as_dict()
         
         return {
             'doc_ids': docids,
@@ -145,12 +146,7 @@ class MeasurementRecordReport(models.AbstractModel):
     
     def _calculate_std_dev(self, values):
         """Calculate standard deviation"""
-        if len(values) < 2:
-            return 0
-        
-        mean = sum(values) / len(values)
-        variance = sum((x - mean) ** 2 for x in values) / (len(values) - 1)
-        return variance ** 0.5
+        return RunningStats.from_values(values).std_dev
 
 
 class MeasurementAnalysisWizard(models.TransientModel):
@@ -192,56 +188,200 @@ class MeasurementAnalysisWizard(models.TransientModel):
         """Generate the analysis report"""
         self.ensure_one()
         
-        # Get measurement records for the selected criteria
+        if self.date_from > self.date_to:
+            raise UserError(_('The start date must be before the end date.'))
+        
+        # Check the criteria match measurement records, without loading them
+        if not self.env['measurement.record'].search(self._get_record_domain(), limit=1):
+            raise UserError(_('No measurement records found for the selected criteria.'))
+        
+        # Only the criteria travel with the action, the report aggregates
+        # them on the server when it is rendered
+        return self.env.ref(
+            'measurement_data_management.action_measurement_analysis_report'
+        ).report_action(self, data=self._get_report_criteria())
+    
+    def _get_record_domain(self):
+        """Return the domain of the measurement records covered by the wizard"""
         domain = [
-            ('measurement_date', '>=', self.date_from),
-            ('measurement_date', '<=', self.date_to),
+            ('measurement_date', '>=', datetime.combine(self.date_from, time.min)),
+            ('measurement_date', '<', datetime.combine(self.date_to + timedelta(days=1), time.min)),
         ]
-        
         if self.device_ids:
             domain.append(('device_id', 'in', self.device_ids.ids))
-        
-        records = self.env['measurement.record'].search(domain)
-        
-        if not records:
-            raise UserError(_('No measurement records found for the selected criteria.'))
-        
-        # Generate report based on type of report
-        if self.report_type == 'summary':
-            return self._generate_summary_report(records)
-        elif self.report_type == 'detailed':
-            return self._generate_detailed_report(records)
-        elif self.report_type == 'quality':
-            return self._generate_quality_report(records)
-        elif self.report_type == 'trends':
-            return self._generate_trends_report(records)
+        return domain
     
-    def _generate_summary_report(self, records):
-        """Generate summary report"""
+    def _get_report_criteria(self):
         return {
-            'type': 'ir.actions.report',
-            'report_name': 'measurement_data_management.measurement_summary_report',
-            'report_type': 'qweb-pdf',
-            'data': {
-                'record_ids': records.ids,
-                'wizard_data': {
-                    'date_from': self.date_from,
-                    'date_to': self.date_to,
-                    'device_ids': self.device_ids.ids,
-                    'report_type': self.report_type,
-                }
-            },
-            'context': self.env.context,
+            'date_from': fields.Date.to_string(self.date_from),
+            'date_to': fields.Date.to_string(self.date_to),
+            'device_ids': self.device_ids.ids,
+            'report_type': self.report_type,
+            'include_charts': self.include_charts,
         }
+
+
+class MeasurementAnalysisReport(models.AbstractModel):
+    _name = 'report.measurement_data_management.measurement_analysis_report'
+    _description = 'Measurement Analysis Report'
     
-    def _generate_detailed_report(self, records):
-        """Generate detailed analysis report"""
-        pass
+    _MOVING_AVERAGE_DAYS = 7
+    _WORST_DAYS = 5
     
-    def _generate_quality_report(self, records):
-        """Generate quality analysis report"""
-        pass
+    @api.model
+    def _get_report_values(self, docids, data=None):
+        """
+        Generate analysis report data from the daily rollups of the criteria
+        """
+        if not data or not data.get('date_from'):
+            data = self.env['measurement.analysis.wizard'].browse(docids)[:1]._get_report_criteria()
+        date_from = fields.Date.to_date(data['date_from'])
+        date_to = fields.Date.to_date(data['date_to'])
+        report_type = data.get('report_type') or 'summary'
+        include_charts = data.get('include_charts', True)
+        
+        # Daily buckets are UTC days, matching the day bounds of the criteria
+        rollup_domain = [
+            ('bucket_type', '=', 'day'),
+            ('bucket_start', '>=', datetime.combine(date_from, time.min)),
+            ('bucket_start', '<', datetime.combine(date_to + timedelta(days=1), time.min)),
+        ]
+        if data.get('device_ids'):
+            rollup_domain.append(('device_id', 'in', data['device_ids']))
+        rollups_by_device = defaultdict(list)
+        for rollup in self.env['measurement.record.rollup'].search_read(
+            rollup_domain,
+            ['device_id', 'bucket_start', 'record_count', 'value_sum', 'value_sum_squares',
+             'value_min', 'value_max', 'good_count', 'warning_count', 'critical_count',
+             'out_of_range_count'],
+            order='device_id, bucket_start',
+        ):
+            rollups_by_device[rollup['device_id'][0]].append(rollup)
+        
+        days = [date_from + timedelta(days=offset) for offset in range((date_to - date_from).days + 1)]
+        devices = self.env['measurement.device'].with_context(active_test=False).browse(
+            list(rollups_by_device)
+        ).sorted('name')
+        devices_data = [
+            self._prepare_device_analysis(device, rollups_by_device[device.id], days, include_charts)
+            for device in devices
+        ]
+        
+        if report_type == 'detailed' and devices_data:
+            record_domain = [
+                ('measurement_date', '>=', datetime.combine(date_from, time.min)),
+                ('measurement_date', '<', datetime.combine(date_to + timedelta(days=1), time.min)),
+            ]
+            distribution = self.env['measurement.record']._read_value_distribution(record_domain, {
+                device_data['device'].id: (
+                    device_data['statistics']['minimum'], device_data['statistics']['maximum']
+                )
+                for device_data in devices_data
+            })
+            for device_data in devices_data:
+                device_data.update(distribution.get(device_data['device'].id, {}))
+        
+        totals = RunningStats()
+        for device_data in devices_data:
+            totals.merge(device_data['running_stats'])
+        
+        return {
+            'doc_ids': docids,
+            'doc_model': 'measurement.analysis.wizard',
+            'docs': self.env['measurement.analysis.wizard'].browse(docids),
+            'report_type': report_type,
+            'include_charts': include_charts,
+            'date_from': date_from,
+            'date_to': date_to,
+            'devices_data': devices_data,
+            'totals': totals.as_dict(),
+            'moving_average_days': self._MOVING_AVERAGE_DAYS,
+            'report_date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        }
     
-    def _generate_trends_report(self, records):
-        """Generate trends analysis report"""
-        pass
+    def _prepare_device_analysis(self, device, rollups, days, include_charts):
+        """Build the statistics, daily series, trend and charts of a device"""
+        running_stats = RunningStats()
+        quality_counts = dict.fromkeys(QUALITY_STATUSES, 0)
+        by_day = {}
+        for rollup in rollups:
+            running_stats.merge(RunningStats.from_sums(
+                rollup['record_count'], rollup['value_sum'], rollup['value_sum_squares'],
+                rollup['value_min'], rollup['value_max'],
+            ))
+            for status in QUALITY_STATUSES:
+                quality_counts[status] += rollup[f'{status}_count']
+            by_day[rollup['bucket_start'].date()] = rollup
+        
+        # Moving average over calendar days, weighted by the daily counts
+        filled_days = sorted(by_day)
+        moving_averages = dict(zip(filled_days, rolling_mean(
+            [(day, by_day[day]['record_count'], by_day[day]['value_sum']) for day in filled_days],
+            timedelta(days=self._MOVING_AVERAGE_DAYS),
+        )))
+        
+        series = []
+        for day in days:
+            rollup = by_day.get(day)
+            count = rollup['record_count'] if rollup else 0
+            non_good = count - rollup['good_count'] if rollup else 0
+            series.append({
+                'day': day,
+                'count': count,
+                'average': rollup['value_sum'] / count if count else None,
+                'minimum': rollup['value_min'] if count else None,
+                'maximum': rollup['value_max'] if count else None,
+                'moving_average': moving_averages.get(day),
+                'quality_counts': {
+                    status: rollup[f'{status}_count'] if rollup else 0 for status in QUALITY_STATUSES
+                },
+                'non_good_rate': non_good * 100.0 / count if count else 0.0,
+            })
+        
+        # Least squares slope of the daily means, in units per day
+        slope, _intercept = linear_trend([
+            ((point['day'] - days[0]).days, point['average'], point['count'])
+            for point in series if point['count']
+        ])
+        
+        total = running_stats.count
+        quality_rates = {
+            status: count * 100.0 / total if total else 0.0
+            for status, count in quality_counts.items()
+        }
+        worst_days = sorted(
+            (point for point in series if point['count'] and point['non_good_rate']),
+            key=lambda point: -point['non_good_rate'],
+        )[:self._WORST_DAYS]
+        
+        charts = {}
+        if include_charts:
+            labels = [fields.Date.to_string(day) for day in days]
+            status_labels = dict(
+                self.env['measurement.record']._fields['quality_status']._description_selection(self.env)
+            )
+            charts = {
+                'values': Markup(line_chart(labels, [
+                    (_('Daily Average'), [point['average'] for point in series]),
+                    (_('%s-Day Moving Average') % self._MOVING_AVERAGE_DAYS,
+                     [point['moving_average'] for point in series]),
+                ])),
+                'quality': Markup(stacked_bar_chart(labels, [
+                    (status, status_labels[status], [point['quality_counts'][status] for point in series])
+                    for status in QUALITY_STATUSES
+                ], colors=QUALITY_COLORS)),
+            }
+        
+        return {
+            'device': device,
+            'running_stats': running_stats,
+            'statistics': running_stats.as_dict(),
+            'quality_counts': quality_counts,
+            'quality_rates': quality_rates,
+            'series': series,
+            'slope': slope,
+            'worst_days': worst_days,
+            'charts': charts,
+            'percentiles': {},
+            'histogram': [],
+        }
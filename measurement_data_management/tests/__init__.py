@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+from . import test_statistics
+from . import test_spc
+from . import test_date_parser
+from . import test_quality
+from . import test_row_parser
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+from odoo.tests import BaseCase, tagged
+
+from ..tools.date_parser import make_date_parser, parse_timestamp, sniff_date_order
+
+
+@tagged('post_install', '-at_install')
+class TestDateParser(BaseCase):
+
+    def test_parse_timestamp_iso(self):
+        expected = datetime(2024, 3, 5, 14, 30, 15)
+        self.assertEqual(parse_timestamp('2024-03-05T14:30:15'), expected)
+        self.assertEqual(parse_timestamp(' 2024-03-05 14:30:15 '), expected)
+        self.assertEqual(parse_timestamp('2024-03-05T14:30:15Z'), expected)
+        # Offsets are converted to naive UTC
+        self.assertEqual(parse_timestamp('2024-03-05T16:30:15+02:00'), expected)
+        self.assertEqual(parse_timestamp('2024-03-05T23:30:15+09:00'), expected)
+        self.assertEqual(parse_timestamp('2024-03-05'), datetime(2024, 3, 5))
+    
+    def test_parse_timestamp_posix(self):
+        self.assertEqual(parse_timestamp(0), datetime(1970, 1, 1))
+        self.assertEqual(parse_timestamp(1709649015), datetime(2024, 3, 5, 14, 30, 15))
+        self.assertEqual(parse_timestamp(1709649015.5), datetime(2024, 3, 5, 14, 30, 15, 500000))
+        self.assertIsNone(parse_timestamp(1709649015).tzinfo)
+    
+    def test_parse_timestamp_invalid(self):
+        for value in ('', 'yesterday', '05/03/2024', '2024-13-05T00:00:00', None, True, [2024, 3, 5]):
+            with self.assertRaises(ValueError, msg=repr(value)):
+                parse_timestamp(value)
+    
+    def test_sniff_date_order(self):
+        self.assertEqual(sniff_date_order(['2024-03-05 10:00', '2024-03-06']), 'iso')
+        self.assertEqual(sniff_date_order(['05/03/2024', '25/03/2024']), 'dmy')
+        self.assertEqual(sniff_date_order(['03/05/2024', '03/25/2024 10:00']), 'mdy')
+        # Ambiguous slashed dates are read day first
+        self.assertEqual(sniff_date_order(['05/03/2024', '06/03/2024']), 'dmy')
+        self.assertIsNone(sniff_date_order(['', 'n/a']))
+    
+    def test_make_date_parser(self):
+        self.assertEqual(make_date_parser('dmy')('05/03/2024 14:30'), datetime(2024, 3, 5, 14, 30))
+        self.assertEqual(make_date_parser('mdy')('03/05/2024 14:30'), datetime(2024, 3, 5, 14, 30))
+        self.assertEqual(make_date_parser('iso')('2024-03-05 14:30:15'), datetime(2024, 3, 5, 14, 30, 15))
+        # Values the fast path rejects fall back to the other formats
+        self.assertEqual(make_date_parser('iso')('05/03/2024'), datetime(2024, 3, 5))
+        self.assertEqual(make_date_parser()('2024-03-05 14:30'), datetime(2024, 3, 5, 14, 30))
+        with self.assertRaises(ValueError):
+            make_date_parser('dmy')('not a date')
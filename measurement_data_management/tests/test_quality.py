@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import BaseCase, tagged
+
+from ..tools.quality import QUALITY_STATUSES, classify_quality
+
+
+@tagged('post_install', '-at_install')
+class TestQuality(BaseCase):
+
+    def assertClassified(self, expected, min_range, max_range, **factors):
+        for value, status in expected.items():
+            self.assertIn(status, QUALITY_STATUSES)
+            self.assertEqual(classify_quality(value, min_range, max_range, **factors), status, msg=value)
+    
+    def test_range_boundaries(self):
+        # Warnings below 11.0 and above 90.0 with the default factors
+        self.assertClassified({
+            9.99: 'out_of_range',
+            10.0: 'warning',
+            10.99: 'warning',
+            11.0: 'good',
+            50.0: 'good',
+            90.0: 'good',
+            90.01: 'warning',
+            100.0: 'warning',
+            100.01: 'out_of_range',
+            -5.0: 'out_of_range',
+        }, 10.0, 100.0)
+    
+    def test_custom_factors(self):
+        self.assertClassified({
+            7.99: 'out_of_range',
+            8.0: 'warning',
+            9.99: 'warning',
+            10.0: 'good',
+            75.0: 'good',
+            75.01: 'warning',
+            100.0: 'warning',
+        }, 8.0, 100.0, min_factor=1.25, max_factor=0.75)
+        # Factors of 1 disable the warning band
+        self.assertClassified({8.0: 'good', 100.0: 'good', 100.5: 'out_of_range'}, 8.0, 100.0,
+                              min_factor=1.0, max_factor=1.0)
+    
+    def test_without_range(self):
+        # Both bounds are needed to classify, like the SQL reclassification
+        for min_range, max_range in ((0.0, 0.0), (0.0, 100.0), (10.0, 0.0), (None, None)):
+            self.assertClassified({-1e6: 'good', 0.0: 'good', 1e6: 'good'}, min_range, max_range)
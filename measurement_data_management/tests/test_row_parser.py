@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+from odoo.tests import BaseCase, tagged
+
+from ..tools.date_parser import make_date_parser
+from ..tools.row_parser import build_device_index, parse_row, reading_fingerprint
+
+
+@tagged('post_install', '-at_install')
+class TestRowParser(BaseCase):
+
+    def setUp(self):
+        super().setUp()
+        self.date = datetime(2024, 3, 5, 14, 30, 15)
+        self.options = {
+            'header': ['device', 'date', 'value', 'unit'],
+            'device_index': build_device_index([
+                {'id': 7, 'name': 'Gauge 7', 'serial_number': 'G-7', 'measurement_unit': 'bar'},
+            ]),
+            'normalize_device_names': False,
+            'default_device_id': False,
+            'parse_date': make_date_parser('iso'),
+            'now': datetime(2024, 6, 1, 8, 0, 0),
+            'default_unit': False,
+            'default_operator': False,
+            'import_session_id': 'import_test',
+        }
+    
+    def test_fingerprint_stable(self):
+        fingerprint = reading_fingerprint(7, self.date, 1.5, 'bar')
+        self.assertEqual(len(fingerprint), 40)
+        self.assertEqual(reading_fingerprint(7, self.date, 1.5, 'bar'), fingerprint)
+        # Equal values hash alike whatever their type or spelling
+        self.assertEqual(reading_fingerprint(7, self.date, 1, 'bar'), reading_fingerprint(7, self.date, 1.0, 'bar'))
+        self.assertEqual(reading_fingerprint(7, self.date, '1.50', 'bar'), fingerprint)
+        self.assertEqual(reading_fingerprint(7, self.date, 1.5, ' bar '), fingerprint)
+        # Dates are taken to the second, as stored
+        self.assertEqual(reading_fingerprint(7, self.date.replace(microsecond=250000), 1.5, 'bar'), fingerprint)
+    
+    def test_fingerprint_changes(self):
+        fingerprint = reading_fingerprint(7, self.date, 1.5, 'bar')
+        self.assertNotEqual(reading_fingerprint(7, self.date, 1.5, 'psi'), fingerprint)
+        self.assertNotEqual(reading_fingerprint(7, self.date, 1.5, ''), fingerprint)
+        self.assertNotEqual(reading_fingerprint(8, self.date, 1.5, 'bar'), fingerprint)
+        self.assertNotEqual(reading_fingerprint(7, self.date.replace(second=16), 1.5, 'bar'), fingerprint)
+        self.assertNotEqual(reading_fingerprint(7, self.date, 1.5000001, 'bar'), fingerprint)
+    
+    def test_parse_row_fingerprint(self):
+        vals = parse_row(['Gauge 7', '2024-03-05 14:30:15', '1.5', ''], self.options)
+        self.assertEqual(vals['device_id'], 7)
+        self.assertEqual(vals['unit'], 'bar')
+        self.assertEqual(vals['import_fingerprint'], reading_fingerprint(7, self.date, 1.5, 'bar'))
+        # Rows dated on import are not deduplicated
+        vals = parse_row(['Gauge 7', '', '1.5', 'bar'], self.options)
+        self.assertEqual(vals['measurement_date'], self.options['now'])
+        self.assertFalse(vals['import_fingerprint'])
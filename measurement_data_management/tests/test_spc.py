@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from odoo.tests import BaseCase, tagged
+
+from ..tools.spc import MIN_BASELINE, SpcState, apply_control_status
+
+
+@tagged('post_install', '-at_install')
+class TestSpc(BaseCase):
+    
+    def make_state(self, ewma=10.0):
+        """A device in control around 10.0 with a standard deviation of 1.0"""
+        return SpcState(count=101, mean=10.0, m2=100.0, ewma=ewma)
+    
+    def evaluate_all(self, state, values):
+        return [state.evaluate(value) for value in values]
+    
+    def test_baseline(self):
+        state = SpcState()
+        # Limits are not trusted before the baseline is complete
+        self.assertEqual(self.evaluate_all(state, [10.0, 50.0] * (MIN_BASELINE // 2)), [None] * MIN_BASELINE)
+        self.assertEqual(state.stats.count, MIN_BASELINE)
+        self.assertEqual(state.zones, '')
+    
+    def test_in_control(self):
+        state = self.make_state()
+        self.assertEqual(self.evaluate_all(state, [10.2, 9.7, 10.4, 9.9]), [None] * 4)
+        self.assertEqual(state.stats.count, 105)
+        self.assertEqual(state.zones, 'AaAa')
+    
+    def test_beyond_3_sigma(self):
+        state = self.make_state()
+        self.assertEqual(state.evaluate(13.5), 'beyond_3_sigma')
+        self.assertEqual(state.evaluate(6.5), 'beyond_3_sigma')
+        # Violations do not join the baseline
+        self.assertEqual(state.stats.count, 101)
+        self.assertEqual(state.stats.mean, 10.0)
+    
+    def test_two_of_three_2_sigma(self):
+        state = self.make_state()
+        self.assertEqual(self.evaluate_all(state, [12.5, 10.0, 12.5]), [None, None, 'two_of_three_2_sigma'])
+        # Both readings must be on the same side of the mean
+        state = self.make_state()
+        self.assertEqual(self.evaluate_all(state, [12.5, 7.5]), [None, None])
+    
+    def test_four_of_five_1_sigma(self):
+        state = self.make_state()
+        self.assertEqual(
+            self.evaluate_all(state, [8.5, 8.5, 10.0, 8.5, 8.5]),
+            [None, None, None, None, 'four_of_five_1_sigma']
+        )
+    
+    def test_eight_same_side(self):
+        state = self.make_state()
+        self.assertEqual(self.evaluate_all(state, [10.5] * 8), [None] * 7 + ['eight_same_side'])
+    
+    def test_ewma(self):
+        # A slow drift shows in the EWMA before any zone rule triggers
+        state = self.make_state(ewma=11.0)
+        self.assertEqual(state.evaluate(11.5), 'ewma')
+        self.assertEqual(state.zones, 'B')
+    
+    def test_state_round_trip(self):
+        state = self.make_state()
+        self.evaluate_all(state, [10.5, 9.2, 11.1])
+        values = state.as_values()
+        restored = SpcState(values['spc_count'], values['spc_mean'], values['spc_m2'],
+                            values['spc_ewma'], values['spc_zones'])
+        for value in (10.3, 12.6, 12.4, 13.2):
+            self.assertEqual(restored.evaluate(value), state.evaluate(value))
+    
+    def test_apply_control_status(self):
+        self.assertEqual(apply_control_status('good', None), 'good')
+        self.assertEqual(apply_control_status('warning', None), 'warning')
+        self.assertEqual(apply_control_status('good', 'eight_same_side'), 'critical')
+        self.assertEqual(apply_control_status('warning', 'ewma'), 'critical')
+        self.assertEqual(apply_control_status('out_of_range', 'beyond_3_sigma'), 'out_of_range')
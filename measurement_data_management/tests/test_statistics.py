@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import random
+from contextlib import nullcontext
+from unittest.mock import patch
+
+from odoo.tests import BaseCase, tagged
+
+from ..tools import statistics
+from ..tools.statistics import RunningStats, describe, histogram, percentiles
+
+
+def two_pass_std_dev(values):
+    """The sample standard deviation formerly computed by the device report"""
+    if len(values) < 2:
+        return 0
+    mean = sum(values) / len(values)
+    variance = sum((x - mean) ** 2 for x in values) / (len(values) - 1)
+    return variance ** 0.5
+
+
+@tagged('post_install', '-at_install')
+class TestStatistics(BaseCase):
+    
+    def setUp(self):
+        super().setUp()
+        generator = random.Random(42)
+        self.values = [generator.gauss(1000.0, 2.5) for _i in range(5000)]
+    
+    def python_only(self):
+        """Run with the plain Python fallbacks, as without NumPy"""
+        return patch.object(statistics, 'numpy', None)
+    
+    def test_running_stats_matches_two_pass(self):
+        for values in (self.values, [1e9 + offset for offset in (4, 7, 13, 16)]):
+            stats = RunningStats()
+            stats.update_many(values)
+            self.assertEqual(stats.count, len(values))
+            self.assertAlmostEqual(stats.mean, sum(values) / len(values), delta=1e-9 * abs(stats.mean))
+            self.assertAlmostEqual(stats.std_dev, two_pass_std_dev(values), places=9)
+            self.assertEqual(stats.minimum, min(values))
+            self.assertEqual(stats.maximum, max(values))
+    
+    def test_from_values(self):
+        expected = two_pass_std_dev(self.values)
+        self.assertAlmostEqual(RunningStats.from_values(self.values).std_dev, expected, places=9)
+        with self.python_only():
+            self.assertAlmostEqual(RunningStats.from_values(self.values).std_dev, expected, places=9)
+    
+    def test_merge_matches_single_pass(self):
+        single = RunningStats()
+        single.update_many(self.values)
+        merged = RunningStats()
+        for start in range(0, len(self.values), 1234):
+            part = RunningStats()
+            part.update_many(self.values[start:start + 1234])
+            merged.merge(part)
+        self.assertEqual(merged.count, single.count)
+        self.assertAlmostEqual(merged.mean, single.mean, places=9)
+        self.assertAlmostEqual(merged.std_dev, single.std_dev, places=9)
+        self.assertEqual((merged.minimum, merged.maximum), (single.minimum, single.maximum))
+        # Merging with empty states changes nothing
+        merged.merge(RunningStats())
+        self.assertEqual(merged.count, single.count)
+        self.assertAlmostEqual(RunningStats().merge(single).mean, single.mean)
+    
+    def test_percentiles(self):
+        values = [1.0, 2.0, 3.0, 4.0, 5.0]
+        expected = {25: 2.0, 50: 3.0, 75: 4.0, 95: 4.8}
+        for context in (nullcontext(), self.python_only()):
+            with context:
+                result = percentiles(values)
+                self.assertEqual(set(result), set(expected))
+                for rank, value in expected.items():
+                    self.assertAlmostEqual(result[rank], value)
+    
+    def test_histogram(self):
+        values = [float(value) for value in range(10)]
+        for context in (nullcontext(), self.python_only()):
+            with context:
+                bins = histogram(values, bins=5)
+                self.assertEqual([count for _lower, _upper, count in bins], [2, 2, 2, 2, 2])
+                self.assertAlmostEqual(bins[0][0], 0.0)
+                self.assertAlmostEqual(bins[-1][1], 9.0)
+    
+    def test_empty(self):
+        stats = RunningStats()
+        self.assertEqual(stats.variance, 0.0)
+        self.assertEqual(stats.as_dict(), {
+            'count': 0, 'average': 0, 'minimum': 0, 'maximum': 0, 'range': 0, 'std_dev': 0,
+        })
+        self.assertEqual(percentiles([]), {})
+        self.assertEqual(histogram([]), [])
+        self.assertEqual(RunningStats.from_sums(0, 0.0, 0.0, None, None).count, 0)
+    
+    def test_single_value(self):
+        result = describe([3.5])
+        self.assertEqual(result['count'], 1)
+        self.assertEqual(result['average'], 3.5)
+        self.assertEqual(result['std_dev'], 0.0)
+        self.assertEqual(result['range'], 0.0)
+        self.assertEqual(result['percentiles'], {rank: 3.5 for rank in statistics.DEFAULT_PERCENTILES})
+        # A single value gets a bin of unit width centered on it
+        self.assertEqual(sum(count for _lower, _upper, count in result['histogram']), 1)
+        self.assertAlmostEqual(result['histogram'][0][0], 3.0)
+        self.assertAlmostEqual(result['histogram'][-1][1], 4.0)
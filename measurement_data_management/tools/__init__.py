@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+from . import date_parser
+from . import row_parser
+from . import quality
+from . import statistics
+from . import charts
+from . import columnar
+from . import spc
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""Minimal SVG charts for the PDF reports.
+
+Charts are drawn from aggregated series only, a few hundred points at most,
+and returned as SVG markup that wkhtmltopdf renders without JavaScript.
+"""
+from html import escape
+
+PALETTE = ('#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd', '#8c564b')
+QUALITY_COLORS = {
+    'good': '#28a745',
+    'warning': '#ffc107',
+    'critical': '#fd7e14',
+    'out_of_range': '#dc3545',
+}
+
+
+def _scale(value, lower, upper, size):
+    if upper == lower:
+        return size / 2.0
+    return (value - lower) * size / (upper - lower)
+
+
+def _frame(width, height, margin, labels, body):
+    lower_label, upper_label, first_label, last_label = (escape(str(label)) for label in labels)
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+        f'viewBox="0 0 {width} {height}" font-family="sans-serif" font-size="9">'
+        f'<rect x="{margin}" y="{margin}" width="{width - 2 * margin}" height="{height - 2 * margin}" '
+        f'fill="none" stroke="#cccccc"/>'
+        f'{body}'
+        f'<text x="2" y="{margin + 8}">{upper_label}</text>'
+        f'<text x="2" y="{height - margin}">{lower_label}</text>'
+        f'<text x="{margin}" y="{height - 2}">{first_label}</text>'
+        f'<text x="{width - margin}" y="{height - 2}" text-anchor="end">{last_label}</text>'
+        f'</svg>'
+    )
+
+
+def line_chart(labels, series, width=640, height=200, margin=30):
+    """Return an SVG line chart.
+
+    ``labels`` name the x positions, ``series`` is a list of ``(name, values)``
+    with one value per label, ``None`` leaving a gap.
+    """
+    values = [value for _name, points in series for value in points if value is not None]
+    if not labels or not values:
+        return ''
+    lower, upper = min(values), max(values)
+    plot_width, plot_height = width - 2 * margin, height - 2 * margin
+    step = plot_width / max(len(labels) - 1, 1)
+    body = []
+    for index, (name, points) in enumerate(series):
+        color = PALETTE[index % len(PALETTE)]
+        segments, segment = [], []
+        for position, value in enumerate(points):
+            if value is None:
+                if segment:
+                    segments.append(segment)
+                segment = []
+                continue
+            x = margin + position * step
+            y = height - margin - _scale(value, lower, upper, plot_height)
+            segment.append(f'{x:.1f},{y:.1f}')
+        if segment:
+            segments.append(segment)
+        for segment in segments:
+            body.append(
+                f'<polyline fill="none" stroke="{color}" stroke-width="1.5" points="{" ".join(segment)}"/>'
+            )
+        body.append(
+            f'<text x="{margin + 4 + 110 * index}" y="{margin - 6}" fill="{color}">{escape(name)}</text>'
+        )
+    return _frame(width, height, margin, (f'{lower:g}', f'{upper:g}', labels[0], labels[-1]), ''.join(body))
+
+
+def stacked_bar_chart(labels, series, width=640, height=200, margin=30, colors=None):
+    """Return an SVG stacked bar chart.
+
+    ``series`` is a list of ``(key, name, values)`` with one count per label,
+    ``colors`` maps the keys to fill colors.
+    """
+    totals = [sum(points[position] for _key, _name, points in series) for position in range(len(labels))]
+    if not labels or not any(totals):
+        return ''
+    colors = colors or {}
+    upper = max(totals)
+    plot_width, plot_height = width - 2 * margin, height - 2 * margin
+    bar_width = plot_width / len(labels)
+    body = []
+    for position in range(len(labels)):
+        y = height - margin
+        for index, (key, _name, points) in enumerate(series):
+            if not points[position]:
+                continue
+            bar_height = points[position] * plot_height / upper
+            y -= bar_height
+            body.append(
+                f'<rect x="{margin + position * bar_width:.1f}" y="{y:.1f}" '
+                f'width="{max(bar_width - 1, 0.5):.1f}" height="{bar_height:.1f}" '
+                f'fill="{colors.get(key, PALETTE[index % len(PALETTE)])}"/>'
+            )
+    for index, (key, name, _points) in enumerate(series):
+        body.append(
+            f'<text x="{margin + 4 + 90 * index}" y="{margin - 6}" '
+            f'fill="{colors.get(key, PALETTE[index % len(PALETTE)])}">{escape(name)}</text>'
+        )
+    return _frame(width, height, margin, (0, upper, labels[0], labels[-1]), ''.join(body))
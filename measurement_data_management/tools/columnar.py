@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""Columnar file writers for measurement exports.
+
+Rows are appended chunk by chunk and never held all at once: the NumPy
+writer fills one memory-mapped ``.npy`` file per column, zipped into an
+``.npz`` archive at the end, and the Parquet writer appends one row group
+per chunk. NumPy and PyArrow are optional, formats whose library is not
+installed are not offered.
+"""
+import os
+import shutil
+import tempfile
+import zipfile
+
+try:
+    import numpy
+    from numpy.lib.format import open_memmap
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# Column kinds are 'int', 'float', 'bool', 'datetime', 'category' (a few
+# distinct strings) and 'string' (free text, left out of NumPy archives)
+_NUMPY_DTYPES = {
+    'int': 'int64',
+    'float': 'float64',
+    'bool': 'bool',
+    'datetime': 'datetime64[us]',
+    'category': 'int32',
+}
+
+
+class NpzWriter:
+    """Write columns to a NumPy ``.npz`` archive of known length.
+
+    Category columns are stored as ``int32`` codes, -1 for empty values,
+    with their labels in a ``<column>__categories`` array. Missing floats
+    are NaN and missing dates NaT.
+    """
+
+    extension = 'npz'
+    mimetype = 'application/zip'
+
+    def __init__(self, path, columns, row_count):
+        self.path = path
+        self.columns = [(name, kind) for name, kind in columns if kind in _NUMPY_DTYPES]
+        self.positions = [position for position, (_name, kind) in enumerate(columns) if kind in _NUMPY_DTYPES]
+        self.row_count = row_count
+        self.offset = 0
+        self.directory = tempfile.mkdtemp(prefix='measurement_export_')
+        self.arrays = {
+            name: open_memmap(
+                os.path.join(self.directory, f'{name}.npy'), mode='w+',
+                dtype=_NUMPY_DTYPES[kind], shape=(row_count,),
+            )
+            for name, kind in self.columns
+        }
+        self.categories = {name: {} for name, kind in self.columns if kind == 'category'}
+
+    def write(self, rows):
+        end = self.offset + len(rows)
+        if end > self.row_count:
+            raise ValueError("More rows than announced: %s > %s" % (end, self.row_count))
+        values_by_position = list(zip(*rows))
+        for (name, kind), position in zip(self.columns, self.positions):
+            values = values_by_position[position]
+            if kind == 'category':
+                codes = self.categories[name]
+                values = [-1 if value is None or value is False else codes.setdefault(value, len(codes)) for value in values]
+            elif kind == 'int':
+                values = [value or 0 for value in values]
+            elif kind == 'bool':
+                values = [bool(value) for value in values]
+            self.arrays[name][self.offset:end] = numpy.array(values, dtype=_NUMPY_DTYPES[kind])
+        self.offset = end
+
+    def close(self):
+        try:
+            for array in self.arrays.values():
+                array.flush()
+            self.arrays.clear()
+            for name, codes in self.categories.items():
+                numpy.save(os.path.join(self.directory, f'{name}__categories.npy'), numpy.array(list(codes), dtype=str))
+            with zipfile.ZipFile(self.path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+                for filename in sorted(os.listdir(self.directory)):
+                    archive.write(os.path.join(self.directory, filename), filename)
+        finally:
+            shutil.rmtree(self.directory, ignore_errors=True)
+
+
+class ParquetWriter:
+    """Write columns to a Parquet file, one row group per chunk"""
+
+    extension = 'parquet'
+    mimetype = 'application/vnd.apache.parquet'
+
+    def __init__(self, path, columns, row_count):
+        self.columns = columns
+        types = {
+            'int': pyarrow.int64(),
+            'float': pyarrow.float64(),
+            'bool': pyarrow.bool_(),
+            'datetime': pyarrow.timestamp('us'),
+            'category': pyarrow.string(),
+            'string': pyarrow.string(),
+        }
+        self.schema = pyarrow.schema([(name, types[kind]) for name, kind in columns])
+        self.writer = pyarrow.parquet.ParquetWriter(path, self.schema, compression='zstd')
+
+    def write(self, rows):
+        values_by_position = list(zip(*rows))
+        arrays = []
+        for position, (_name, kind) in enumerate(self.columns):
+            values = values_by_position[position]
+            if kind in ('category', 'string'):
+                values = [value or None for value in values]
+            arrays.append(pyarrow.array(values, type=self.schema.field(position).type))
+        self.writer.write_table(pyarrow.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def available_formats():
+    """Return ``(format, label)`` of the formats whose library is installed"""
+    formats = []
+    if numpy is not None:
+        formats.append(('npz', 'NumPy (.npz)'))
+    if pyarrow is not None:
+        formats.append(('parquet', 'Parquet'))
+    return formats
+
+
+def get_writer(export_format):
+    return {'npz': NpzWriter, 'parquet': ParquetWriter}[export_format]
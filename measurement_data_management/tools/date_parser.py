@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""Date parsing helpers for measurement imports.
+
+The helpers in this module are plain Python without any ORM access so that
+they can be reused outside of an Odoo environment (benchmarks, worker
+processes).
+"""
+import re
+from datetime import datetime, timezone
+
+DATE_FORMATS = [
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%d',
+    '%d/%m/%Y %H:%M:%S',
+    '%d/%m/%Y %H:%M',
+    '%d/%m/%Y',
+    '%m/%d/%Y %H:%M:%S',
+    '%m/%d/%Y %H:%M',
+    '%m/%d/%Y',
+]
+
+DATE_ORDERS = ('iso', 'dmy', 'mdy')
+
+_FORMAT_ORDERS = {
+    'iso': DATE_FORMATS[0:3],
+    'dmy': DATE_FORMATS[3:6],
+    'mdy': DATE_FORMATS[6:9],
+}
+
+_ISO_RE = re.compile(r'^\d{4}-\d{1,2}-\d{1,2}')
+_SLASHED_RE = re.compile(
+    r'^(\d{1,2})/(\d{1,2})/(\d{4})(?:[ T](\d{1,2}):(\d{2})(?::(\d{2}))?)?$'
+)
+
+
+def parse_date_any(value, formats=DATE_FORMATS):
+    """Parse ``value`` by trying each of ``formats`` in turn.
+
+    This is the slow path used when the date order of a file is unknown or
+    when a value does not match the format detected for the file.
+    """
+    for fmt in formats:
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    raise ValueError("Invalid date format: %s" % value)
+
+
+def sniff_date_order(samples):
+    """Guess the date order of a sample of date strings.
+
+    Returns ``'iso'``, ``'dmy'``, ``'mdy'`` or ``None`` when the sample holds
+    no recognisable date. Slashed dates are only read as month first when a
+    day greater than 12 appears in second position and never in first
+    position, matching the day first preference of ``DATE_FORMATS``.
+    """
+    iso_count = slashed_count = 0
+    day_first = month_first = False
+    for value in samples:
+        value = value.strip()
+        if _ISO_RE.match(value):
+            iso_count += 1
+            continue
+        match = _SLASHED_RE.match(value)
+        if not match:
+            continue
+        slashed_count += 1
+        first, second = int(match.group(1)), int(match.group(2))
+        if first > 12:
+            day_first = True
+        elif second > 12:
+            month_first = True
+    if not iso_count and not slashed_count:
+        return None
+    if iso_count >= slashed_count:
+        return 'iso'
+    if month_first and not day_first:
+        return 'mdy'
+    return 'dmy'
+
+
+def _parse_iso(value):
+    result = datetime.fromisoformat(value)
+    if result.tzinfo is not None:
+        raise ValueError("Timezone-aware dates are not supported: %s" % value)
+    return result
+
+
+def _make_slashed_parser(day_first):
+    match = _SLASHED_RE.match
+
+    def parse(value):
+        groups = match(value)
+        if not groups:
+            raise ValueError("Invalid date format: %s" % value)
+        first, second, year, hour, minute, second_ = groups.groups()
+        day, month = (first, second) if day_first else (second, first)
+        return datetime(
+            int(year), int(month), int(day),
+            int(hour or 0), int(minute or 0), int(second_ or 0),
+        )
+    return parse
+
+
+def make_date_parser(order=None):
+    """Return a callable parsing date strings of the given ``order``.
+
+    Known orders use a precompiled fast path (``datetime.fromisoformat`` for
+    ISO dates, a single regular expression for slashed dates). Values the
+    fast path rejects fall back to :func:`parse_date_any`, trying the
+    formats of ``order`` first. Without an order every format is tried.
+    """
+    if order not in _FORMAT_ORDERS:
+        return parse_date_any
+
+    fast_parse = _parse_iso if order == 'iso' else _make_slashed_parser(order == 'dmy')
+    fallback_formats = _FORMAT_ORDERS[order] + [
+        fmt for fmt in DATE_FORMATS if fmt not in _FORMAT_ORDERS[order]
+    ]
+
+    def parse(value):
+        try:
+            return fast_parse(value)
+        except ValueError:
+            return parse_date_any(value, fallback_formats)
+    return parse
+
+
+def parse_timestamp(value):
+    """Parse a machine timestamp into a naive UTC datetime.
+
+    Accepts ISO 8601 strings, with an offset or a ``Z`` suffix converted to
+    UTC and without one read as UTC, and POSIX timestamps in seconds.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return datetime.fromtimestamp(value, timezone.utc).replace(tzinfo=None)
+    if not isinstance(value, str):
+        raise ValueError("Invalid timestamp: %r" % (value,))
+    value = value.strip()
+    if value.endswith(('Z', 'z')):
+        value = value[:-1] + '+00:00'
+    result = datetime.fromisoformat(value)
+    if result.tzinfo is not None:
+        result = result.astimezone(timezone.utc).replace(tzinfo=None)
+    return result
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""Quality classification of measurement values against device ranges."""
+
+QUALITY_STATUSES = ('good', 'warning', 'critical', 'out_of_range')
+
+DEFAULT_WARNING_MIN_FACTOR = 1.1
+DEFAULT_WARNING_MAX_FACTOR = 0.9
+
+
+def classify_quality(value, min_range, max_range,
+                     min_factor=DEFAULT_WARNING_MIN_FACTOR,
+                     max_factor=DEFAULT_WARNING_MAX_FACTOR):
+    """Return the quality status of ``value`` for a device measuring range.
+    
+    Values inside the range but below ``min_range * min_factor`` or above
+    ``max_range * max_factor`` are a ``'warning'``. Devices without both
+    bounds set classify every value as ``'good'``. Keep in line with
+    ``measurement.device._reclassify_measurements``, which applies the same
+    rules in SQL.
+    """
+    if min_range and max_range:
+        if value < min_range or value > max_range:
+            return 'out_of_range'
+        if value < min_range * min_factor or value > max_range * max_factor:
+            return 'warning'
+    return 'good'
@@ -0,0 +1,249 @@
+# -*- coding: utf-8 -*-
+"""Row parsing for measurement CSV imports.
+
+Everything in this module works on plain Python values: the device index is
+a set of dictionaries built beforehand from a single ``search_read`` and the
+options are a picklable dictionary. This lets the same code parse rows in
+the Odoo worker and in the processes of a ``ProcessPoolExecutor``.
+"""
+import csv
+import gzip
+import hashlib
+import io
+import time
+from collections import Counter
+from itertools import chain, islice
+
+from .date_parser import make_date_parser, sniff_date_order
+
+DATE_SAMPLE_SIZE = 200
+
+# Column layout written by the CSV export and understood by ``map_row``
+CSV_COLUMNS = ('device', 'serial_number', 'date', 'value', 'unit', 'operator', 'notes')
+CSV_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+
+class RowError(ValueError):
+    """Raised for a row that cannot be imported, ``code`` tells why.
+    
+    Codes are ``'date'`` (unparsable date), ``'value_required'`` and
+    ``'value'`` (unparsable value). Messages are left to the caller so that
+    they can be translated.
+    """
+    
+    def __init__(self, code, value=None):
+        super().__init__(code, value)
+        self.code = code
+        self.value = value
+
+
+def open_binary_csv(binary_file):
+    """Return ``binary_file``, decompressed on the fly when it is gzipped.
+    
+    ``binary_file`` must be seekable, like files and ``io.BytesIO``. Closing
+    the returned file leaves ``binary_file`` open.
+    """
+    magic = binary_file.read(2)
+    binary_file.seek(0)
+    if magic == b'\x1f\x8b':
+        return gzip.GzipFile(fileobj=binary_file, mode='rb')
+    return binary_file
+
+
+def reading_fingerprint(device_id, measurement_date, value, unit):
+    """Return the content hash of a reading, the same whichever file it comes from.
+    
+    ``measurement_date`` is a ``datetime``, taken to the second as stored.
+    """
+    key = '\x1f'.join((
+        str(device_id),
+        measurement_date.strftime(CSV_DATE_FORMAT),
+        repr(float(value)),
+        (unit or '').strip(),
+    ))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+
+def map_row(row, header):
+    """Map the cells of a CSV row to their meaning, by header or position"""
+    if header:
+        row_dict = dict(zip(header, row))
+        return {
+            'device': row_dict.get('device') or row_dict.get('device_name'),
+            'serial_number': row_dict.get('serial_number') or row_dict.get('serial'),
+            'date': row_dict.get('date') or row_dict.get('measurement_date') or row_dict.get('timestamp'),
+            'value': row_dict.get('value') or row_dict.get('measurement_value'),
+            'unit': row_dict.get('unit') or row_dict.get('measurement_unit'),
+            'operator': row_dict.get('operator') or row_dict.get('user'),
+            'notes': row_dict.get('notes') or row_dict.get('comment'),
+        }
+    return {
+        'device': row[0] if len(row) > 0 else None,
+        'serial_number': None,
+        'date': row[1] if len(row) > 1 else None,
+        'value': row[2] if len(row) > 2 else None,
+        'unit': row[3] if len(row) > 3 else None,
+        'operator': row[4] if len(row) > 4 else None,
+        'notes': row[5] if len(row) > 5 else None,
+    }
+
+
+def device_key(value, normalize=False):
+    """Return the key under which a device name or serial is indexed"""
+    value = value.strip()
+    if normalize:
+        value = ' '.join(value.split()).casefold()
+    return value
+
+
+def build_device_index(devices, normalize=False):
+    """Build the device lookup tables from ``search_read`` results.
+    
+    ``devices`` are dictionaries with ``id``, ``name``, ``serial_number``
+    and ``measurement_unit``. Names that cannot be resolved while parsing
+    are counted in ``unknown``.
+    """
+    index = {
+        'name': {},
+        'serial': {},
+        'unit': {},
+        'unknown': Counter(),
+    }
+    for device in devices:
+        if device['name']:
+            index['name'].setdefault(device_key(device['name'], normalize), device['id'])
+        if device['serial_number']:
+            index['serial'].setdefault(device_key(device['serial_number'], normalize), device['id'])
+        index['unit'][device['id']] = device['measurement_unit']
+    return index
+
+
+def sniff_row_date_order(rows, header):
+    """Sniff the date order from the date column of a sample of rows"""
+    samples = (map_row(row, header)['date'] for row in rows if row)
+    return sniff_date_order(value for value in samples if value)
+
+
+def parse_row(row, options):
+    """Parse a single CSV row into measurement record values.
+    
+    Returns ``None`` for blank rows and for rows whose device is unknown,
+    the latter being counted in ``options['device_index']['unknown']``.
+    Raises :class:`RowError` for invalid rows.
+    """
+    if not row or all(not cell.strip() for cell in row):
+        return None
+    
+    cells = map_row(row, options['header'])
+    device_name = cells['device']
+    serial_number = cells['serial_number']
+    measurement_date = cells['date']
+    value = cells['value']
+    unit = cells['unit']
+    operator = cells['operator']
+    notes = cells['notes']
+    device_index = options['device_index']
+    normalize = options['normalize_device_names']
+    
+    # Find or use device
+    device_id = None
+    if device_name and device_name.strip():
+        device_id = device_index['name'].get(device_key(device_name, normalize))
+    if not device_id and serial_number and serial_number.strip():
+        device_id = device_index['serial'].get(device_key(serial_number, normalize))
+    
+    if not device_id:
+        device_id = options['default_device_id']
+    
+    if not device_id:
+        unknown = (device_name and device_name.strip()) or (serial_number and serial_number.strip())
+        device_index['unknown'][unknown or 'Unknown'] += 1
+        return None
+    
+    dated_by_source = bool(measurement_date and measurement_date.strip())
+    if dated_by_source:
+        try:
+            measurement_date = options['parse_date'](measurement_date.strip())
+        except ValueError:
+            raise RowError('date', measurement_date)
+    else:
+        measurement_date = options['now']
+    
+    if not value or not str(value).strip():
+        raise RowError('value_required')
+    
+    try:
+        value = float(str(value).strip())
+    except ValueError:
+        raise RowError('value', value)
+    
+    unit = (unit and unit.strip()) or options['default_unit'] or device_index['unit'].get(device_id) or ''
+    return {
+        'device_id': device_id,
+        'measurement_date': measurement_date,
+        'value': value,
+        'unit': unit,
+        'operator': (operator and operator.strip()) or options['default_operator'] or '',
+        'notes': (notes and notes.strip()) or '',
+        'measurement_type': 'imported',
+        'import_session_id': options['import_session_id'],
+        # Rows dated on import share that date, they are not deduplicated
+        'import_fingerprint': dated_by_source and reading_fingerprint(device_id, measurement_date, value, unit),
+    }
+
+
+def parse_csv_file(source, delimiter, has_header, options):
+    """Parse a whole CSV file into values ready to be created.
+    
+    ``source`` is a path on the filestore or the raw bytes of the file. This
+    function is meant to run in a worker process: it only takes and returns
+    picklable values and never touches the database. Row errors are
+    returned as ``(row_num, code, value)`` tuples.
+    """
+    started = time.perf_counter()
+    result = {
+        'rows': 0,
+        'vals': [],
+        'errors': [],
+        'unknown': Counter(),
+        'date_format': None,
+        'parse_time': 0.0,
+    }
+    binary_file = open(source, 'rb') if isinstance(source, str) else io.BytesIO(source)
+    with binary_file, open_binary_csv(binary_file) as csv_file:
+        csv_reader = csv.reader(
+            io.TextIOWrapper(csv_file, encoding='utf-8', newline=''),
+            delimiter=delimiter
+        )
+        header = None
+        if has_header:
+            first_row = next(csv_reader, None)
+            if first_row is None:
+                return result
+            header = [h.strip().lower() for h in first_row]
+        
+        sample_rows = list(islice(csv_reader, DATE_SAMPLE_SIZE))
+        date_format = options['date_format']
+        if date_format == 'auto':
+            date_format = sniff_row_date_order(sample_rows, header)
+        options = dict(
+            options,
+            header=header,
+            parse_date=make_date_parser(date_format),
+            device_index=dict(options['device_index'], unknown=result['unknown']),
+        )
+        
+        first_row_num = 2 if has_header else 1
+        for row_num, row in enumerate(chain(sample_rows, csv_reader), start=first_row_num):
+            result['rows'] += 1
+            try:
+                record_data = parse_row(row, options)
+            except RowError as e:
+                result['errors'].append((row_num, e.code, e.value))
+                continue
+            if record_data:
+                result['vals'].append((row_num, record_data))
+    
+    result['date_format'] = date_format
+    result['parse_time'] = time.perf_counter() - started
+    return result
@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Online statistical process control of measurement values.
+
+The control limits of a device come from the running mean and standard
+deviation of its in-control readings, accumulated with Welford's algorithm.
+Each new reading is checked against the Western Electric rules and an EWMA
+chart. The state of a device is a handful of numbers plus the zones of its
+last eight readings, so evaluating a reading costs O(1) whatever the size
+of the history.
+"""
+import math
+
+from .statistics import RunningStats
+
+SPC_RULES = [
+    ('beyond_3_sigma', '1 beyond 3 sigma'),
+    ('two_of_three_2_sigma', '2 of 3 beyond 2 sigma'),
+    ('four_of_five_1_sigma', '4 of 5 beyond 1 sigma'),
+    ('eight_same_side', '8 on one side of the mean'),
+    ('ewma', 'EWMA beyond its limits'),
+]
+
+# Readings accumulated before the limits are trusted
+MIN_BASELINE = 30
+EWMA_LAMBDA = 0.2
+EWMA_WIDTH = 3.0
+ZONE_HISTORY = 8
+
+# Zone of a reading: within 1, 2, 3 or beyond 3 sigma, above or below the mean
+_UPPER_ZONES = 'ABCD'
+_LOWER_ZONES = 'abcd'
+
+
+class SpcState:
+    """Control state of one device, updated one reading at a time"""
+    
+    __slots__ = ('stats', 'ewma', 'zones')
+    
+    def __init__(self, count=0, mean=0.0, m2=0.0, ewma=None, zones=''):
+        self.stats = RunningStats.from_moments(count, mean, m2, None, None)
+        self.ewma = ewma
+        self.zones = zones or ''
+    
+    def evaluate(self, value):
+        """Check a new reading and fold it into the state.
+        
+        Returns the first violated rule of ``SPC_RULES``, or None. The
+        reading is checked against the limits of the readings before it and
+        only joins the baseline when it is in control, so that a drifting
+        process cannot widen its own limits.
+        """
+        stats = self.stats
+        sigma = stats.std_dev
+        if stats.count < MIN_BASELINE or not sigma:
+            stats.update(value)
+            self.ewma = stats.mean
+            return None
+        mean = stats.mean
+        deviation = (value - mean) / sigma
+        zones = _UPPER_ZONES if deviation >= 0 else _LOWER_ZONES
+        self.zones = (self.zones + zones[min(int(abs(deviation)), 3)])[-ZONE_HISTORY:]
+        self.ewma = EWMA_LAMBDA * value + (1 - EWMA_LAMBDA) * (mean if self.ewma is None else self.ewma)
+        rule = self._check_rules(zones, mean, sigma)
+        if not rule:
+            stats.update(value)
+        return rule
+    
+    def _check_rules(self, zones, mean, sigma):
+        recent = self.zones
+        if recent[-1] == zones[3]:
+            return 'beyond_3_sigma'
+        if recent[-1] in zones[2:] and sum(zone in zones[2:] for zone in recent[-3:]) >= 2:
+            return 'two_of_three_2_sigma'
+        if recent[-1] in zones[1:] and sum(zone in zones[1:] for zone in recent[-5:]) >= 4:
+            return 'four_of_five_1_sigma'
+        if len(recent) == ZONE_HISTORY and all(zone in zones for zone in recent):
+            return 'eight_same_side'
+        if abs(self.ewma - mean) > EWMA_WIDTH * sigma * math.sqrt(EWMA_LAMBDA / (2 - EWMA_LAMBDA)):
+            return 'ewma'
+        return None
+    
+    def as_values(self):
+        """Return the state as the ``spc_*`` columns of the device"""
+        return {
+            'spc_count': self.stats.count,
+            'spc_mean': self.stats.mean,
+            'spc_m2': self.stats.m2,
+            'spc_ewma': self.ewma,
+            'spc_zones': self.zones,
+        }
+
+
+def apply_control_status(status, spc_rule):
+    """Combine a range status with a control rule violation.
+    
+    Precedence is ``out_of_range``, then ``critical`` for readings violating
+    a control rule, then ``warning`` and ``good``.
+    """
+    if spc_rule and status != 'out_of_range':
+        return 'critical'
+    return status
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""Descriptive statistics of measurement values.
+
+Moments are accumulated in a single pass with Welford's algorithm, which
+stays accurate where the textbook ``sum(x**2) - n * mean**2`` loses all
+precision on large values with a small spread. Percentiles and histograms
+use NumPy when it is installed and fall back to plain Python otherwise.
+"""
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+DEFAULT_PERCENTILES = (25, 50, 75, 95)
+DEFAULT_BINS = 10
+
+
+class RunningStats:
+    """Count, mean, variance, min and max accumulated one value at a time"""
+    
+    __slots__ = ('count', 'mean', 'm2', 'minimum', 'maximum')
+    
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = None
+        self.maximum = None
+    
+    @classmethod
+    def from_values(cls, values):
+        """Build from a sequence of values, vectorised when NumPy is available"""
+        if numpy is not None and len(values):
+            array = numpy.asarray(values, dtype=float)
+            mean = array.mean()
+            return cls.from_moments(
+                len(array), mean, ((array - mean) ** 2).sum(),
+                float(array.min()), float(array.max()),
+            )
+        stats = cls()
+        stats.update_many(values)
+        return stats
+    
+    @classmethod
+    def from_moments(cls, count, mean, m2, minimum, maximum):
+        stats = cls()
+        if count:
+            stats.count = count
+            stats.mean = float(mean)
+            stats.m2 = float(m2)
+            stats.minimum = minimum
+            stats.maximum = maximum
+        return stats
+    
+    @classmethod
+    def from_sums(cls, count, total, total_squares, minimum, maximum):
+        """Build from plain sums, as stored by pre-aggregated tables.
+        
+        Less accurate than accumulating the values themselves when the mean
+        is large compared to the spread, the result is clamped at zero.
+        """
+        if not count:
+            return cls()
+        mean = total / count
+        m2 = max(total_squares - total * mean, 0.0)
+        return cls.from_moments(count, mean, m2, minimum, maximum)
+    
+    def update(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+    
+    def update_many(self, values):
+        for value in values:
+            self.update(value)
+    
+    def merge(self, other):
+        """Combine the statistics of another set of values into these"""
+        if not other.count:
+            return self
+        if not self.count:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.minimum, self.maximum = other.minimum, other.maximum
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        return self
+    
+    @property
+    def variance(self):
+        """Sample variance, 0 below two values"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+    
+    @property
+    def std_dev(self):
+        return math.sqrt(self.variance)
+    
+    def as_dict(self):
+        """Return the statistics under the keys used by the report templates"""
+        if not self.count:
+            return {'count': 0, 'average': 0, 'minimum': 0, 'maximum': 0, 'range': 0, 'std_dev': 0}
+        return {
+            'count': self.count,
+            'average': self.mean,
+            'minimum': self.minimum,
+            'maximum': self.maximum,
+            'range': self.maximum - self.minimum,
+            'std_dev': self.std_dev,
+        }
+
+
+def percentiles(sorted_values, ranks=DEFAULT_PERCENTILES):
+    """Return ``{rank: value}`` for values sorted in ascending order.
+    
+    Interpolates linearly between the closest ranks, like the default method
+    of ``numpy.percentile``.
+    """
+    if not sorted_values:
+        return {}
+    if numpy is not None:
+        return dict(zip(ranks, numpy.percentile(sorted_values, ranks).tolist()))
+    last = len(sorted_values) - 1
+    result = {}
+    for rank in ranks:
+        position = last * rank / 100.0
+        lower = math.floor(position)
+        upper = min(lower + 1, last)
+        result[rank] = sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+    return result
+
+
+def histogram(values, bins=DEFAULT_BINS, minimum=None, maximum=None):
+    """Return ``bins`` equal-width bins as ``(lower, upper, count)`` tuples.
+    
+    The last bin includes its upper edge, like ``numpy.histogram``.
+    """
+    if not values:
+        return []
+    minimum = min(values) if minimum is None else minimum
+    maximum = max(values) if maximum is None else maximum
+    if minimum == maximum:
+        minimum, maximum = minimum - 0.5, maximum + 0.5
+    if numpy is not None:
+        counts, edges = numpy.histogram(values, bins=bins, range=(minimum, maximum))
+        edges = edges.tolist()
+        return list(zip(edges[:-1], edges[1:], counts.tolist()))
+    width = (maximum - minimum) / bins
+    counts = [0] * bins
+    for value in values:
+        if minimum <= value <= maximum:
+            counts[min(int((value - minimum) / width), bins - 1)] += 1
+    return [
+        (minimum + width * index, minimum + width * (index + 1), count)
+        for index, count in enumerate(counts)
+    ]
+
+
+def describe(sorted_values, ranks=DEFAULT_PERCENTILES, bins=DEFAULT_BINS):
+    """Return the statistics, percentiles and histogram of sorted values"""
+    stats = RunningStats.from_values(sorted_values)
+    result = stats.as_dict()
+    result['percentiles'] = percentiles(sorted_values, ranks)
+    result['histogram'] = histogram(sorted_values, bins, stats.minimum, stats.maximum)
+    return result
+
+
+def rolling_mean(buckets, window):
+    """Return the moving average of bucketed values over ``window``.
+
+    ``buckets`` are ``(position, count, total)`` tuples sorted by position,
+    where positions are dates, datetimes or numbers and ``window`` is the
+    matching distance. The average at each bucket covers the buckets less
+    than ``window`` before it and is weighted by their counts, so gaps in
+    the series do not skew it.
+    """
+    result = []
+    start = 0
+    window_count = 0
+    window_total = 0.0
+    for position, count, total in buckets:
+        window_count += count
+        window_total += total
+        while buckets[start][0] <= position - window:
+            window_count -= buckets[start][1]
+            window_total -= buckets[start][2]
+            start += 1
+        result.append(window_total / window_count if window_count else 0.0)
+    return result
+
+
+def linear_trend(points):
+    """Return the weighted least squares ``(slope, intercept)`` of points.
+
+    ``points`` are ``(x, y, weight)`` tuples, for instance the bucket means
+    weighted by their counts. Returns ``(0.0, mean)`` when all points share
+    the same ``x``.
+    """
+    total_weight = sum(weight for _x, _y, weight in points)
+    if not total_weight:
+        return 0.0, 0.0
+    mean_x = sum(x * weight for x, _y, weight in points) / total_weight
+    mean_y = sum(y * weight for _x, y, weight in points) / total_weight
+    sxx = sum(weight * (x - mean_x) ** 2 for x, _y, weight in points)
+    if not sxx:
+        return 0.0, mean_y
+    sxy = sum(weight * (x - mean_x) * (y - mean_y) for x, y, weight in points)
+    slope = sxy / sxx
+    return slope, mean_y - slope * mean_x
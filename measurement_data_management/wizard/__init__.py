@@ -1 +1,3 @@
-from . import measurement_import_wizard
\ No newline at end of file
+from . import measurement_import_wizard
+from . import measurement_export_wizard
+from . import measurement_validation_wizard
\ No newline at end of file
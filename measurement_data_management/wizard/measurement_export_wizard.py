@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from odoo.tools.safe_eval import safe_eval
+from ..tools.columnar import available_formats, get_writer
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class MeasurementExportWizard(models.TransientModel):
+    _name = 'measurement.export.wizard'
+    _description = 'Measurement Columnar Export Wizard'
+
+    # (column, SQL expression, kind), see tools.columnar for the kinds
+    _EXPORT_COLUMNS = [
+        ('id', '"measurement_record".id', 'int'),
+        ('name', '"measurement_record".name', 'string'),
+        ('device_id', '"measurement_record".device_id', 'int'),
+        ('device_name', 'export_device.name', 'category'),
+        ('serial_number', 'export_device.serial_number', 'category'),
+        ('measurement_date', '"measurement_record".measurement_date', 'datetime'),
+        ('value', '"measurement_record".value', 'float'),
+        ('unit', '"measurement_record".unit', 'category'),
+        ('operator', '"measurement_record".operator', 'category'),
+        ('measurement_type', '"measurement_record".measurement_type', 'category'),
+        ('quality_status', '"measurement_record".quality_status', 'category'),
+        ('is_validated', '"measurement_record".is_validated', 'bool'),
+        ('temperature', '"measurement_record".temperature', 'float'),
+        ('humidity', '"measurement_record".humidity', 'float'),
+        ('batch_id', '"measurement_record".batch_id', 'category'),
+        ('import_session_id', '"measurement_record".import_session_id', 'category'),
+    ]
+
+    device_ids = fields.Many2many(
+        'measurement.device',
+        string='Devices',
+        help="Leave empty to export the measurements of all devices"
+    )
+
+    date_from = fields.Date(string='From Date')
+
+    date_to = fields.Date(string='To Date')
+
+    record_domain = fields.Char(
+        string='Selection',
+        help="Domain of the measurements selected in the list, combined with "
+             "the devices and dates"
+    )
+
+    export_format = fields.Selection(
+        selection=lambda self: available_formats(),
+        string='Format',
+        required=True,
+        default=lambda self: (available_formats() or [(False, '')])[0][0]
+    )
+
+    chunk_size = fields.Integer(
+        string='Chunk Size',
+        default=50000,
+        help="Rows fetched from the database and written at a time"
+    )
+
+    attachment_id = fields.Many2one('ir.attachment', string='Export File', readonly=True)
+
+    export_summary = fields.Text(string='Export Summary', readonly=True)
+
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('done', 'Done'),
+    ], default='draft')
+
+    @api.model
+    def default_get(self, fields_list):
+        result = super().default_get(fields_list)
+        context = self.env.context
+        if context.get('active_model') == 'measurement.record' and 'record_domain' in fields_list:
+            domain = self.env['measurement.record']._get_selection_domain()
+            if domain is not None:
+                result['record_domain'] = repr(domain)
+        return result
+
+    def _get_record_domain(self):
+        """Return the domain of the measurement records covered by the wizard"""
+        domain = safe_eval(self.record_domain) if self.record_domain else []
+        if self.date_from:
+            domain.append(('measurement_date', '>=', datetime.combine(self.date_from, datetime.min.time())))
+        if self.date_to:
+            domain.append(('measurement_date', '<', datetime.combine(self.date_to + timedelta(days=1), datetime.min.time())))
+        if self.device_ids:
+            domain.append(('device_id', 'in', self.device_ids.ids))
+        return domain
+
+    def action_export(self):
+        """Write the selected measurements to a columnar file attachment.
+
+        Rows are read through a server-side cursor, ``chunk_size`` at a
+        time, and appended to a temporary file as they come, which is then
+        moved into the filestore: memory holds one chunk, never the whole
+        export.
+        """
+        self.ensure_one()
+        if not self.export_format:
+            raise UserError(_('Columnar exports need NumPy or PyArrow to be installed on the server.'))
+        if self.date_from and self.date_to and self.date_from > self.date_to:
+            raise UserError(_('The start date must be before the end date.'))
+        started = time.perf_counter()
+        Record = self.env['measurement.record']
+        domain = self._get_record_domain()
+        # Counted in the snapshot the rows are read from
+        row_count = Record.search_count(domain)
+        if not row_count:
+            raise UserError(_('No measurement records found for the selected criteria.'))
+
+        writer_class = get_writer(self.export_format)
+        handle, path = tempfile.mkstemp(suffix='.' + writer_class.extension)
+        os.close(handle)
+        filename = 'measurements_%s.%s' % (fields.Datetime.now().strftime('%Y%m%d_%H%M%S'), writer_class.extension)
+        try:
+            writer = writer_class(path, [(name, kind) for name, _expression, kind in self._EXPORT_COLUMNS], row_count)
+            for rows in Record._iter_rows(
+                domain,
+                [expression for _name, expression, _kind in self._EXPORT_COLUMNS],
+                joins='JOIN measurement_device export_device ON export_device.id = "measurement_record".device_id',
+                chunk_size=max(self.chunk_size or 0, 1),
+            ):
+                writer.write(rows)
+            writer.close()
+            file_size = os.path.getsize(path)
+            self.attachment_id = self._create_file_attachment(path, filename, writer_class.mimetype)
+        finally:
+            if os.path.exists(path):
+                os.unlink(path)
+
+        elapsed = time.perf_counter() - started
+        self.write({
+            'state': 'done',
+            'export_summary': _(
+                'Exported %(count)s measurements in %(seconds).1f seconds (%(size).1f MB).',
+                count=row_count, seconds=elapsed, size=file_size / 1048576.0,
+            ),
+        })
+        _logger.info("Measurement export: %s rows to %s in %.1fs", row_count, filename, elapsed)
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    def _create_file_attachment(self, path, filename, mimetype):
+        """Attach the file at ``path``, moved into the filestore without being read in memory"""
+        Attachment = self.env['ir.attachment']
+        if Attachment._storage() != 'file':
+            # Database storage keeps the whole content in a column anyway
+            with open(path, 'rb') as export_file:
+                return Attachment.create({'name': filename, 'raw': export_file.read(), 'mimetype': mimetype})
+        checksum = hashlib.sha1()
+        with open(path, 'rb') as export_file:
+            for block in iter(lambda: export_file.read(1024 * 1024), b''):
+                checksum.update(block)
+        checksum = checksum.hexdigest()
+        # Same layout as ir.attachment._get_path
+        store_fname = checksum[:2] + '/' + checksum
+        full_path = Attachment._full_path(store_fname)
+        file_size = os.path.getsize(path)
+        if not os.path.exists(full_path):
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            shutil.move(path, full_path)
+        # Collected by the filestore garbage collector if the transaction fails
+        Attachment._mark_for_gc(store_fname)
+        return Attachment.create({
+            'name': filename,
+            'type': 'binary',
+            'store_fname': store_fname,
+            'file_size': file_size,
+            'checksum': checksum,
+            'mimetype': mimetype,
+        })
+
+    def action_download(self):
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_url',
+            'url': f'/web/content/{self.attachment_id.id}?download=true',
+            'target': 'self',
+        }
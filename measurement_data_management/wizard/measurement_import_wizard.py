@@ -1,33 +1,70 @@
 # -*- coding: utf-8 -*-
-import base64
-import csv
-import io
+import importlib
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
-from odoo import models, fields, api, _
-from odoo.exceptions import UserError, ValidationError
+from itertools import chain, islice
+import odoo.addons
+from odoo import models, fields, _
+from odoo.exceptions import UserError
+from ..tools.row_parser import parse_csv_file
 import logging
 
 _logger = logging.getLogger(__name__)
 
 
+class _ModuleReference:
+    """Stand-in for a module, unpickled as the module imported in the worker.
+    
+    Workers start from a fresh interpreter where the addons path is not set
+    up, so the worker initializer cannot be a function of this module: it
+    is ``setattr`` on odoo.addons, which the parsing function is looked up
+    under when a task is unpickled.
+    """
+    
+    def __init__(self, name):
+        self.name = name
+    
+    def __reduce__(self):
+        return importlib.import_module, (self.name,)
+
+
 class MeasurementImportWizard(models.TransientModel):
     _name = 'measurement.import.wizard'
+    _inherit = 'measurement.import.mixin'
     _description = 'Measurement Data Import Wizard'
 
     name = fields.Char(string='Import Name', required=True, default='CSV Import')
-    csv_file = fields.Binary(string='CSV File', required=True)
+    csv_file = fields.Binary(string='CSV File')
     filename = fields.Char(string='Filename')
-    delimiter = fields.Selection([
-        (',', 'Comma (,)'),
-        (';', 'Semicolon (;)'),
-        ('\t', 'Tab'),
-        ('|', 'Pipe (|)'),
-    ], string='Delimiter', default=',', required=True)
+    file_ids = fields.Many2many(
+        'ir.attachment',
+        'measurement_import_wizard_attachment_rel',
+        'wizard_id',
+        'attachment_id',
+        string='CSV Files',
+        help="Files imported together in parallel mode"
+    )
     
-    has_header = fields.Boolean(string='Has Header Row', default=True)
-    device_id = fields.Many2one('measurement.device', string='Default Device')
-    unit = fields.Char(string='Default Unit')
-    operator = fields.Char(string='Default Operator')
+    import_mode = fields.Selection([
+        ('row', 'Row by Row'),
+        ('batch', 'Batched'),
+        ('parallel', 'Parallel (Multiple Files)'),
+        ('raw', 'Raw Ingestion (COPY)'),
+    ], string='Import Mode', default='batch', required=True,
+        help="Batched mode parses, validates and creates rows chunk by chunk "
+             "with one multi-record create per chunk. Parallel mode parses "
+             "several files in worker processes and creates each file in "
+             "bulk. Raw ingestion writes chunks with PostgreSQL COPY, "
+             "skipping the ORM and chatter tracking.")
+    max_workers = fields.Integer(
+        string='Parallel Workers',
+        default=0,
+        help="Processes used to parse files in parallel mode, 0 uses one per CPU core"
+    )
     
     preview_data = fields.Text(string='Preview Data', readonly=True)
     import_summary = fields.Text(string='Import Summary', readonly=True)
@@ -40,36 +77,38 @@ class MeasurementImportWizard(models.TransientModel):
     
     def action_preview(self):
         self.ensure_one()
-        if not self.csv_file:
+        if self.import_mode == 'parallel':
+            return self._preview_files()
+        if not self.with_context(bin_size=True).csv_file:
             raise UserError(_('Please select a CSV file to import.'))
         
         try:
-            csv_data = base64.b64decode(self.csv_file).decode('utf-8')
-            csv_reader = csv.reader(io.StringIO(csv_data), delimiter=self.delimiter)
-            
-            rows = list(csv_reader)
+            max_preview_rows = 10
+            with self._open_csv_reader() as csv_reader:
+                rows = list(islice(csv_reader, max_preview_rows + (1 if self.has_header else 0)))
             if not rows:
                 raise UserError(_('The CSV file is empty.'))
             
             # Generate preview
             preview_lines = []
-            max_preview_rows = 10
             
-            if self.has_header and len(rows) > 0:
+            if self.has_header:
                 header = rows[0]
                 preview_lines.append(f"Header: {', '.join(header)}")
                 preview_lines.append("-" * 50)
-                data_rows = rows[1:max_preview_rows+1]
+                data_rows = rows[1:]
             else:
-                data_rows = rows[:max_preview_rows]
+                data_rows = rows
             
             for i, row in enumerate(data_rows):
                 preview_lines.append(f"Row {i+1}: {', '.join(row)}")
             
-            if len(rows) > max_preview_rows + (1 if self.has_header else 0):
-                preview_lines.append(f"... and {len(rows) - max_preview_rows - (1 if self.has_header else 0)} more rows")
+            # Count the remaining rows on the raw bytes instead of parsing them
+            total_rows = self._count_csv_lines() - (1 if self.has_header else 0)
+            if total_rows > len(data_rows):
+                preview_lines.append(f"... and about {total_rows - len(data_rows)} more rows")
             
-            self.preview_data = '\\n'.join(preview_lines)
+            self.preview_data = '\n'.join(preview_lines)
             self.state = 'preview'
             
         except Exception as e:
@@ -85,58 +124,65 @@ class MeasurementImportWizard(models.TransientModel):
     
     def action_import(self):
         self.ensure_one()
-        if not self.csv_file:
+        if self.import_mode == 'parallel':
+            if not self.file_ids:
+                raise UserError(_('Please select the CSV files to import.'))
+        elif not self.with_context(bin_size=True).csv_file:
             raise UserError(_('Please select a CSV file to import.'))
         
         try:
-            csv_data = base64.b64decode(self.csv_file).decode('utf-8')
-            csv_reader = csv.reader(io.StringIO(csv_data), delimiter=self.delimiter)
-            
-            rows = list(csv_reader)
-            if not rows:
-                raise UserError(_('The CSV file is empty.'))
-            
-            # Process header
-            if self.has_header and len(rows) > 0:
-                header = [h.strip().lower() for h in rows[0]]
-                data_rows = rows[1:]
-            else:
-                header = None
-                data_rows = rows
-            
+            started = time.perf_counter()
             # Generate import session ID
             import_session_id = f"import_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+            self.import_session_id = import_session_id
             
-            created_records = []
-            errors = []
-            
-            for row_num, row in enumerate(data_rows, start=2 if self.has_header else 1):
-                try:
-                    record_data = self._parse_row(row, header, import_session_id)
-                    if record_data:
-                        record = self.env['measurement.record'].create(record_data)
-                        created_records.append(record)
-                except Exception as e:
-                    errors.append(f"Row {row_num}: {str(e)}")
+            if self.import_mode == 'parallel':
+                result = self._import_files_parallel(import_session_id)
+            else:
+                result = self._import_file(import_session_id)
             
+            errors = result['errors']
             summary_lines = [
                 f"Import completed: {self.name}",
-                f"File: {self.filename}",
-                f"Total rows processed: {len(data_rows)}",
-                f"Records created: {len(created_records)}",
+                f"File: {', '.join(self.file_ids.mapped('name')) if self.import_mode == 'parallel' else self.filename}",
+                f"Total rows processed: {result['rows']}",
+                f"Records created: {result['created']}",
+                f"Duplicates skipped: {result['duplicates']}",
                 f"Errors: {len(errors)}",
+                f"Date format: {result['date_format'] or 'mixed'}",
             ]
             
+            elapsed = time.perf_counter() - started
+            if elapsed:
+                summary_lines.append(
+                    f"Duration: {elapsed:.2f}s ({result['rows'] / elapsed:.0f} rows/s)"
+                )
+            
+            unknown_devices = result['unknown']
+            if unknown_devices:
+                summary_lines.append("\nUnknown devices (rows skipped):")
+                for device_name, count in unknown_devices.most_common(10):
+                    summary_lines.append(f"{device_name}: {count} rows")
+                if len(unknown_devices) > 10:
+                    summary_lines.append(f"... and {len(unknown_devices) - 10} more devices")
+            
+            if result['timing']:
+                summary_lines.append("\nTiming:")
+                summary_lines.extend(result['timing'])
+            
             if errors:
-                summary_lines.append("\\nErrors:")
+                summary_lines.append("\nErrors:")
                 summary_lines.extend(errors[:10])  # Limit error display
                 if len(errors) > 10:
                     summary_lines.append(f"... and {len(errors) - 10} more errors")
             
-            self.import_summary = '\\n'.join(summary_lines)
+            self.import_summary = '\n'.join(summary_lines)
             self.state = 'done'
             
-            _logger.info(f"CSV import completed: {len(created_records)} records created, {len(errors)} errors")
+            _logger.info(
+                f"CSV import completed: {result['created']} records created, "
+                f"{result['duplicates']} duplicates skipped, {len(errors)} errors"
+            )
             
         except Exception as e:
             raise UserError(_('Error importing CSV file: %s') % str(e))
@@ -149,114 +195,264 @@ class MeasurementImportWizard(models.TransientModel):
             'target': 'new',
         }
     
-    def _parse_row(self, row, header, import_session_id):
-        """Parse a single CSV row into measurement record data"""
-        if not row or all(not cell.strip() for cell in row):
-            return None
+    def _get_csv_attachment(self):
+        attachment = self.env['ir.attachment'].sudo().search([
+            ('res_model', '=', self._name),
+            ('res_id', '=', self.id),
+            ('res_field', '=', 'csv_file'),
+        ], limit=1)
+        return attachment
+    
+    def _preview_files(self):
+        """Preview the files of a parallel import with their row counts"""
+        if not self.file_ids:
+            raise UserError(_('Please select the CSV files to import.'))
+        
+        preview_lines = []
+        total_rows = 0
+        for attachment in self.file_ids:
+            rows = self._count_csv_lines(attachment.sudo()) - (1 if self.has_header else 0)
+            total_rows += max(rows, 0)
+            preview_lines.append(f"{attachment.name}: about {max(rows, 0)} rows")
+        preview_lines.append("-" * 50)
+        preview_lines.append(f"{len(self.file_ids)} files, about {total_rows} rows")
         
-        # Map columns based on header or position
-        if header:
-            row_dict = dict(zip(header, row))
+        self.preview_data = '\n'.join(preview_lines)
+        self.state = 'preview'
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': 'measurement.import.wizard',
+            'view_mode': 'form',
+            'res_id': self.id,
+            'target': 'new',
+        }
+    
+    def _import_file(self, import_session_id):
+        """Import the single uploaded file row by row or in batches"""
+        with self._open_csv_reader() as csv_reader:
+            first_row = next(csv_reader, None)
+            if first_row is None:
+                raise UserError(_('The CSV file is empty.'))
             
-            device_name = row_dict.get('device') or row_dict.get('device_name')
-            serial_number = row_dict.get('serial_number') or row_dict.get('serial')
-            measurement_date = row_dict.get('date') or row_dict.get('measurement_date') or row_dict.get('timestamp')
-            value = row_dict.get('value') or row_dict.get('measurement_value')
-            unit = row_dict.get('unit') or row_dict.get('measurement_unit')
-            operator = row_dict.get('operator') or row_dict.get('user')
-            notes = row_dict.get('notes') or row_dict.get('comment')
+            # Process header
+            if self.has_header:
+                header = [h.strip().lower() for h in first_row]
+                data_rows = csv_reader
+            else:
+                header = None
+                data_rows = chain([first_row], csv_reader)
+            
+            # Sniff the date format on a sample, then put the sample back
+            sample_rows = list(islice(data_rows, self._DATE_SAMPLE_SIZE))
+            data_rows = chain(sample_rows, data_rows)
+            options = self._prepare_import_options(header, import_session_id, sample_rows)
             
-        else:
-            device_name = row[0] if len(row) > 0 else None
-            serial_number = None
-            measurement_date = row[1] if len(row) > 1 else None
-            value = row[2] if len(row) > 2 else None
-            unit = row[3] if len(row) > 3 else None
-            operator = row[4] if len(row) > 4 else None
-            notes = row[5] if len(row) > 5 else None
+            first_row_num = 2 if self.has_header else 1
+            numbered_rows = enumerate(data_rows, start=first_row_num)
+            if self.import_mode in ('batch', 'raw'):
+                result = self._import_batched(numbered_rows, options)
+            else:
+                result = self._import_row_by_row(numbered_rows, options)
         
-        # Find or use device
-        device = None
-        if device_name and device_name.strip():
-            device = self.env['measurement.device'].search([
-                ('name', '=', device_name.strip())
-            ], limit=1)
-            if not device and serial_number:
-                device = self.env['measurement.device'].search([
-                    ('serial_number', '=', serial_number.strip())
-                ], limit=1)
+        result['unknown'] = options['device_index']['unknown']
+        result['date_format'] = options['date_format']
+        result['duplicates'] = options.get('duplicate_count', 0)
+        return result
+    
+    def _import_files_parallel(self, import_session_id):
+        """Parse several CSV files in worker processes, then create them file by file.
         
-        if not device:
-            device = self.device_id
+        Parsing, date conversion and value validation are pure CPU work done
+        by ``parse_csv_file`` in a process pool, one task per file. Files are
+        written in this process as soon as they are parsed, with multi-record
+        creates under one savepoint per file, so a file is imported entirely
+        or not at all.
+        """
+        options = self._prepare_parse_options(import_session_id)
+        attachments = self.file_ids.sudo()
+        result = {'rows': 0, 'created': 0, 'duplicates': 0, 'errors': [], 'timing': [], 'unknown': Counter()}
+        date_formats = set()
         
-        if not device:
-            raise ValidationError(_('Device not found: %s') % (device_name or 'Unknown'))
+        max_workers = min(self.max_workers or os.cpu_count() or 1, len(attachments))
+        # Never fork the Odoo worker itself: its other threads may hold locks
+        # and it holds database sockets. Workers only get picklable data.
+        start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
         
-        if measurement_date and measurement_date.strip():
-            try:
-                date_formats = [
-                    '%Y-%m-%d %H:%M:%S',
-                    '%Y-%m-%d %H:%M',
-                    '%Y-%m-%d',
-                    '%d/%m/%Y %H:%M:%S',
-                    '%d/%m/%Y %H:%M',
-                    '%d/%m/%Y',
-                    '%m/%d/%Y %H:%M:%S',
-                    '%m/%d/%Y %H:%M',
-                    '%m/%d/%Y',
-                ]
-                
-                parsed_date = None
-                for fmt in date_formats:
-                    try:
-                        parsed_date = datetime.strptime(measurement_date.strip(), fmt)
-                        break
-                    except ValueError:
-                        continue
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=setattr,
+            initargs=(_ModuleReference('odoo.addons'), '__path__', list(odoo.addons.__path__)),
+        ) as executor:
+            futures = {
+                executor.submit(
+                    parse_csv_file,
+                    self._get_attachment_source(attachment),
+                    self.delimiter,
+                    self.has_header,
+                    options,
+                ): attachment
+                for attachment in attachments
+            }
+            for future in as_completed(futures):
+                attachment = futures[future]
+                try:
+                    parsed = future.result()
+                except Exception as e:
+                    result['errors'].append(f"{attachment.name}: {str(e)}")
+                    continue
                 
-                if not parsed_date:
-                    raise ValidationError(_('Invalid date format: %s') % measurement_date)
+                started = time.perf_counter()
+                result['rows'] += parsed['rows']
+                result['unknown'].update(parsed['unknown'])
+                date_formats.add(parsed['date_format'] or 'mixed')
+                result['errors'].extend(
+                    f"{attachment.name}, row {row_num}: {self._row_error_message(code, value)}"
+                    for row_num, code, value in parsed['errors']
+                )
+                try:
+                    file_created, file_duplicates = self._create_parsed_file(parsed['vals'])
+                except Exception as e:
+                    file_created = file_duplicates = 0
+                    result['errors'].append(
+                        f"{attachment.name}: {str(e)}, no record of this file was imported"
+                    )
+                result['created'] += file_created
+                result['duplicates'] += file_duplicates
                 
-                measurement_date = parsed_date
+                elapsed = time.perf_counter() - started
+                result['timing'].append(
+                    f"{attachment.name}: {parsed['rows']} rows parsed in "
+                    f"{parsed['parse_time']:.2f}s, {file_created} created, "
+                    f"{file_duplicates} duplicates in {elapsed:.2f}s"
+                )
+        
+        result['date_format'] = ', '.join(sorted(date_formats))
+        return result
+    
+    @staticmethod
+    def _get_attachment_source(attachment):
+        """Return what a worker process reads the attachment from"""
+        if attachment.store_fname:
+            return attachment._full_path(attachment.store_fname)
+        return attachment.raw or b''
+    
+    def _create_parsed_file(self, numbered_vals):
+        """Create the parsed rows of one file in chunks, under one savepoint.
+        
+        Returns the number of records created and of duplicate rows skipped.
+        """
+        Record = self.env['measurement.record']
+        chunk_size = max(self.chunk_size or 0, 1)
+        created_count = duplicate_count = 0
+        with self.env.cr.savepoint():
+            for chunk in self._iter_chunks(numbered_vals, chunk_size):
+                chunk, chunk_duplicates = self._skip_duplicate_rows(chunk)
+                duplicate_count += chunk_duplicates
+                if chunk:
+                    created_count += len(Record.create([vals for _row_num, vals in chunk]))
+                    self.env.flush_all()
+                self.env.invalidate_all()
+        return created_count, duplicate_count
+    
+    def _import_row_by_row(self, numbered_rows, options):
+        """Create one record per CSV row, each under its own savepoint"""
+        result = {'rows': 0, 'created': 0, 'errors': [], 'timing': []}
+        Record = self.env['measurement.record']
+        for row_num, row in numbered_rows:
+            result['rows'] += 1
+            try:
+                record_data = self._parse_row(row, options)
+                if record_data and Record._flag_duplicate_readings([record_data])[0]:
+                    options['duplicate_count'] = options.get('duplicate_count', 0) + 1
+                elif record_data:
+                    with self.env.cr.savepoint():
+                        Record.create(record_data)
+                        self.env.flush_all()
+                    result['created'] += 1
             except Exception as e:
-                raise ValidationError(_('Error parsing date "%s": %s') % (measurement_date, str(e)))
-        else:
-            measurement_date = fields.Datetime.now()
+                result['errors'].append(f"Row {row_num}: {str(e)}")
+        return result
+    
+    def _import_batched(self, numbered_rows, options):
+        """Parse, validate and create CSV rows chunk by chunk.
         
-        if not value or not str(value).strip():
-            raise ValidationError(_('Measurement value is required'))
+        Each chunk is created with a single multi-record create and flushed
+        once, so sequence numbers, tracking and the recompute of dependent
+        stored fields are handled per chunk instead of per row. Rows are
+        pulled lazily from ``numbered_rows``, so memory is bounded by the
+        chunk size rather than the file size.
+        """
+        chunk_size = max(self.chunk_size or 0, 1)
+        result = {'rows': 0, 'created': 0, 'errors': [], 'timing': []}
+        raw = self.import_mode == 'raw'
         
-        try:
-            value = float(str(value).strip())
-        except ValueError:
-            raise ValidationError(_('Invalid measurement value: %s') % value)
+        for chunk_num, chunk in enumerate(self._iter_chunks(numbered_rows, chunk_size), start=1):
+            started = time.perf_counter()
+            duplicates_before = options.get('duplicate_count', 0)
+            chunk_created, chunk_errors = self._import_chunk(chunk, options, raw=raw)
+            result['errors'].extend(chunk_errors)
+            result['rows'] += len(chunk)
+            result['created'] += chunk_created
+            
+            elapsed = time.perf_counter() - started
+            rate = len(chunk) / elapsed if elapsed else 0.0
+            result['timing'].append(
+                f"Chunk {chunk_num}: {len(chunk)} rows, {chunk_created} created, "
+                f"{options.get('duplicate_count', 0) - duplicates_before} duplicates "
+                f"in {elapsed:.2f}s ({rate:.0f} rows/s)"
+            )
         
-        # Prepare record data
-        record_data = {
-            'device_id': device.id,
-            'measurement_date': measurement_date,
-            'value': value,
-            'unit': (unit and unit.strip()) or self.unit or device.measurement_unit or '',
-            'operator': (operator and operator.strip()) or self.operator or '',
-            'notes': (notes and notes.strip()) or '',
-            'measurement_type': 'imported',
-            'import_session_id': import_session_id,
-        }
+        return result
+    
+    def action_import_background(self):
+        """Hand the file over to an import job run by a scheduled action"""
+        self.ensure_one()
+        if not self.with_context(bin_size=True).csv_file:
+            raise UserError(_('Please select a CSV file to import.'))
         
-        return record_data
+        # The copy shares the stored file, the content is not duplicated
+        attachment = self._get_csv_attachment().copy({
+            'name': self.filename or self.name,
+            'res_model': 'measurement.import.job',
+            'res_field': False,
+            'res_id': 0,
+        })
+        job = self.env['measurement.import.job'].create({
+            'name': self.name,
+            'attachment_id': attachment.id,
+            'delimiter': self.delimiter,
+            'has_header': self.has_header,
+            'device_id': self.device_id.id,
+            'unit': self.unit,
+            'operator': self.operator,
+            'date_format': self.date_format,
+            'normalize_device_names': self.normalize_device_names,
+            'chunk_size': self.chunk_size,
+            'raw_ingestion': self.import_mode == 'raw',
+            'import_session_id': f"import_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+        })
+        attachment.res_id = job.id
+        job._enqueue()
+        
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Import Job'),
+            'res_model': 'measurement.import.job',
+            'view_mode': 'form',
+            'res_id': job.id,
+        }
     
     def action_view_imported_records(self):
         self.ensure_one()
         if self.state != 'done':
             raise UserError(_('Import has not been completed yet.'))
         
-        import_session_id = f"import_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-        
         return {
             'type': 'ir.actions.act_window',
             'name': _('Imported Records'),
             'res_model': 'measurement.record',
             'view_mode': 'tree,form',
-            'domain': [('import_session_id', '=', import_session_id)],
+            'domain': [('import_session_id', '=', self.import_session_id)],
             'context': {'create': False},
         }
\ No newline at end of file
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+import time
+from odoo import models, fields, api, _
+from odoo.exceptions import UserError
+from odoo.tools.safe_eval import safe_eval
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class MeasurementValidationWizard(models.TransientModel):
+    _name = 'measurement.validation.wizard'
+    _description = 'Measurement Mass Validation Wizard'
+
+    action = fields.Selection([
+        ('validate', 'Validate'),
+        ('invalidate', 'Remove Validation'),
+    ], string='Action', default='validate', required=True)
+
+    device_ids = fields.Many2many(
+        'measurement.device',
+        string='Devices',
+        help="Leave empty to cover all devices"
+    )
+
+    date_from = fields.Datetime(string='From')
+
+    date_to = fields.Datetime(string='To')
+
+    batch_id = fields.Char(string='Batch ID')
+
+    import_session_id = fields.Char(string='Import Session')
+
+    quality_status = fields.Selection(
+        selection='_get_quality_statuses',
+        string='Quality Status',
+        help="Leave empty to cover all quality statuses"
+    )
+
+    record_domain = fields.Char(
+        string='Selection',
+        help="Domain of the measurements selected in the list, combined with "
+             "the other criteria"
+    )
+
+    chunk_size = fields.Integer(
+        string='Chunk Size',
+        default=50000,
+        help="Measurements updated per statement"
+    )
+
+    match_count = fields.Integer(string='Matching Measurements', compute='_compute_match_count')
+
+    validation_summary = fields.Text(string='Summary', readonly=True)
+
+    state = fields.Selection([
+        ('draft', 'Draft'),
+        ('done', 'Done'),
+    ], default='draft')
+
+    @api.model
+    def _get_quality_statuses(self):
+        return self.env['measurement.record']._fields['quality_status'].selection
+
+    @api.model
+    def default_get(self, fields_list):
+        result = super().default_get(fields_list)
+        context = self.env.context
+        if context.get('active_model') == 'measurement.record' and 'record_domain' in fields_list:
+            domain = self.env['measurement.record']._get_selection_domain()
+            if domain is not None:
+                result['record_domain'] = repr(domain)
+        return result
+
+    @api.depends('action', 'device_ids', 'date_from', 'date_to', 'batch_id',
+                 'import_session_id', 'quality_status', 'record_domain')
+    def _compute_match_count(self):
+        for wizard in self:
+            wizard.match_count = self.env['measurement.record'].search_count(wizard._get_pending_domain())
+
+    def _get_record_domain(self):
+        """Return the domain of the measurement records covered by the wizard"""
+        domain = safe_eval(self.record_domain) if self.record_domain else []
+        if self.device_ids:
+            domain.append(('device_id', 'in', self.device_ids.ids))
+        if self.date_from:
+            domain.append(('measurement_date', '>=', self.date_from))
+        if self.date_to:
+            domain.append(('measurement_date', '<=', self.date_to))
+        if self.batch_id:
+            domain.append(('batch_id', '=', self.batch_id))
+        if self.import_session_id:
+            domain.append(('import_session_id', '=', self.import_session_id))
+        if self.quality_status:
+            domain.append(('quality_status', '=', self.quality_status))
+        return domain
+
+    def _get_pending_domain(self):
+        """Return the domain of the covered records the action would change"""
+        if self.action == 'validate':
+            return self._get_record_domain() + [('is_validated', '!=', True)]
+        return self._get_record_domain() + [('is_validated', '=', True)]
+
+    def action_apply(self):
+        self.ensure_one()
+        if self.date_from and self.date_to and self.date_from > self.date_to:
+            raise UserError(_('The start date must be before the end date.'))
+        domain = self._get_record_domain()
+        if not domain:
+            raise UserError(_('Select measurements or set at least one criterion.'))
+        started = time.perf_counter()
+        counts = self.env['measurement.record']._mass_set_validation(
+            domain, self.action == 'validate', chunk_size=max(self.chunk_size or 0, 1)
+        )
+        elapsed = time.perf_counter() - started
+        total = sum(counts.values())
+        if not total:
+            raise UserError(_('No measurement records to update for the selected criteria.'))
+        summary = _(
+            '%(count)s measurements of %(devices)s devices updated in %(seconds).2f seconds (%(rate)s per second).',
+            count=total, devices=len(counts), seconds=elapsed, rate=int(total / elapsed) if elapsed else total,
+        )
+        _logger.info("Measurement mass validation: %s", summary)
+        self.write({'state': 'done', 'validation_summary': summary})
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }